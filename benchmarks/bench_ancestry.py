@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Time ancestry queries with an AncestryIndex and with get_uppernodes.
+
+Usage: PYTHONPATH=. python benchmarks/bench_ancestry.py [nodes] [queries]
+"""
+
+from __future__ import print_function
+
+import random
+import sys
+import time
+
+from stemtree import Node
+from stemtree.ancestry import AncestryIndex
+
+
+def build(size, rand):
+    nodes = [Node(attrs={'name': 'root'})]
+    for idx in range(1, size):
+        node = Node(attrs={'name': 'n%d' % idx})
+        nodes[rand.randrange(idx // 2, idx)].add_subnode(node)
+        nodes.append(node)
+    return nodes
+
+
+def chain_lca(first, second):
+    above = set([id(first)] + [id(n) for n in first.get_uppernodes()])
+    for node in [second] + list(second.get_uppernodes()):
+        if id(node) in above:
+            return node
+
+
+def chain_is_ancestor(ancestor, node):
+    return any(n is ancestor for n in node.get_uppernodes())
+
+
+def timed(label, func):
+    start = time.time()
+    result = func()
+    print('%-28s %7.3f sec' % (label, time.time() - start))
+    return result
+
+
+def main(size=200000, queries=20000, seed=0):
+    rand = random.Random(seed)
+    nodes = build(size, rand)
+    pairs = [(rand.choice(nodes), rand.choice(nodes)) for _ in range(queries)]
+
+    index = AncestryIndex(nodes[0])
+    timed('build index', lambda: len(index))
+    timed('build lca table', lambda: index.lca(*pairs[0]))
+    timed('lca with index', lambda: [index.lca(a, b) for a, b in pairs])
+    timed('lca with get_uppernodes', lambda: [chain_lca(a, b) for a, b in
+        pairs])
+    timed('is_ancestor with index', lambda: [index.is_ancestor(a, b) for
+        a, b in pairs])
+    timed('is_ancestor with uppernodes', lambda: [chain_is_ancestor(a, b)
+        for a, b in pairs])
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
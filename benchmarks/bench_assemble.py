@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Time assemble_subtrees on random node sets drawn from a random tree.
+
+Usage: PYTHONPATH=. python benchmarks/bench_assemble.py [nodes] [seed]
+"""
+
+from __future__ import print_function
+
+import random
+import sys
+import time
+
+from stemtree import Node
+from stemtree.algorithm import assemble_subtrees
+
+
+def build(size, rand):
+    nodes = [Node(attrs={'name': 'root'})]
+    for idx in range(1, size):
+        node = Node(attrs={'name': 'n%d' % idx})
+        # parents among the later half keep the tree deep
+        nodes[rand.randrange(idx // 2, idx)].add_subnode(node)
+        nodes.append(node)
+    return nodes
+
+
+def main(size=200000, seed=0):
+    rand = random.Random(seed)
+    for fraction in (0.01, 0.1, 0.5, 1.0):
+        nodes = build(size, rand)
+        sample = rand.sample(nodes, int(size * fraction))
+        start = time.time()
+        trees = assemble_subtrees(sample)
+        print('%6d of %d nodes  %6d trees  %7.3f sec' % (len(sample), size,
+            len(trees), time.time() - start))
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Microbenchmarks of dynamic attribute and method access on Node.
+
+Usage: PYTHONPATH=. python benchmarks/bench_attrs.py [loops]
+"""
+
+from __future__ import print_function
+
+import sys
+import timeit
+
+from stemtree import Node
+
+
+def greet(node):
+    return 'hello'
+
+
+def main(loops=1000000):
+    node = Node()
+    node.value = 1
+    node.greet = greet
+    node.setattr_shared('shared_value', 2)
+    node.setattr_shared('shared_greet', greet)
+
+    for label, stmt in (('attr read', 'node.value'),
+                        ('method call', 'node.greet()'),
+                        ('shared attr read', 'node.shared_value'),
+                        ('shared method call', 'node.shared_greet()')):
+        elapsed = min(timeit.repeat(stmt, globals={'node': node},
+            number=loops, repeat=3))
+        print('%-20s %8.1f nsec' % (label, 1e9 * elapsed / loops))
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Time Node.clone on a tree with string and integer attributes, against
+the previous clone that deep-copied every attribute value.
+
+Usage: PYTHONPATH=. python benchmarks/bench_clone.py [nodes] [fanout]
+"""
+
+from __future__ import print_function
+
+import sys
+import time
+from copy import deepcopy
+
+from stemtree import Node, CompactNode
+
+
+def build(cls, size, fanout):
+    root = cls(attrs={'name': 'root', 'order': 0})
+    nodes = [root]
+    for idx in range(1, size):
+        node = cls(attrs={'name': 'n%d' % idx, 'order': idx,
+            'span': (idx, idx + 1)})
+        nodes[(idx - 1) // fanout].add_subnode(node)
+        nodes.append(node)
+    return nodes
+
+
+def legacy_clone(root):
+    # clone as before attributes were shared: fresh nodes through
+    # __init__, deepcopy per attribute, add_subnode per subnode
+    memo = {}
+    nodes = [root]
+    memo[id(root)] = root.__class__()
+    stack = [root]
+    while stack:
+        for subnode in stack.pop().subnodes:
+            if id(subnode) not in memo:
+                memo[id(subnode)] = subnode.__class__()
+                nodes.append(subnode)
+                stack.append(subnode)
+
+    for node in nodes:
+        cloned = memo[id(node)]
+        if node._methods:
+            object.__setattr__(cloned, '_methods', dict(node._methods))
+        if node._attrs:
+            object.__setattr__(cloned, '_attrs', dict((name,
+                deepcopy(attr, memo)) for name, attr in node._attrs.items()))
+        for subnode in node.subnodes:
+            cloned.add_subnode(memo[id(subnode)])
+
+    return memo[id(root)]
+
+
+def best(func, repeat=3):
+    times = []
+    for _ in range(repeat):
+        start = time.time()
+        func()
+        times.append(time.time() - start)
+    return min(times)
+
+
+def main(size=100000, fanout=4):
+    for cls in (Node, CompactNode):
+        nodes = build(cls, size, fanout)
+        root = nodes[0]
+        path = nodes[-1]
+        legacy = best(lambda: legacy_clone(root))
+        clone = best(root.clone)
+        print('%-12s legacy clone   %7.3f sec' % (cls.__name__, legacy))
+        print('%-12s clone          %7.3f sec  (%.1fx)' % (cls.__name__,
+            clone, legacy / clone))
+        print('%-12s deepcopy       %7.3f sec' % (cls.__name__,
+            best(lambda: deepcopy(root))))
+        print('%-12s clone one path %7.3f sec' % (cls.__name__,
+            best(lambda: root.clone(subtrees=[path]))))
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
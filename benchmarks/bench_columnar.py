@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Memory and DFS_LF search time of a Node tree versus a TreeStore.
+
+Usage: PYTHONPATH=. python benchmarks/bench_columnar.py [nodes] [fanout]
+"""
+
+from __future__ import print_function
+
+import gc
+import sys
+import time
+import tracemalloc
+
+from stemtree import Node, DFS_LF
+from stemtree.columnar import TreeStore
+
+
+def build_nodes(size, fanout):
+    root = Node(attrs={'order': 0})
+    nodes = [root]
+    for idx in range(1, size):
+        node = Node(attrs={'order': idx})
+        nodes[(idx - 1) // fanout].add_subnode(node)
+        nodes.append(node)
+    return root
+
+
+def build_store(size, fanout):
+    store = TreeStore()
+    store.add(attrs={'order': 0})
+    for idx in range(1, size):
+        store.add((idx - 1) // fanout, {'order': idx})
+    return store.root
+
+
+def total(node, basket):
+    basket['total'] += node.order
+
+
+def main(size=1000000, fanout=4):
+    for label, build in (('Node', build_nodes), ('TreeStore', build_store)):
+        gc.collect()
+        objects = len(gc.get_objects())
+        tracemalloc.start()
+        root = build(size, fanout)
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        objects = len(gc.get_objects()) - objects
+
+        basket = {'total': 0}
+        start = time.time()
+        root.search(total, DFS_LF, basket=basket)
+        elapsed = time.time() - start
+        assert basket['total'] == size * (size - 1) // 2
+
+        print('%-10s %d nodes: %6.1f bytes/node, %8d gc-tracked objects, '
+            'search %.3f sec' % (label, size, memory / float(size), objects,
+            elapsed))
+        del root
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Time recomputing a subtree aggregate after small edits, with a full
+search per edit and with a derived attribute.
+
+Usage: PYTHONPATH=. python benchmarks/bench_derived.py [nodes] [edits]
+"""
+
+from __future__ import print_function
+
+import random
+import sys
+import time
+
+from stemtree import Node, DFS_LF
+from stemtree.derived import derived
+
+
+def build(size, fanout=8):
+    nodes = [Node(attrs={'value': 0})]
+    for idx in range(1, size):
+        node = Node(attrs={'value': idx % 10})
+        nodes[(idx - 1) // fanout].add_subnode(node)
+        nodes.append(node)
+    return nodes
+
+
+def add_value(node, basket):
+    basket['total'] += node.value
+
+
+def timed(label, func, count):
+    start = time.time()
+    result = func()
+    elapsed = time.time() - start
+    print('%-26s %9.3f sec  %9.1f us/edit  total %d' % (label, elapsed,
+        1e6 * elapsed / count, result))
+
+
+def main(size=200000, edits=20, seed=0):
+    rand = random.Random(seed)
+    nodes = build(size)
+    root = nodes[0]
+    edited = [rand.choice(nodes) for _ in range(edits)]
+
+    def searched():
+        for node in edited:
+            node.value += 1
+            basket = {'total': 0}
+            root.search(add_value, DFS_LF, basket=basket)
+        return basket['total']
+
+    @derived(attrs=('value',))
+    def total(node, values):
+        return node.value + sum(values)
+
+    timed('search per edit', searched, edits)
+    timed('first derived', lambda: total(root), 1)
+
+    def recomputed():
+        for node in edited:
+            node.value += 1
+            value = total(root)
+        return value
+
+    timed('derived per edit', recomputed, edits)
+    total.close()
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Time repeated find_by lookups with and without an attribute index.
+
+Usage: PYTHONPATH=. python benchmarks/bench_find.py [nodes] [lookups]
+"""
+
+from __future__ import print_function
+
+import random
+import sys
+import time
+
+from stemtree import CompactNode
+
+
+def build(size, fanout=8):
+    nodes = [CompactNode(attrs={'name': 'root', 'kind': 'root'})]
+    for idx in range(1, size):
+        node = CompactNode(attrs={'name': 'n%d' % idx,
+            'kind': 'k%d' % (idx % 100)})
+        nodes[(idx - 1) // fanout].add_subnode(node)
+        nodes.append(node)
+    return nodes
+
+
+def timed(label, func, count):
+    start = time.time()
+    func()
+    elapsed = time.time() - start
+    print('%-26s %9.3f sec  %9.1f us/op' % (label, elapsed,
+        1e6 * elapsed / count))
+
+
+def main(size=1000000, lookups=100000, seed=0):
+    rand = random.Random(seed)
+    nodes = build(size)
+    root = nodes[0]
+    names = ['n%d' % rand.randrange(1, size) for _ in range(lookups)]
+
+    timed('scan lookups', lambda: [root.find_by('name', name) for name in
+        names[:3]], 3)
+    timed('create index', lambda: root.create_index('name', 'kind'), 1)
+    timed('indexed lookups', lambda: [root.find_by('name', name) for name
+        in names], lookups)
+    timed('indexed kind lookups', lambda: [root.find_by('kind', 'k7') for _
+        in range(100)], 100)
+
+    edited = [rand.choice(nodes) for _ in range(lookups)]
+    timed('renames with index', lambda: [setattr(node, 'name', 'x')
+        for node in edited], lookups)
+    root.drop_index()
+    timed('renames without index', lambda: [setattr(node, 'name', 'y')
+        for node in edited], lookups)
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
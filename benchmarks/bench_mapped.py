@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Open a large tree file and search a small region of it.
+
+Compares a full stemtree.serialize load with a memory-mapped file.
+
+Usage: PYTHONPATH=. python benchmarks/bench_mapped.py [nodes] [region]
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+import tempfile
+import time
+
+from stemtree import Node, DFS_LF
+from stemtree import serialize
+from stemtree.mapped import write, MappedTree
+
+
+def build(size, fanout=4):
+    root = Node(attrs={'name': 'root', 'order': 0})
+    nodes = [root]
+    for idx in range(1, size):
+        node = Node(attrs={'name': 'n%d' % idx, 'order': idx})
+        nodes[(idx - 1) // fanout].add_subnode(node)
+        nodes.append(node)
+    return root
+
+
+def region_search(start, stop):
+    def action(node, basket):
+        basket.append(node.name)
+    names = []
+    start.search(action, DFS_LF, basket=names, stopnode=stop)
+    return names
+
+
+def main(size=1000000, region=100):
+    root = build(size)
+    tmpdir = tempfile.mkdtemp()
+    flat = os.path.join(tmpdir, 'tree.bin')
+    mapped = os.path.join(tmpdir, 'tree.stm')
+    try:
+        with open(flat, 'wb') as stream:
+            serialize.dump(root, stream)
+        start = time.time()
+        write(root, mapped)
+        print('mapped write %8.3f sec' % (time.time() - start))
+        del root
+
+        start = time.time()
+        with open(flat, 'rb') as stream:
+            loaded = serialize.load(stream)
+        walked = list(loaded.walk())
+        names = region_search(walked[size // 2], walked[size // 2 + region])
+        print('load+search  %8.3f sec (%d nodes)' % (time.time() - start,
+            len(names)))
+        del loaded, walked
+
+        start = time.time()
+        with MappedTree(mapped) as tree:
+            names = region_search(tree.node(size // 2),
+                tree.node(size // 2 + region))
+            elapsed = time.time() - start
+        print('mmap+search  %8.3f sec (%d nodes)' % (elapsed, len(names)))
+    finally:
+        for path in (flat, mapped):
+            if os.path.exists(path):
+                os.remove(path)
+        os.rmdir(tmpdir)
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
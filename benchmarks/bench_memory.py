@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Memory per node of Node and CompactNode trees.
+
+Usage: PYTHONPATH=. python benchmarks/bench_memory.py [nodes] [fanout]
+"""
+
+from __future__ import print_function
+
+import gc
+import sys
+import time
+import tracemalloc
+
+from stemtree import Node, CompactNode
+
+
+def build(cls, size, fanout):
+    root = cls(attrs={'name': 'root'})
+    nodes = [root]
+    for idx in range(size - 1):
+        node = cls(attrs={'name': 'n%d' % idx})
+        nodes[idx // fanout].add_subnode(node)
+        nodes.append(node)
+    return root
+
+
+def measure(cls, size, fanout):
+    gc.collect()
+    tracemalloc.start()
+    start = time.time()
+    root = build(cls, size, fanout)
+    elapsed = time.time() - start
+    current = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # names are shared by both classes; count the tree only
+    names = sum(sys.getsizeof('n%d' % idx) for idx in range(size - 1))
+    return root, (current - names) / float(size), elapsed
+
+
+def main(size=10000000, fanout=4):
+    for cls in (Node, CompactNode):
+        root, pernode, elapsed = measure(cls, size, fanout)
+        print('%-12s %d nodes %7.1f bytes/node (built in %.1f sec)' % (
+            cls.__name__, size, pernode, elapsed))
+        del root
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Scaling of parallel_search with the number of worker processes.
+
+The action spends a fixed amount of CPU time on every node.
+
+Usage: PYTHONPATH=. python benchmarks/bench_parallel.py [nodes] [work]
+"""
+
+from __future__ import print_function
+
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from stemtree import Node, DFS_LF
+from stemtree.parallel import parallel_search
+
+WORK = 200
+
+
+def build(size, fanout=4):
+    root = Node(attrs={'name': 'root', 'order': 0})
+    nodes = [root]
+    for idx in range(1, size):
+        node = Node(attrs={'name': 'n%d' % idx, 'order': idx})
+        nodes[(idx - 1) // fanout].add_subnode(node)
+        nodes.append(node)
+    return root
+
+
+def analyse(node, basket):
+    value = node.order
+    for _ in range(WORK):
+        value = (value * 31 + 7) % 1000003
+    basket['total'] = basket.get('total', 0) + value
+
+
+def merge(first, second):
+    return {'total': first.get('total', 0) + second.get('total', 0)}
+
+
+def main(size=200000, work=200):
+    global WORK
+    WORK = work
+    root = build(size)
+
+    start = time.time()
+    expected = {}
+    root.search(analyse, DFS_LF, basket=expected)
+    print('serial     %7.2f sec' % (time.time() - start))
+
+    for workers in (1, 2, 4, 8):
+        with ProcessPoolExecutor(workers) as pool:
+            # start the workers before timing
+            list(pool.map(abs, range(workers)))
+            start = time.time()
+            basket = parallel_search(root, analyse, merge, depth=3,
+                executor=pool)
+            elapsed = time.time() - start
+        assert basket == expected
+        print('%d workers  %7.2f sec' % (workers, elapsed))
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
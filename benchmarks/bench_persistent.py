@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Memory and time of keeping tree versions with clone() and snapshots.
+
+Each version changes one attribute of a random node of the previous one.
+
+Usage: PYTHONPATH=. python benchmarks/bench_persistent.py [nodes] [versions]
+"""
+
+from __future__ import print_function
+
+import gc
+import random
+import sys
+import time
+import tracemalloc
+
+from stemtree import Node
+from stemtree.persistent import PersistentTree
+
+
+def build(size, fanout=4):
+    root = Node(attrs={'name': 'root'})
+    nodes = [root]
+    for idx in range(1, size):
+        node = Node(attrs={'name': 'n%d' % idx, 'order': idx})
+        nodes[(idx - 1) // fanout].add_subnode(node)
+        nodes.append(node)
+    return root
+
+
+def paths(root, count, seed=0):
+    # positions from the root to randomly chosen nodes
+    nodes = list(root.walk())
+    rand = random.Random(seed)
+    result = []
+    for node in rand.sample(nodes, count):
+        path = []
+        while node.uppernode is not None:
+            path.append(node._get_index())
+            node = node.uppernode
+        result.append(tuple(reversed(path)))
+    return result
+
+
+def with_clone(root, edits):
+    versions = [root]
+    for idx, path in enumerate(edits):
+        node = versions[-1].clone()
+        versions.append(node)
+        for index in path:
+            node = node.subnodes[index]
+        node.order = -idx
+    return versions
+
+
+def with_snapshots(tree, edits):
+    versions = [tree]
+    for idx, path in enumerate(edits):
+        tree = versions[-1].snapshot()
+        versions.append(tree)
+        tree.view(path).order = -idx
+    return versions
+
+
+def measure(func, first, edits):
+    # time without tracing, which slows down allocations
+    start = time.time()
+    func(first, edits)
+    elapsed = time.time() - start
+    gc.collect()
+    tracemalloc.start()
+    versions = func(first, edits)
+    current = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return versions, current, elapsed
+
+
+def edits_with_views(size, count):
+    # inserts near the end of a wide node while views of all its subnodes
+    # are alive; only the views after the insert move
+    wide = Node()
+    for idx in range(size):
+        wide.add_subnode(Node(attrs={'order': idx}))
+    root = PersistentTree.from_node(wide).root
+    views = list(root.subnodes)
+    start = time.time()
+    for _ in range(count):
+        root.add_subnode(Node(), len(root) - 1)
+    elapsed = time.time() - start
+    print('%-10s %d live views, %d inserts %13.3f ms/insert' % ('views',
+        len(views), count, 1000 * elapsed / count))
+
+
+def main(size=100000, count=20):
+    root = build(size)
+    edits = paths(root, count)
+    for label, func, first in (
+            ('clone', with_clone, root),
+            ('snapshot', with_snapshots, PersistentTree.from_node(root))):
+        versions, current, elapsed = measure(func, first, edits)
+        print('%-10s %d nodes x %d versions %10.1f KiB %7.3f sec' % (label,
+            size, count, current / 1024.0, elapsed))
+        del versions
+    edits_with_views(size, count)
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
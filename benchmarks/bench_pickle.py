@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Send a large tree to a worker process.
+
+Compares Node.__reduce_ex__ with the previous per-node __getstate__ state.
+
+Usage: PYTHONPATH=. python benchmarks/bench_pickle.py [nodes] [shared]
+"""
+
+from __future__ import print_function
+
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from stemtree import Node
+
+
+def build(size, fanout=4):
+    root = Node(attrs={'name': 'root', 'order': 0})
+    nodes = [root]
+    for idx in range(1, size):
+        node = Node(attrs={'name': 'n%d' % idx, 'order': idx})
+        nodes[(idx - 1) // fanout].add_subnode(node)
+        nodes.append(node)
+    return root
+
+
+def count(root):
+    return sum(1 for _ in root.walk())
+
+
+def transfer(pool, root):
+    start = time.time()
+    size = pool.submit(count, root).result()
+    return size, time.time() - start
+
+
+def main(size=500000, shared=100):
+    root = build(size)
+    Node._shared_attrs.update(('shared%d' % idx, idx) for idx in
+        range(shared))
+
+    with ProcessPoolExecutor(1) as pool:
+        pool.submit(count, Node()).result()
+
+        reduce_ex = Node.__reduce_ex__
+        Node.__reduce_ex__ = object.__reduce_ex__
+        try:
+            result, elapsed = transfer(pool, root)
+            print('per-node state %7.2f sec (%d nodes)' % (elapsed, result))
+        finally:
+            Node.__reduce_ex__ = reduce_ex
+
+        result, elapsed = transfer(pool, root)
+        print('__reduce_ex__  %7.2f sec (%d nodes)' % (elapsed, result))
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Memory and time of projecting random node sets of one tree, compared
+with cloning the tree and assembling the copies.
+
+Usage: PYTHONPATH=. python benchmarks/bench_projection.py [nodes] [projections]
+"""
+
+from __future__ import print_function
+
+import gc
+import random
+import sys
+import time
+import tracemalloc
+
+from stemtree import Node
+from stemtree.algorithm import assemble_subtrees, project_subtrees
+
+
+def build(size, fanout=4):
+    nodes = [Node(attrs={'name': 'root'})]
+    for idx in range(1, size):
+        node = Node(attrs={'name': 'n%d' % idx, 'order': idx})
+        nodes[(idx - 1) // fanout].add_subnode(node)
+        nodes.append(node)
+    return nodes
+
+
+def with_clone(root, samples):
+    forests = []
+    for sample in samples:
+        memo = {}
+        root.clone(memo=memo)
+        forests.append(assemble_subtrees([memo[id(n)] for n in sample]))
+    return forests
+
+
+def with_projection(root, samples):
+    return [project_subtrees(sample) for sample in samples]
+
+
+def measure(func, root, samples):
+    gc.collect()
+    start = time.time()
+    func(root, samples)
+    elapsed = time.time() - start
+    gc.collect()
+    tracemalloc.start()
+    result = func(root, samples)
+    # the rest of the copies is garbage once collected
+    gc.collect()
+    kept = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return elapsed, kept
+
+
+def main(size=100000, projections=4, seed=0):
+    nodes = build(size)
+    rand = random.Random(seed)
+    for fraction in (0.1, 0.5):
+        samples = [rand.sample(nodes, int(size * fraction)) for _ in
+            range(projections)]
+        for func in (with_clone, with_projection):
+            elapsed, kept = measure(func, nodes[0], samples)
+            print('%3d%% x %d  %-16s %7.3f sec  %8.1f MB' % (fraction * 100,
+                projections, func.__name__, elapsed, kept / 1e6))
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
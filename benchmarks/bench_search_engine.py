@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Node.search with the built-in DFS moves versus the exception-driven moves.
+
+Usage: PYTHONPATH=. python benchmarks/bench_search_engine.py [nodes] [fanout]
+"""
+
+from __future__ import print_function
+
+import sys
+import time
+
+from stemtree import Node, DFS_LF, DFS_RF
+from stemtree.node import (UpperNodeException, StopNodeException,
+    SiblingNodeException)
+
+
+def legacy_DFS_LF(node, basket, stopnode):
+    """Exception-driven DFS_LF as shipped in stemtree 0.1.0."""
+
+    if len(node.subnodes) > 0:
+        newnode = node.subnodes[0]
+    else:
+        newnode = node
+        while type(node) == type(newnode):
+            try:
+                newnode = newnode._get_rightnode(stopnode=stopnode)
+                break
+            except (UpperNodeException, StopNodeException):
+                newnode = None
+            except SiblingNodeException:
+                newnode = newnode.uppernode
+
+    return newnode
+
+
+def legacy_DFS_RF(node, basket, stopnode):
+    """Exception-driven DFS_RF as shipped in stemtree 0.1.0."""
+
+    if len(node.subnodes) > 0:
+        newnode = node.subnodes[-1]
+    else:
+        newnode = node
+        while type(node) == type(newnode):
+            try:
+                newnode = newnode._get_leftnode(stopnode=stopnode)
+                break
+            except (UpperNodeException, StopNodeException):
+                newnode = None
+            except SiblingNodeException:
+                newnode = newnode.uppernode
+
+    return newnode
+
+
+def build(size, fanout):
+    root = Node()
+    nodes = [root]
+    idx = 0
+    while len(nodes) < size:
+        node = Node()
+        nodes[idx // fanout].add_subnode(node)
+        nodes.append(node)
+        idx += 1
+    return root
+
+
+def count(node, basket):
+    basket['count'] += 1
+
+
+def timeit(root, move):
+    basket = {'count': 0}
+    start = time.time()
+    root.search(count, move, basket=basket)
+    return time.time() - start, basket['count']
+
+
+def main(size=1000000, fanout=4):
+    root = build(size, fanout)
+    for label, legacy, move in (('DFS_LF', legacy_DFS_LF, DFS_LF),
+                                ('DFS_RF', legacy_DFS_RF, DFS_RF)):
+        old, n1 = timeit(root, legacy)
+        new, n2 = timeit(root, move)
+        assert n1 == n2 == size
+        print('%s %d nodes: exceptions %.3f sec, engine %.3f sec (%.1fx)' % (
+            label, size, old, new, old / new))
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
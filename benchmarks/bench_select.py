@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Attribute filtering with a search callback versus Node.select.
+
+Usage: PYTHONPATH=. python benchmarks/bench_select.py [nodes] [fanout]
+"""
+
+from __future__ import print_function
+
+import sys
+import time
+
+from stemtree import Node, DFS_LF
+from stemtree.columnar import TreeStore
+from stemtree import query
+
+
+def build(size, fanout):
+    root = Node(attrs={'kind': 'k0', 'size': 0})
+    nodes = [root]
+    for idx in range(1, size):
+        node = Node(attrs={'kind': 'k%d' % (idx % 10), 'size': idx % 100})
+        nodes[(idx - 1) // fanout].add_subnode(node)
+        nodes.append(node)
+    return root
+
+
+def collect(node, basket):
+    if node.kind == 'k3' and node.size > 50:
+        basket['found'].append(node)
+
+
+def where(columns):
+    size = columns['size']
+    if query.numpy is not None:
+        return size > 50
+    return [value > 50 for value in size]
+
+
+def main(size=1000000, fanout=4):
+    print('NumPy: %s' % ('yes' if query.numpy is not None else 'no'))
+    root = build(size, fanout)
+
+    basket = {'found': []}
+    start = time.time()
+    root.search(collect, DFS_LF, basket=basket)
+    print('%-22s %.3f sec' % ('search callback', time.time() - start))
+
+    start = time.time()
+    found = root.select(kind='k3', where=where)
+    print('%-22s %.3f sec' % ('Node.select', time.time() - start))
+    assert found == basket['found']
+
+    view = TreeStore.from_node(root).root
+    start = time.time()
+    found = view.select(kind='k3', where=where, indices=True)
+    print('%-22s %.3f sec' % ('NodeView.select', time.time() - start))
+    assert len(found) == len(basket['found'])
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
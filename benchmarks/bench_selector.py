@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Time selector queries against hand-written searches on a program-like
+tree.
+
+Usage: PYTHONPATH=. python benchmarks/bench_selector.py [functions] [repeat]
+"""
+
+from __future__ import print_function
+
+import random
+import sys
+import time
+
+from stemtree import Node, DFS_LF
+
+
+def build(functions, seed=0):
+    rand = random.Random(seed)
+    root = Node(attrs={'kind': 'module', 'name': 'main'})
+    for idx in range(functions):
+        function = Node(attrs={'kind': 'function', 'name': 'f%d' % idx})
+        root.add_subnode(function)
+        stack = [function]
+        for _ in range(rand.randint(20, 60)):
+            upper = rand.choice(stack)
+            kind = rand.choice(['loop', 'if', 'call', 'call', 'assign',
+                'name'])
+            node = Node(attrs={'kind': kind, 'name': rand.choice('xyz') +
+                str(rand.randint(0, 99))})
+            upper.add_subnode(node)
+            if kind in ('loop', 'if'):
+                stack.append(node)
+    return root
+
+
+def calls_in_loops(node, basket):
+    if node.kind == 'call' and node.name.startswith('x') and \
+        any(n.kind == 'loop' for n in node.get_uppernodes()):
+        basket['nodes'].append(node)
+
+
+def loops_in_functions(node, basket):
+    if node.kind == 'loop' and node.uppernode is not None and \
+        node.uppernode.kind == 'function' and \
+        node.uppernode.uppernode is basket['root']:
+        basket['nodes'].append(node)
+
+
+def timed(label, func, repeat):
+    start = time.time()
+    for _ in range(repeat):
+        result = func()
+    print('%-40s %7.3f sec  %6d nodes' % (label, (time.time() - start) /
+        repeat, len(result)))
+    return result
+
+
+def search(root, action):
+    basket = {'nodes': [], 'root': root}
+    root.search(action, DFS_LF, basket=basket)
+    return basket['nodes']
+
+
+def main(functions=5000, repeat=3):
+    root = build(functions)
+    print('%d nodes' % len(list(root.walk())))
+
+    first = timed('search: calls under loops', lambda: search(root,
+        calls_in_loops), repeat)
+    second = timed("query 'loop call[name^=x]'", lambda: root.query(
+        'loop call[name^=x]'), repeat)
+    assert first == second
+    first = timed('search: loops right under functions', lambda: search(
+        root, loops_in_functions), repeat)
+    second = timed("query '> function > loop'", lambda: root.query(
+        '> function > loop'), repeat)
+    assert first == second
+
+    root.create_index('kind')
+    timed("indexed query 'loop call[name^=x]'", lambda: root.query(
+        'loop call[name^=x]'), repeat)
+    timed("indexed query '> function > loop'", lambda: root.query(
+        '> function > loop'), repeat)
+    root.drop_index()
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Compare stemtree.serialize with pickle on a large tree.
+
+Usage: PYTHONPATH=. python benchmarks/bench_serialize.py [nodes] [fanout]
+"""
+
+from __future__ import print_function
+
+import os
+import pickle
+import sys
+import tempfile
+import time
+
+from stemtree import Node
+from stemtree import serialize
+
+
+def build(size, fanout):
+    root = Node(attrs={'name': 'root', 'order': 0})
+    nodes = [root]
+    for idx in range(1, size):
+        node = Node(attrs={'name': 'n%d' % idx, 'order': idx})
+        nodes[(idx - 1) // fanout].add_subnode(node)
+        nodes.append(node)
+    return root
+
+
+def run(label, dump, load, root, path):
+    start = time.time()
+    with open(path, 'wb') as stream:
+        dump(root, stream)
+    dumped = time.time() - start
+    start = time.time()
+    with open(path, 'rb') as stream:
+        loaded = load(stream)
+    elapsed = time.time() - start
+    print('%-10s dump %6.2f sec  load %6.2f sec  %8.1f MiB' % (label, dumped,
+        elapsed, os.path.getsize(path) / 1048576.0))
+    return loaded
+
+
+def main(size=1000000, fanout=4):
+    root = build(size, fanout)
+    fd, path = tempfile.mkstemp()
+    os.close(fd)
+    try:
+        run('pickle', lambda node, stream: pickle.dump(node, stream,
+            pickle.HIGHEST_PROTOCOL), pickle.load, root, path)
+        run('serialize', serialize.dump, serialize.load, root, path)
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Time a declaration-only search that skips function bodies, against
+one that visits every node.
+
+Usage: PYTHONPATH=. python benchmarks/bench_skip.py [functions] [body]
+"""
+
+from __future__ import print_function
+
+import sys
+import time
+
+from stemtree import Node, CompactNode, DFS_LF, BFS_LF
+
+
+def build(functions, body, nodetype=Node):
+    root = nodetype(attrs={'kind': 'module'})
+    for idx in range(functions):
+        function = nodetype(attrs={'kind': 'function', 'name': 'f%d' % idx})
+        root.add_subnode(function)
+        for _ in range(4):
+            function.add_subnode(nodetype(attrs={'kind': 'argument'}))
+        block = nodetype(attrs={'kind': 'body'})
+        function.add_subnode(block)
+        statement = block
+        for pos in range(body):
+            # statements nested a few levels deep
+            node = nodetype(attrs={'kind': 'statement'})
+            (block if pos % 4 == 0 else statement).add_subnode(node)
+            statement = node
+    return root
+
+
+def declarations(node, basket):
+    basket['visited'] += 1
+    if node.kind == 'function':
+        basket['functions'] += 1
+    elif node.kind == 'body':
+        return node.SKIP_SUBTREE
+
+
+def visit_all(node, basket):
+    basket['visited'] += 1
+    if node.kind == 'function':
+        basket['functions'] += 1
+
+
+def timed(label, root, action, move):
+    basket = {'visited': 0, 'functions': 0}
+    start = time.time()
+    root.search(action, move, basket=basket)
+    print('%-32s %9.3f sec  %8d visited  %6d functions' % (label,
+        time.time() - start, basket['visited'], basket['functions']))
+
+
+def main(functions=2000, body=200):
+    for nodetype in (Node, CompactNode):
+        root = build(functions, body, nodetype)
+        name = nodetype.__name__
+        timed('%s DFS_LF all' % name, root, visit_all, DFS_LF)
+        timed('%s DFS_LF skip bodies' % name, root, declarations, DFS_LF)
+        timed('%s BFS_LF skip bodies' % name, root, declarations, BFS_LF)
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Time duplicate subtree detection by pairwise comparison and by
+structural hashes, and measure persistent trees with hash-consed records.
+
+Usage: PYTHONPATH=. python benchmarks/bench_structural.py [expressions] [pairwise]
+"""
+
+from __future__ import print_function
+
+import random
+import sys
+import time
+import tracemalloc
+
+from stemtree import Node
+from stemtree.persistent import PersistentTree
+from stemtree.structural import (duplicate_subtrees, same_subtree,
+    HashConsTable)
+
+
+def expression(rand, depth):
+    if depth == 0 or rand.random() < 0.3:
+        return Node(attrs={'kind': 'name', 'name': rand.choice('abcdefgh')})
+    node = Node(attrs={'kind': 'op', 'op': rand.choice('+-*/')})
+    node.add_subnode(expression(rand, depth - 1))
+    node.add_subnode(expression(rand, depth - 1))
+    return node
+
+
+def build(size, seed=0):
+    rand = random.Random(seed)
+    root = Node(attrs={'kind': 'module'})
+    for _ in range(size):
+        root.add_subnode(expression(rand, 5))
+    return root
+
+
+def pairwise(root, min_size):
+    nodes = [n for n in root.walk('postorder') if
+        sum(1 for _ in n.walk()) >= min_size]
+    groups = []
+    for node in nodes:
+        for group in groups:
+            if same_subtree(group[0], node):
+                group.append(node)
+                break
+        else:
+            groups.append([node])
+    return [group for group in groups if len(group) > 1]
+
+
+def timed(label, func):
+    start = time.time()
+    result = func()
+    print('%-26s %9.3f sec  %6d groups' % (label, time.time() - start,
+        len(result)))
+
+
+def measured(label, func):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = func()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    print('%-26s %9.1f MB' % (label, used / 1e6))
+    return result
+
+
+def main(expressions=20000, pairwise_expressions=300):
+    small = build(pairwise_expressions)
+    timed('pairwise (%d)' % pairwise_expressions, lambda: pairwise(small, 3))
+    timed('hashed (%d)' % pairwise_expressions,
+        lambda: duplicate_subtrees(small, min_size=3))
+
+    root = build(expressions)
+    timed('hashed (%d)' % expressions,
+        lambda: duplicate_subtrees(root, min_size=3))
+    plain = measured('persistent records', lambda:
+        PersistentTree.from_node(root))
+    table = HashConsTable()
+    consed = measured('hash-consed records', lambda:
+        PersistentTree.from_node(root, table))
+    print('%-26s %9d of %d' % ('interned records', len(table),
+        sum(1 for _ in root.walk())))
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Throughput of Node.walk orders versus Node.search with DFS_LF/BFS_LF.
+
+Usage: PYTHONPATH=. python benchmarks/bench_walk.py [nodes] [fanout]
+"""
+
+from __future__ import print_function
+
+import sys
+import time
+
+from stemtree import Node, DFS_LF, BFS_LF
+
+
+def build(size, fanout):
+    root = Node()
+    nodes = [root]
+    for idx in range(size - 1):
+        node = Node()
+        nodes[idx // fanout].add_subnode(node)
+        nodes.append(node)
+    return root
+
+
+def count(node, basket):
+    basket['count'] += 1
+
+
+def main(size=1000000, fanout=4):
+    root = build(size, fanout)
+
+    basket = {'count': 0}
+    start = time.time()
+    root.search(count, DFS_LF, basket=basket)
+    base = time.time() - start
+    print('%-22s %.3f sec' % ('search + DFS_LF', base))
+
+    for order in ('preorder', 'postorder', 'levelorder'):
+        start = time.time()
+        visited = 0
+        for node in root.walk(order):
+            visited += 1
+        elapsed = time.time() - start
+        assert visited == basket['count'] == size
+        print('%-22s %.3f sec (%.1fx)' % ('walk(%s)' % order, elapsed,
+            base / elapsed))
+
+    basket = {'count': 0}
+    start = time.time()
+    root.search(count, BFS_LF, basket=basket)
+    assert basket['count'] == size
+    print('%-22s %.3f sec' % ('search + BFS_LF', time.time() - start))
+
+    for maxdepth in (1, 2, 4):
+        start = time.time()
+        visited = sum(len(level) for level in root.iter_levels(maxdepth=maxdepth))
+        print('%-24s %.6f sec (%d nodes)' % ('iter_levels(maxdepth=%d)' %
+            maxdepth, time.time() - start, visited))
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
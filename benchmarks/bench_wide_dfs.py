@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Full-tree DFS over a wide tree (one root with many leaf subnodes).
+
+Usage: PYTHONPATH=. python benchmarks/bench_wide_dfs.py [max_number_of_subnodes]
+"""
+
+from __future__ import print_function
+
+import sys
+import time
+
+from stemtree import Node, DFS_LF, DFS_RF
+
+
+def build(width):
+    root = Node()
+    for _ in range(width):
+        root.add_subnode(Node())
+    return root
+
+
+def count(node, basket):
+    basket['count'] += 1
+
+
+def main(maxwidth=1000000):
+    width = 1000
+    while width <= maxwidth:
+        root = build(width)
+        for move in (DFS_LF, DFS_RF):
+            basket = {'count': 0}
+            start = time.time()
+            root.search(count, move, basket=basket)
+            elapsed = time.time() - start
+            assert basket['count'] == width + 1
+            print('%-7s %9d nodes %8.3f sec %8.3f usec/node' % (
+                move.__name__, width + 1, elapsed, 1e6 * elapsed / (width + 1)))
+        width *= 10
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
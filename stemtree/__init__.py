@@ -6,5 +6,5 @@ __author__ = """Youngsung Kim"""
 __email__ = 'grnydawn@gmail.com'
 __version__ = '0.1.0'
 
-from .node import Node, DFS_LF, DFS_RF, UPWARDS, NO_SEARCH
+from .node import Node, CompactNode, DFS_LF, DFS_RF, BFS_LF, BFS_RF, UPWARDS, NO_SEARCH
 #from .algorithm import assemble_subtrees
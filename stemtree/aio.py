@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+from builtins import *
+
+"""asyncio traversals for Stemtree (Python 3.6 or later).
+
+awalk() and asearch() work like Node.walk and Node.search but give control
+back to the event loop every `every` nodes, so that long traversals can
+interleave with I/O. asearch() awaits the results of action, move, premove
+and postmove when they are awaitable.
+
+Neither holds the read lock of the locking mode across awaits; awalk()
+still detects changes by other threads.
+"""
+
+import asyncio
+from inspect import isawaitable
+
+from .search import stepper, _under
+
+# nodes between two yields to the event loop
+EVERY = 1000
+
+async def awalk(node, order='preorder', reverse=False, every=EVERY, **kwargs):
+    """Asynchronously yield the nodes of node.walk(order, reverse, ...)."""
+
+    count = 0
+    for item in node.walk(order, reverse=reverse, **kwargs):
+        yield item
+        count += 1
+        if count >= every:
+            count = 0
+            await asyncio.sleep(0)
+
+async def asearch(node, action, move, basket={}, premove=None, postmove=None,
+    stopnode=None, every=EVERY):
+    """Asynchronous counterpart of node.search(action, move, ...)."""
+
+    top = node
+    if premove is not None:
+        node = premove(node, basket)
+        if isawaitable(node):
+            node = await node
+
+    steps = stepper(move)
+    if steps is not None:
+        steps = steps(node, stopnode)
+        node = next(steps)
+
+    count = 0
+    while type(node) == type(top):
+        result = action(node, basket)
+        if isawaitable(result):
+            result = await result
+        if result == top.STOP_SEARCH:
+            break
+        skip = result == top.SKIP_SUBTREE
+        if steps is not None:
+            node = steps.send(skip)
+        elif skip and node is stopnode:
+            node = None
+        elif skip:
+            # as search.skip_subtree, with awaited moves
+            moved = node
+            within = None if stopnode is not None and \
+                _under(stopnode, moved) else stopnode
+            while True:
+                node = move(node, basket, within)
+                if isawaitable(node):
+                    node = await node
+                if type(node) != type(top) or not _under(node, moved):
+                    break
+        else:
+            node = move(node, basket, stopnode)
+            if isawaitable(node):
+                node = await node
+        if node is stopnode: break
+        count += 1
+        if count >= every:
+            count = 0
+            await asyncio.sleep(0)
+
+    if postmove is not None:
+        node = postmove(node, basket)
+        if isawaitable(node):
+            node = await node
+    return node
@@ -6,78 +6,135 @@ from builtins import *
 """Tree Algorithms for Stemtree.
 """
 
-def assemble_subtrees(*nodeset):
-    trees = []
-
-    # append node in a tree
-    def append(trees, node):
-
-        # setup 
-        if not hasattr(node, '_subnodes'):
-            node._subnodes = [None for _ in range(len(node.subnodes))]
-        if not hasattr(node, '_uppernode'):
-            node._uppernode = None
-
-        # add a root of one of trees if node is uppernode
-        for idx, tnode in enumerate(trees):
-            if tnode.uppernode is node:
-                tnode._uppernode = node
-                node._subnodes[node.subnodes.index(tnode)] = tnode
-                trees[idx] = node
-                return
-
-        # collect uppernodes of node
-        uppernodes = []
-        uppernode = node
-        while uppernode is not None:
-            uppernodes.append(uppernode)
-            uppernode = uppernode.uppernode
-
-        # attach node into a tree
-        for tnode in trees:
-            try:
-                idx = uppernodes.index(tnode)
-                connected = True
-                for unode in reversed(uppernodes[1:idx]):
-                    if unode in tnode._subnodes:
-                        tnode = unode
-                    else:
-                        connected = False
-                        break
-                if connected:
-                    tnode._subnodes[tnode.subnodes.index(node)] = node
-                    node._uppernode = tnode
-                    return
-            except ValueError:
-                pass
-
-        # new root node
-        trees.append(node)
-
-
-    def switch(tree):
-        tree.uppernode = tree._uppernode
-        tree.subnodes = []
-        for snode in tree._subnodes:
-            if snode is not None:
-                tree.subnodes.append(switch(snode))
-        return tree
-
-    # main routine
+from .node import NodeBase
+
+def _given(nodeset):
+    # given nodes in order, by id with their first position
+    ordered, position = [], {}
     for nodes in nodeset:
         try:
-            for node in nodes:
-                append(trees, node)
+            nodes = iter(nodes)
         except TypeError:
-            append(trees, node)
+            nodes = [nodes]
+        for node in nodes:
+            if id(node) not in position:
+                position[id(node)] = len(ordered)
+                ordered.append(node)
+    return ordered, position
+
+def _roots(ordered, position):
+    # find the root of each node; the first node reaching a root decides
+    # the place of its tree
+    trees, roots = [], {}
+    for node in ordered:
+        path = []
+        while id(node) not in roots:
+            path.append(node)
+            uppernode = node.uppernode
+            if id(uppernode) not in position:
+                roots[id(node)] = node
+                trees.append(node)
+                break
+            node = uppernode
+        root = roots[id(node)]
+        for node in path:
+            roots[id(node)] = root
+    return trees
+
+def assemble_subtrees(*nodeset, **kwargs):
+    """Rebuild the given nodes into a forest and return its roots.
+
+    nodeset holds iterables of nodes or single nodes. A node keeps its
+    uppernode if that is given too and the given nodes among its subnodes,
+    in order; roots are ordered by the first given node of their trees.
+    The nodes are changed in place unless project is true; see
+    project_subtrees.
+    """
+
+    if kwargs.pop('project', False):
+        return project_subtrees(*nodeset, **kwargs)
+    if kwargs:
+        raise TypeError("Unexpected keyword arguments: %s"%
+            ', '.join(sorted(kwargs)))
 
-    # reduce trees
-    _trees = []
-    for tree in trees:
-        append(_trees, tree)
+    ordered, position = _given(nodeset)
+    trees = _roots(ordered, position)
 
     # replace subnodes and uppernode
-    for tree in _trees:
-        switch(tree)
+    subnodes = [[subnode for subnode in node.subnodes if id(subnode) in
+        position] for node in ordered]
+    for node, kept in zip(ordered, subnodes):
+        if id(node.uppernode) not in position:
+            node.uppernode = None
+        node.subnodes = kept
+        node._reindex_subnodes()
+
+    return trees
+
+def project_subtrees(*nodeset):
+    """Return the roots of the forest assemble_subtrees would build, made
+    of ProjectionNode objects; the given nodes are not changed."""
+
+    ordered, position = _given(nodeset)
+    projected = [ProjectionNode(node) for node in ordered]
+    for node, projection in zip(ordered, projected):
+        subnodes = [projected[position[id(subnode)]] for subnode in
+            node.subnodes if id(subnode) in position]
+        if subnodes:
+            object.__setattr__(projection, 'subnodes', subnodes)
+            for index, subnode in enumerate(subnodes):
+                object.__setattr__(subnode, 'uppernode', projection)
+                object.__setattr__(subnode, '_index', index)
+    return [projected[position[id(root)]] for root in
+        _roots(ordered, position)]
+
+
+class ProjectionNode(NodeBase):
+    """Node of a projection forest standing for a node of another tree.
+
+    Attributes are read from and written to the original node; uppernode
+    and subnodes belong to the projection.
+    """
+
+    __slots__ = ('origin', 'uppernode', 'subnodes', '_index')
+
+    def __init__(self, origin, uppernode=None, index=None):
+        object.__setattr__(self, 'origin', origin)
+        object.__setattr__(self, 'uppernode', uppernode)
+        object.__setattr__(self, 'subnodes', ())
+        object.__setattr__(self, '_index', index)
+
+    @property
+    def _attrs(self):
+        return self.origin._attrs
+
+    @property
+    def _methods(self):
+        return self.origin._methods
+
+    def __getattr__(self, name):
+        if name in ProjectionNode.__slots__:
+            raise AttributeError(name)
+        return getattr(self.origin, name)
+
+    def __setattr__(self, name, value):
+        if name in ('uppernode', 'subnodes', '_index'):
+            object.__setattr__(self, name, value)
+        elif name == 'origin':
+            raise AttributeError("'%s' attribute is not mutable."%name)
+        else:
+            setattr(self.origin, name, value)
+
+    def __delattr__(self, name):
+        delattr(self.origin, name)
+
+    def __getstate__(self):
+        return dict((name, getattr(self, name)) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            object.__setattr__(self, name, value)
 
-    return _trees
+    def _clone_node(self, deferred, uppernode=None, index=None):
+        # a copy of a projection stands for the same nodes
+        return self.__class__(self.origin, uppernode, index)
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+from builtins import *
+
+"""Ancestry index for Stemtree.
+
+An AncestryIndex numbers the nodes under a root in preorder and keeps their
+depths and subtree sizes, so that ancestry, depth and postorder questions
+take O(1). Lowest common ancestors come from a sparse table of minimum
+depths over preorder ranges: O(n log n) to build on the first lca() call,
+O(1) per query.
+
+The index watches the edits of node methods and is rebuilt on the next
+query after an edit inside its tree. Direct changes of subnodes lists need
+invalidate().
+"""
+
+from array import array
+
+from .node import NodeBase
+
+class AncestryIndex(object):
+
+    def __init__(self, root):
+
+        self.root = root
+        self.invalidate()
+        NodeBase.watch(self)
+
+    def close(self):
+        """Stop watching edits; the index is no longer kept current."""
+
+        NodeBase.unwatch(self)
+
+    def invalidate(self):
+        self._stale = True
+        self._nodes = self._numbers = None
+        self._table = None
+
+    def node_changed(self, event, *args):
+        if event in ('add', 'remove') and not self._stale and \
+            id(args[0]) in self._numbers:
+            self.invalidate()
+
+    def _build(self):
+
+        # parents as reached from the root; uppernode may disagree after
+        # item assignment
+        nodes, parents = [], array('l')
+        stack = [(self.root, -1)]
+        while stack:
+            node, parent = stack.pop()
+            stack.extend((subnode, len(nodes)) for subnode in
+                reversed(node.subnodes))
+            nodes.append(node)
+            parents.append(parent)
+        numbers = dict((id(node), number) for number, node in
+            enumerate(nodes))
+        depths = array('l', [0]) * len(nodes)
+        sizes = array('l', [1]) * len(nodes)
+        for number in range(1, len(nodes)):
+            depths[number] = depths[parents[number]] + 1
+        for number in range(len(nodes) - 1, 0, -1):
+            sizes[parents[number]] += sizes[number]
+
+        self._nodes, self._numbers = nodes, numbers
+        self._parents, self._depths, self._sizes = parents, depths, sizes
+        self._table = None
+        self._stale = False
+
+    def _number(self, node):
+        if self._stale:
+            self._build()
+        try:
+            return self._numbers[id(node)]
+        except KeyError:
+            raise ValueError("%s is not under %s."%(node, self.root))
+
+    def __len__(self):
+        if self._stale:
+            self._build()
+        return len(self._nodes)
+
+    def __contains__(self, node):
+        if self._stale:
+            self._build()
+        return id(node) in self._numbers
+
+    def node(self, number):
+        """Return the node with a preorder number."""
+
+        if self._stale:
+            self._build()
+        return self._nodes[number]
+
+    def preorder_number(self, node):
+        return self._number(node)
+
+    def postorder_number(self, node):
+        number = self._number(node)
+        # nodes before it in preorder that are not above it, then those
+        # below it
+        return number - self._depths[number] + self._sizes[number] - 1
+
+    def depth(self, node):
+        """Return the number of uppernodes of node up to the root."""
+
+        number = self._number(node)
+        return self._depths[number]
+
+    def subtree_size(self, node):
+        """Return the number of nodes in the tree under node."""
+
+        number = self._number(node)
+        return self._sizes[number]
+
+    def is_ancestor(self, ancestor, node):
+        """Return True if ancestor is above node."""
+
+        first, number = self._number(ancestor), self._number(node)
+        return first < number < first + self._sizes[first]
+
+    def lca(self, first, second):
+        """Return the lowest node that first and second are both under or
+        one of them."""
+
+        start, end = self._number(first), self._number(second)
+        if start == end:
+            return first
+        if start > end:
+            start, end = end, start
+        if end < start + self._sizes[start]:
+            return self._nodes[start]
+
+        # the least deep node of the preorder range after start up to end
+        # is a subnode of the lowest common ancestor
+        if self._table is None:
+            self._build_table()
+        level = (end - start).bit_length() - 1
+        row, depths = self._table[level], self._depths
+        left, right = row[start + 1], row[end - (1 << level) + 1]
+        lowest = left if depths[left] <= depths[right] else right
+        return self._nodes[self._parents[lowest]]
+
+    def _build_table(self):
+        # row k holds the least deep number in [i, i + 2**k)
+        depths = self._depths
+        row = array('l', range(len(depths)))
+        table = [row]
+        span = 1
+        while 2 * span <= len(depths):
+            prev = row
+            row = array('l', [a if depths[a] <= depths[b] else b for a, b in
+                zip(prev, prev[span:])])
+            table.append(row)
+            span *= 2
+        self._table = table
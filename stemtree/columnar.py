@@ -0,0 +1,438 @@
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+from builtins import *
+
+"""Columnar tree storage for Stemtree.
+
+A TreeStore keeps the structure of a tree in integer arrays indexed by node
+number and the node attributes in one column per attribute name. NodeView
+objects give Node-like access to single nodes and are created on demand.
+"""
+
+import weakref
+from array import array
+from copy import deepcopy
+
+from .node import NodeBase, Node, _bind, _ATOMIC_TYPES, _is_immutable
+from .locking import writes
+from .search import DFS_LF, DFS_RF, UPWARDS, NO_SEARCH
+from .query import Columns, evaluate
+
+NONE = -1
+
+# marks a node without a value in an attribute column
+_MISSING = object()
+
+class TreeStore(object):
+
+    def __init__(self):
+
+        self.parents = array('l')
+        self.firsts = array('l')
+        self.lasts = array('l')
+        self.nexts = array('l')
+        self.prevs = array('l')
+        self.positions = array('l')
+        self.columns = {}
+        self._init_views()
+
+    @classmethod
+    def from_node(cls, node, names=None):
+        """Copy the tree under node into a new store; node becomes 0."""
+
+        store = cls()
+        stack = [(node, NONE)]
+        while stack:
+            node, parent = stack.pop()
+            attrs = node._attrs or {}
+            if names is not None:
+                attrs = dict((n, attrs[n]) for n in names if n in attrs)
+            index = store.add(parent, attrs)
+            stack.extend((subnode, index) for subnode in
+                reversed(node.subnodes))
+        return store
+
+    def __len__(self):
+        return len(self.parents)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_views']
+        del state['_purge_at']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_views()
+
+    def add(self, parent=NONE, attrs=None):
+        """Append a node as the last subnode of parent; return its index."""
+
+        index = len(self.parents)
+        self.parents.append(parent)
+        self.firsts.append(NONE)
+        self.lasts.append(NONE)
+        self.nexts.append(NONE)
+        if parent == NONE:
+            self.prevs.append(NONE)
+            self.positions.append(0)
+        else:
+            last = self.lasts[parent]
+            self.prevs.append(last)
+            if last == NONE:
+                self.firsts[parent] = index
+                self.positions.append(0)
+            else:
+                self.nexts[last] = index
+                self.positions.append(self.positions[last] + 1)
+            self.lasts[parent] = index
+
+        for name, column in self.columns.items():
+            column.append(_MISSING)
+        if attrs:
+            for name, value in attrs.items():
+                self.set(index, name, value)
+
+        return index
+
+    # attributes
+    def column(self, name):
+        if name not in self.columns:
+            self.columns[name] = [_MISSING] * len(self.parents)
+        return self.columns[name]
+
+    def get(self, index, name, default=None):
+        try:
+            value = self.columns[name][index]
+        except KeyError:
+            return default
+        return default if value is _MISSING else value
+
+    def has(self, index, name):
+        return name in self.columns and \
+            self.columns[name][index] is not _MISSING
+
+    def set(self, index, name, value):
+        self.column(name)[index] = value
+
+    def unset(self, index, name):
+        if not self.has(index, name):
+            raise KeyError(name)
+        self.columns[name][index] = _MISSING
+
+    def attrs(self, index):
+        return dict((name, column[index]) for name, column in
+            self.columns.items() if column[index] is not _MISSING)
+
+    # structure
+    def subnodes(self, index):
+        subnodes = []
+        child = self.firsts[index]
+        while child != NONE:
+            subnodes.append(child)
+            child = self.nexts[child]
+        return subnodes
+
+    def uppernodes(self, index):
+        parent = self.parents[index]
+        while parent != NONE:
+            yield parent
+            parent = self.parents[parent]
+
+    def dfs_move(self, index, stopindex=NONE, reverse=False, skip=False):
+        """Return the index DFS_LF (DFS_RF if reverse) moves to or NONE;
+        skip passes over the subtree of index."""
+
+        firsts, siblings = (self.lasts, self.prevs) if reverse else \
+            (self.firsts, self.nexts)
+        parents = self.parents
+
+        if not skip:
+            child = firsts[index]
+            if child != NONE:
+                return child
+        elif index == stopindex:
+            return NONE
+
+        while True:
+            parent = parents[index]
+            if parent == NONE or parent == stopindex:
+                return NONE
+            sibling = siblings[index]
+            if sibling != NONE:
+                return NONE if sibling == stopindex else sibling
+            index = parent
+
+    def preorder(self, index=0, reverse=False):
+        """Yield the indices of the subtree of index in preorder."""
+
+        firsts, siblings = (self.lasts, self.prevs) if reverse else \
+            (self.firsts, self.nexts)
+        parents = self.parents
+        top = index
+        while index != NONE:
+            yield index
+            child = firsts[index]
+            if child != NONE:
+                index = child
+                continue
+            while index != top and siblings[index] == NONE:
+                index = parents[index]
+            index = NONE if index == top else siblings[index]
+
+    # conversions
+    def _init_views(self):
+        # weak references to live views; dead ones are purged when the
+        # table has doubled since the last purge
+        self._views = {}
+        self._purge_at = 1024
+
+    def view(self, index):
+        ref = self._views.get(index)
+        view = ref() if ref is not None else None
+        if view is None:
+            view = NodeView(self, index)
+            if len(self._views) >= self._purge_at:
+                self._purge_views()
+            self._views[index] = weakref.ref(view)
+        return view
+
+    def _purge_views(self):
+        views = self._views
+        for index in [i for i, ref in views.items() if ref() is None]:
+            del views[index]
+        self._purge_at = max(1024, 2 * len(views))
+
+    @property
+    def root(self):
+        return self.view(0)
+
+    def to_node(self, index=0, cls=Node):
+        """Build a tree of cls nodes from the subtree of index."""
+
+        root = cls(attrs=self.attrs(index))
+        stack = [(index, root)]
+        while stack:
+            index, node = stack.pop()
+            for child in self.subnodes(index):
+                subnode = cls(attrs=self.attrs(child))
+                node.add_subnode(subnode)
+                stack.append((child, subnode))
+        return root
+
+
+class StoreColumns(Columns):
+    """Attribute columns of store nodes given by their indices."""
+
+    def __init__(self, store, indices, shared_attrs):
+        super(StoreColumns, self).__init__(indices, shared_attrs)
+        self.store = store
+
+    def values_of(self, name):
+        default = self.shared_attrs.get(name)
+        column = self.store.columns.get(name)
+        if column is None:
+            return [default] * len(self.nodes)
+        return [default if value is _MISSING else value for value in
+            [column[index] for index in self.nodes]]
+
+
+class NodeView(NodeBase):
+    """Node-like view of one node in a TreeStore.
+
+    Views of the same node are the same object while any of them is alive.
+    Structure changes other than add_subnode are not supported.
+    """
+
+    __slots__ = ('_store', '_nid', '__weakref__')
+
+    def __init__(self, store, index):
+        object.__setattr__(self, '_store', store)
+        object.__setattr__(self, '_nid', index)
+
+    @property
+    def store_index(self):
+        return self._nid
+
+    @property
+    def uppernode(self):
+        parent = self._store.parents[self._nid]
+        return None if parent == NONE else self._store.view(parent)
+
+    @property
+    def subnodes(self):
+        view = self._store.view
+        return [view(child) for child in self._store.subnodes(self._nid)]
+
+    @property
+    def _attrs(self):
+        return self._store.attrs(self._nid)
+
+    _methods = None
+
+    def _get_index(self):
+        return self._store.positions[self._nid]
+
+    def __getattr__(self, name):
+
+        if name in ('_store', '_nid'):
+            raise AttributeError(name)
+
+        value = self._store.get(self._nid, name, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        shared_attrs = self._shared_attrs
+        if name in shared_attrs:
+            return shared_attrs[name]
+
+        shared_methods = self._shared_methods
+        if name in shared_methods:
+            return _bind(shared_methods[name], self)
+
+        raise AttributeError("%s object has no attribute '%s'."% (
+            self.__class__.__name__, name))
+
+    def __setattr__(self, name, value):
+
+        if any(name in cls.__dict__ for cls in self.__class__.__mro__):
+            raise AttributeError("'%s' attribute is not mutable."%name)
+        elif callable(value):
+            raise AttributeError("%s does not support node methods."%
+                self.__class__.__name__)
+        self._store.set(self._nid, name, value)
+
+    def __delattr__(self, name):
+        try:
+            self._store.unset(self._nid, name)
+        except KeyError:
+            raise AttributeError(name)
+
+    def __len__(self):
+        return len(self._store.subnodes(self._nid))
+
+    def __getitem__(self, key):
+        return self.subnodes[key]
+
+    def __reduce__(self):
+        return (_view_at, (self._store, self._nid))
+
+    def clone(self, memo=None, subtrees=None):
+        """Return the root view of a new TreeStore with a copy of this
+        subtree; as with Node.clone, immutable attribute values are shared
+        and the others deep-copied."""
+
+        if subtrees is not None:
+            raise TypeError("%s does not support cloning subtrees."%
+                self.__class__.__name__)
+        if memo is None:
+            memo = {}
+        if id(self) in memo:
+            return memo[id(self)]
+
+        source, store = self._store, TreeStore()
+        indices, deferred = {}, []
+        for index in source.preorder(self._nid):
+            attrs = source.attrs(index)
+            added = indices[index] = store.add(NONE if index == self._nid
+                else indices[source.parents[index]], attrs)
+            for name, value in attrs.items():
+                if type(value) not in _ATOMIC_TYPES and \
+                    not _is_immutable(value):
+                    deferred.append((added, name, value))
+            # values referring to live views get the views of the copy
+            ref = source._views.get(index)
+            view = ref() if ref is not None else None
+            if view is not None:
+                memo[id(view)] = store.view(added)
+
+        top = memo[id(self)] = store.view(0)
+        for added, name, value in deferred:
+            store.set(added, name, deepcopy(value, memo))
+        return top
+
+    # node manipulation
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("%s only supports add_subnode."%
+            self.__class__.__name__)
+
+    __setitem__ = __delitem__ = pop_subnode = _readonly
+    insert_after = insert_before = _readonly
+
+    @writes
+    def add_subnode(self, node, index=None):
+        """Copy the tree under node into the store as the last subnode."""
+
+        if index:
+            self._readonly()
+
+        store = self._store
+        stack = [(node, self._nid)]
+        while stack:
+            node, parent = stack.pop()
+            child = store.add(parent, node._attrs)
+            stack.extend((subnode, child) for subnode in
+                reversed(node.subnodes))
+
+    def get_uppernodes(self):
+        view = self._store.view
+        for parent in self._store.uppernodes(self._nid):
+            yield view(parent)
+
+    def walk(self, order='preorder', reverse=False, **kwargs):
+        if order == 'preorder' and not kwargs:
+            view = self._store.view
+            return (view(i) for i in self._store.preorder(self._nid, reverse))
+        return NodeBase.walk(self, order, reverse=reverse, **kwargs)
+
+    def iter_preorder(self, reverse=False):
+        return self.walk(reverse=reverse)
+
+    def select(self, where=None, indices=False, **match):
+        """Like Node.select; indices are store indices."""
+
+        store = self._store
+        nodes = list(store.preorder(self._nid))
+        columns = StoreColumns(store, nodes, self._shared_attrs)
+        nodes = [nodes[pos] for pos in evaluate(columns, len(nodes), where,
+            match)]
+        return nodes if indices else [store.view(index) for index in nodes]
+
+    def search(self, action, move, basket={}, premove=None, postmove=None, stopnode=None):
+
+        node = premove(self, basket) if premove is not None else self
+
+        store = self._store
+        if move not in (DFS_LF, DFS_RF, UPWARDS, NO_SEARCH) or \
+            not isinstance(node, NodeView) or node._store is not store or \
+            (stopnode is not None and (not isinstance(stopnode, NodeView) or
+                stopnode._store is not store)):
+            return NodeBase.search(self, action, move, basket=basket,
+                premove=lambda n, b: node, postmove=postmove,
+                stopnode=stopnode)
+
+        # the built-in moves on store indices
+        stopindex = NONE if stopnode is None else stopnode._nid
+        index = node._nid
+        view, dfs_move, parents = store.view, store.dfs_move, store.parents
+        while node is not None:
+            result = action(node, basket)
+            if result == self.STOP_SEARCH: break
+            if move is DFS_LF:
+                index = dfs_move(index, stopindex, False,
+                    result == self.SKIP_SUBTREE)
+            elif move is DFS_RF:
+                index = dfs_move(index, stopindex, True,
+                    result == self.SKIP_SUBTREE)
+            elif move is UPWARDS:
+                index = NONE if index == stopindex else parents[index]
+            else:
+                index = NONE
+            node = None if index == NONE else view(index)
+            if node is stopnode: break
+
+        return postmove(node, basket) if postmove is not None else  node
+
+def _view_at(store, index):
+    return store.view(index)
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+from builtins import *
+
+"""Derived attributes for Stemtree.
+
+A derived attribute is computed bottom-up from a node and the values of its
+subnodes, and cached for every node under the node asked:
+
+    @derived(attrs=('value',))
+    def total(node, values):
+        return node.value + sum(values)
+
+    total(root)                 # or root.get_derived('total')
+
+The cache watches the edits of node methods. Added and removed subtrees and
+the assignment or deletion of the attributes named in attrs drop the cached
+values of the node edited and of its uppernodes, so the next query after an
+edit recomputes O(depth) nodes instead of the tree; the values of removed
+subtrees are dropped. Changes the watchers do not see, such as direct
+changes of subnodes lists or of shared attributes, need invalidate().
+"""
+
+import weakref
+
+from .node import NodeBase
+
+# derived attributes by name
+_registry = {}
+
+_MISSING = object()
+
+class DerivedAttribute(object):
+
+    def __init__(self, func, name=None, attrs=()):
+
+        self.func = func
+        self.name = name or func.__name__
+        self.attrs = None if attrs is None else frozenset(attrs)
+        self._clear()
+        NodeBase.watch(self)
+
+    def __repr__(self):
+        return "DerivedAttribute(%r)"%self.name
+
+    def close(self):
+        """Stop watching edits and drop the cached values."""
+
+        NodeBase.unwatch(self)
+        self._clear()
+        if _registry.get(self.name) is self:
+            del _registry[self.name]
+
+    def _clear(self):
+        # values by weak references to their nodes, so that the cache does
+        # not keep trees alive; nodes without weak references (e.g.
+        # MappedNode) are held with their values by id
+        self._values = weakref.WeakKeyDictionary()
+        self._pinned = {}
+
+    def _get(self, node):
+        try:
+            return self._values.get(node, _MISSING)
+        except TypeError:
+            return self._pinned.get(id(node), (None, _MISSING))[1]
+
+    def _set(self, node, value):
+        try:
+            self._values[node] = value
+        except TypeError:
+            self._pinned[id(node)] = (node, value)
+
+    def _pop(self, node):
+        try:
+            return self._values.pop(node, _MISSING)
+        except TypeError:
+            return self._pinned.pop(id(node), (None, _MISSING))[1]
+
+    def __call__(self, node):
+        """Return the value of node, computing the uncached ones below."""
+
+        value = self._get(node)
+        if value is not _MISSING:
+            return value
+
+        # postorder over the nodes without a value, with the values of the
+        # subnodes on a stack
+        func, get = self.func, self._get
+        values = []
+        stack = [(node, None)]
+        while stack:
+            item, count = stack.pop()
+            if count is None:
+                value = get(item)
+                if value is not _MISSING:
+                    values.append(value)
+                    continue
+                subnodes = item.subnodes
+                stack.append((item, len(subnodes)))
+                stack.extend([(subnode, None) for subnode in
+                    reversed(subnodes)])
+                continue
+            subvalues = values[len(values)-count:]
+            del values[len(values)-count:]
+            value = func(item, subvalues)
+            self._set(item, value)
+            values.append(value)
+        return values[0]
+
+    def __contains__(self, node):
+        return self._get(node) is not _MISSING
+
+    def invalidate(self, node=None):
+        """Drop the values of node and its uppernodes, or all values."""
+
+        if node is None:
+            self._clear()
+            return
+        while node is not None and self._pop(node) is not _MISSING:
+            node = node.uppernode
+
+    def _discard(self, top):
+        # values of a removed subtree; nodes without a value have none below
+        stack = [top]
+        while stack:
+            node = stack.pop()
+            if self._pop(node) is not _MISSING:
+                stack.extend(node.subnodes)
+
+    def node_changed(self, event, *args):
+
+        if event == 'set' or event == 'delete':
+            if self.attrs is None or args[1] in self.attrs:
+                self.invalidate(args[0])
+        else:
+            self.invalidate(args[0])
+            if event == 'remove':
+                self._discard(args[1])
+
+def derived(name=None, attrs=()):
+    """Return a decorator registering func(node, values) as the derived
+    attribute name (func's name by default); values are those of the
+    subnodes of node. A change of an attribute in attrs, or of any attribute
+    if attrs is None, invalidates the value of its node."""
+
+    def decorate(func):
+        attribute = DerivedAttribute(func, name, attrs)
+        previous = _registry.get(attribute.name)
+        if previous is not None:
+            previous.close()
+        _registry[attribute.name] = attribute
+        return attribute
+    return decorate
+
+def get_derived(node, name):
+    try:
+        attribute = _registry[name]
+    except KeyError:
+        raise ValueError("No derived attribute named '%s'."%name)
+    return attribute(node)
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+from builtins import *
+
+"""Attribute indexes for Stemtree.
+
+An AttributeIndex maps the values of chosen attribute names to the nodes
+under a root that have them, so that Node.find_by takes O(1) on average.
+It watches the edits of node methods: added and removed subtrees and
+attribute assignment and deletion keep it current. Only attributes of the
+nodes themselves are indexed; shared attributes and unhashable values are
+not, and queries for unhashable values scan the tree.
+
+The watchers of edits are global (see NodeBase.watch): every index is told
+of the edits of every tree and drops those outside its own in O(1), so
+each edit costs O(number of indexes) more.
+
+Indexes are created with Node.create_index and live until Node.drop_index.
+"""
+
+from .node import NodeBase
+from .search import preorder
+
+# indexes by the id of their root
+_indexes = {}
+
+_MISSING = object()
+
+class AttributeIndex(object):
+
+    def __init__(self, root, names=()):
+
+        self.root = root
+        self._members = {}
+        self._buckets = {}
+        self._add(root)
+        for name in names:
+            self.add_name(name)
+        NodeBase.watch(self)
+
+    def close(self):
+        """Stop watching edits; the index is no longer kept current."""
+
+        NodeBase.unwatch(self)
+
+    @property
+    def names(self):
+        return list(self._buckets)
+
+    def __len__(self):
+        return len(self._members)
+
+    def __contains__(self, node):
+        return id(node) in self._members
+
+    def add_name(self, name):
+        if name not in self._buckets:
+            buckets = self._buckets[name] = {}
+            for node in self._members.values():
+                _insert(buckets, node, name)
+
+    def drop_name(self, name):
+        self._buckets.pop(name, None)
+
+    def find(self, name, value):
+        try:
+            bucket = self._buckets[name].get(value)
+        except TypeError:
+            # unhashable values are not indexed
+            return _scan(self.root, name, value)
+        return list(bucket.values()) if bucket else []
+
+    def _add(self, top):
+        members, buckets = self._members, self._buckets
+        for node in preorder(top):
+            if id(node) not in members:
+                members[id(node)] = node
+                for name in buckets:
+                    _insert(buckets[name], node, name)
+
+    def _remove(self, top):
+        members, buckets = self._members, self._buckets
+        for node in preorder(top):
+            if members.pop(id(node), None) is not None:
+                for name in buckets:
+                    _discard(buckets[name], node, name)
+
+    def node_changed(self, event, *args):
+
+        if event == 'set' or event == 'delete':
+            node, name = args[:2]
+            buckets = self._buckets.get(name)
+            if buckets is not None and id(node) in self._members:
+                _discard(buckets, node, name)
+                if event == 'set':
+                    _insert(buckets, node, name, args[2])
+        elif id(args[0]) in self._members:
+            if event == 'add':
+                self._add(args[1])
+            elif event == 'remove':
+                self._remove(args[1])
+
+def _insert(buckets, node, name, value=_MISSING):
+    if value is _MISSING:
+        attrs = node._attrs
+        if not attrs or name not in attrs:
+            return
+        value = attrs[name]
+    try:
+        bucket = buckets.get(value)
+    except TypeError:
+        # unhashable values are not indexed
+        return
+    if bucket is None:
+        bucket = buckets[value] = {}
+    bucket[id(node)] = node
+
+def _discard(buckets, node, name):
+    attrs = node._attrs
+    if not attrs or name not in attrs:
+        return
+    value = attrs[name]
+    try:
+        bucket = buckets.get(value)
+    except TypeError:
+        return
+    if bucket is not None:
+        bucket.pop(id(node), None)
+        if not bucket:
+            del buckets[value]
+
+def create_index(root, names):
+    index = _indexes.get(id(root))
+    if index is None:
+        index = _indexes[id(root)] = AttributeIndex(root, names)
+    else:
+        for name in names:
+            index.add_name(name)
+    return index
+
+def drop_index(root, names=()):
+    index = _indexes.get(id(root))
+    if index is None:
+        return
+    for name in names:
+        index.drop_name(name)
+    if not names or not index.names:
+        del _indexes[id(root)]
+        index.close()
+
+def find_by(root, name, value):
+    index = _indexes.get(id(root))
+    if index is not None and name in index._buckets:
+        return index.find(name, value)
+    return _scan(root, name, value)
+
+def _scan(root, name, value):
+    nodes = []
+    for node in preorder(root):
+        attrs = node._attrs
+        if attrs and attrs.get(name, _MISSING) == value:
+            nodes.append(node)
+    return nodes
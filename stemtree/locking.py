@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+from builtins import *
+
+"""Reader/writer locking mode for Stemtree.
+
+enable_locking() gives all node classes one RWLock. In locking mode:
+
+- structural edits (add_subnode, pop_subnode, insert_after, insert_before,
+  item assignment and deletion) and updates of the shared tables take the
+  write lock,
+- search() holds the read lock while it runs, so its action may not edit
+  the tree unless the thread holds the write lock already, e.g. with
+  node.writing(),
+- walk() and the iter_* traversals check the version of their tree at
+  every step and raise ConcurrentModificationError when another thread has
+  edited the tree since the traversal started; node.reading() keeps writers
+  out for longer than one call.
+
+Attribute reads and writes are not locked. Locking is off by default.
+"""
+
+import threading
+import weakref
+from contextlib import contextmanager
+from functools import wraps
+
+class ConcurrentModificationError(RuntimeError):
+    pass
+
+class RWLock(object):
+    """Reader/writer lock; waiting writers go before new readers.
+
+    Both locks are reentrant and the thread holding the write lock may also
+    read. The read lock cannot be upgraded. version counts the times the
+    write lock was taken; the versions of trees count the writes to them.
+    """
+
+    def __init__(self):
+
+        self._cond = threading.Condition(threading.Lock())
+        self._local = threading.local()
+        self._readers = 0
+        self._writing = False
+        self._waiting = 0
+        self.version = 0
+        # [writes, writes by thread] by the root nodes of edited trees
+        self._trees = weakref.WeakKeyDictionary()
+
+    def _state(self):
+        local = self._local
+        if not hasattr(local, 'reads'):
+            local.reads = local.writes = local.modified = 0
+            local.ident = threading.current_thread().ident
+        return local
+
+    def _touch(self, node, local):
+        # count a write to the tree of node; only the writing thread
+        # changes the counts
+        if node is None or isinstance(node, type):
+            return
+        root = _root(node)
+        try:
+            entry = self._trees.get(root)
+        except TypeError:
+            # no weak references; the global version covers the tree
+            return
+        if entry is None:
+            entry = self._trees[root] = [0, {}]
+        entry[0] += 1
+        entry[1][local.ident] = entry[1].get(local.ident, 0) + 1
+
+    def acquire_read(self):
+        local = self._state()
+        if local.reads or local.writes:
+            local.reads += 1
+            return
+        with self._cond:
+            while self._writing or self._waiting:
+                self._cond.wait()
+            self._readers += 1
+        local.reads = 1
+
+    def release_read(self):
+        local = self._state()
+        local.reads -= 1
+        if local.reads or local.writes:
+            return
+        with self._cond:
+            self._readers -= 1
+            if not self._readers:
+                self._cond.notify_all()
+
+    def acquire_write(self, node=None):
+        local = self._state()
+        if local.writes:
+            local.writes += 1
+            self._touch(node, local)
+            return
+        if local.reads:
+            raise RuntimeError("Cannot take the write lock while holding "
+                "the read lock.")
+        with self._cond:
+            self._waiting += 1
+            try:
+                while self._writing or self._readers:
+                    self._cond.wait()
+            finally:
+                self._waiting -= 1
+            self._writing = True
+            self.version += 1
+        local.writes = 1
+        local.modified += 1
+        self._touch(node, local)
+
+    def release_write(self):
+        local = self._state()
+        local.writes -= 1
+        if local.writes:
+            return
+        with self._cond:
+            self._writing = False
+            if local.reads:
+                # still reading after the write lock nested a read
+                self._readers += 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def read(self):
+        self.acquire_read()
+        try:
+            yield self
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write(self, node=None):
+        self.acquire_write(node)
+        try:
+            yield self
+        finally:
+            self.release_write()
+
+    def foreign_version(self, root=None):
+        """Return the number of times other threads took the write lock, or
+        wrote to the tree of the root node root."""
+
+        local = self._state()
+        if root is None:
+            return self.version - local.modified
+        try:
+            entry = self._trees.get(root)
+        except TypeError:
+            return self.version - local.modified
+        return entry[0] - entry[1].get(local.ident, 0) if entry else 0
+
+def _root(node):
+    from .node import NodeBase
+    upper = node.uppernode
+    while isinstance(upper, NodeBase):
+        node, upper = upper, upper.uppernode
+    return node
+
+class _Unlocked(object):
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc):
+        return False
+
+UNLOCKED = _Unlocked()
+
+# (class, name, attribute) of the methods replaced by enable_locking()
+_replaced = []
+
+def writes(method):
+    """Mark method to run under the write lock in locking mode."""
+
+    method._writes = True
+    return method
+
+def _locked(method):
+    @wraps(method)
+    def locked(self, *args, **kwargs):
+        lock = self._lock
+        lock.acquire_write(self)
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            lock.release_write()
+    return locked
+
+def enable_locking():
+    """Turn on locking mode for all node classes; return the lock.
+
+    The methods marked with writes() are replaced with locking ones in the
+    node classes defined so far, so that they cost nothing while locking is
+    off.
+    """
+
+    from .node import NodeBase
+    if NodeBase._lock is not None:
+        return NodeBase._lock
+
+    # set first: the replaced methods expect a lock
+    NodeBase._lock = RWLock()
+    classes, seen = [NodeBase], set()
+    while classes:
+        cls = classes.pop()
+        if cls in seen:
+            continue
+        seen.add(cls)
+        classes.extend(cls.__subclasses__())
+        for name, value in list(vars(cls).items()):
+            method = getattr(value, '__func__', value)
+            if getattr(method, '_writes', False):
+                locked = _locked(method)
+                setattr(cls, name, classmethod(locked) if
+                    isinstance(value, classmethod) else locked)
+                _replaced.append((cls, name, value))
+    return NodeBase._lock
+
+def disable_locking():
+    from .node import NodeBase
+    while _replaced:
+        cls, name, value = _replaced.pop()
+        setattr(cls, name, value)
+    NodeBase._lock = None
+
+def checked(items, lock, node=None):
+    """Yield from items; raise ConcurrentModificationError when another
+    thread wrote to the tree of node, or took the write lock, in between."""
+
+    root = None if node is None else _root(node)
+    version = lock.foreign_version(root)
+    for item in items:
+        if lock.foreign_version(root) != version:
+            raise ConcurrentModificationError("Tree changed by another "
+                "thread during iteration.")
+        yield item
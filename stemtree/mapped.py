@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+from builtins import *
+
+"""Memory-mapped read-only trees for Stemtree.
+
+write() stores a tree in a file that MappedTree opens with mmap. The file
+holds one fixed-size record per node in preorder (uppernode, subtree size,
+position in the uppernode and the place of the pickled attributes) so that
+any node can be reached without reading the others. MappedNode objects are
+created when a node is first reached and decode their attributes when they
+are first read.
+"""
+
+import io
+import mmap
+import pickle
+import struct
+from array import array
+
+from .node import NodeBase, _bind
+from .search import preorder, DFS_LF, UPWARDS, NO_SEARCH
+from .serialize import dump, load, _numbers, _Pickler, _Unpickler
+
+MAGIC = b'STEMMAP1'
+NONE = -1
+
+_HEADER = struct.Struct('<8sqqq')
+_RECORD = struct.Struct('<qqqqq')
+
+def write(node, filename, protocol=pickle.HIGHEST_PROTOCOL):
+    """Write the tree under node to a file that MappedTree can open."""
+
+    nodes = list(preorder(node))
+    numbers = _numbers(nodes)
+    parents = array('q', [NONE])
+    positions = array('q', [0])
+    for item in nodes[1:]:
+        parents.append(numbers[id(item.uppernode)])
+        positions.append(item._get_index())
+    sizes = array('q', [1]) * len(nodes)
+    for number in range(len(nodes) - 1, 0, -1):
+        sizes[parents[number]] += sizes[number]
+
+    with open(filename, 'wb') as stream:
+        stream.write(b'\0' * _HEADER.size)
+
+        # attributes and methods, one pickle per node
+        offsets, lengths = array('q'), array('q')
+        buf = io.BytesIO()
+        pickler = _Pickler(buf, protocol, numbers)
+        offset = _HEADER.size
+        for item in nodes:
+            if item._attrs or item._methods:
+                buf.seek(0)
+                buf.truncate()
+                pickler.clear_memo()
+                pickler.dump((item._attrs or None, item._methods or None))
+                data = buf.getvalue()
+                stream.write(data)
+                offsets.append(offset)
+                lengths.append(len(data))
+                offset += len(data)
+            else:
+                offsets.append(0)
+                lengths.append(0)
+
+        table = offset
+        for start in range(0, len(nodes), 8192):
+            stream.write(b''.join(_RECORD.pack(parents[i], sizes[i],
+                positions[i], offsets[i], lengths[i]) for i in
+                range(start, min(start + 8192, len(nodes)))))
+
+        shared = table + _RECORD.size * len(nodes)
+        pickle.dump((node._shared_attrs, node._shared_methods), stream,
+            protocol)
+
+        stream.seek(0)
+        stream.write(_HEADER.pack(MAGIC, len(nodes), table, shared))
+
+
+class MappedTree(object):
+    """Read-only tree in a file written by write()."""
+
+    def __init__(self, filename):
+
+        self._file = open(filename, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0,
+                access=mmap.ACCESS_READ)
+            magic, size, table, shared = _HEADER.unpack_from(self._map, 0)
+            if magic != MAGIC:
+                raise ValueError("Not a stemtree mapped file: %s"%filename)
+        except Exception:
+            self._file.close()
+            raise
+
+        self._size = size
+        self._table = table
+        self._nodes = {}
+
+        shared_attrs, shared_methods = pickle.loads(self._map[shared:])
+        NodeBase._update_shared(shared_attrs, shared_methods)
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, index):
+        return self.node(index)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._nodes = {}
+        self._map.close()
+        self._file.close()
+
+    @property
+    def root(self):
+        return self.node(0)
+
+    def node(self, index):
+        node = self._nodes.get(index)
+        if node is None:
+            if not 0 <= index < self._size:
+                raise IndexError("node index out of range")
+            node = self._nodes[index] = MappedNode(self, index,
+                _RECORD.unpack_from(self._map, self._table +
+                _RECORD.size * index))
+        return node
+
+    def _record(self, index):
+        node = self._nodes.get(index)
+        if node is not None:
+            return node._record
+        return _RECORD.unpack_from(self._map, self._table +
+            _RECORD.size * index)
+
+    def _dfs_move(self, index, stop=NONE, skip=False):
+        """Return the index DFS_LF moves to from index or NONE, as
+        search._dfs_steps does; skip passes over the subtree of index."""
+
+        record = self._record(index)
+        if not skip and record[1] > 1:
+            # the first subnode, also when it is the stopnode
+            return index + 1
+        if skip and index == stop:
+            return NONE
+        while True:
+            parent = record[0]
+            if parent == NONE or parent == stop:
+                return NONE
+            upper = self._record(parent)
+            sibling = index + record[1]
+            if sibling < parent + upper[1]:
+                return NONE if sibling == stop else sibling
+            index, record = parent, upper
+
+    def _tables(self, offset, length):
+        if not length:
+            return None, None
+        return _Unpickler(io.BytesIO(self._map[offset:offset+length]),
+            self).load()
+
+
+class MappedNode(NodeBase):
+    """Read-only Node-like view of one node in a MappedTree."""
+
+    __slots__ = ('_tree', '_nid', '_record', '_tables')
+
+    def __init__(self, tree, index, record):
+        object.__setattr__(self, '_tree', tree)
+        object.__setattr__(self, '_nid', index)
+        object.__setattr__(self, '_record', record)
+
+    @property
+    def tree_index(self):
+        return self._nid
+
+    @property
+    def uppernode(self):
+        parent = self._record[0]
+        return None if parent == NONE else self._tree.node(parent)
+
+    def _subnode_indices(self):
+        index = self._nid + 1
+        end = self._nid + self._record[1]
+        node = self._tree.node
+        while index < end:
+            yield index
+            index += node(index)._record[1]
+
+    @property
+    def subnodes(self):
+        node = self._tree.node
+        return [node(index) for index in self._subnode_indices()]
+
+    def _get_tables(self):
+        try:
+            return self._tables
+        except AttributeError:
+            tables = self._tree._tables(*self._record[3:])
+            object.__setattr__(self, '_tables', tables)
+            return tables
+
+    @property
+    def _attrs(self):
+        return self._get_tables()[0] or {}
+
+    @property
+    def _methods(self):
+        return self._get_tables()[1]
+
+    def _get_index(self):
+        return self._record[2]
+
+    def __getattr__(self, name):
+
+        if name in MappedNode.__slots__:
+            raise AttributeError(name)
+
+        attrs, methods = self._get_tables()
+        if attrs and name in attrs:
+            return attrs[name]
+
+        if methods and name in methods:
+            return _bind(methods[name], self)
+
+        shared_attrs = self._shared_attrs
+        if name in shared_attrs:
+            return shared_attrs[name]
+
+        shared_methods = self._shared_methods
+        if name in shared_methods:
+            return _bind(shared_methods[name], self)
+
+        raise AttributeError("%s object has no attribute '%s'."% (
+            self.__class__.__name__, name))
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("%s is read-only."%self.__class__.__name__)
+
+    __setattr__ = __delattr__ = __setitem__ = __delitem__ = _readonly
+    add_subnode = pop_subnode = insert_after = insert_before = _readonly
+
+    def __len__(self):
+        return sum(1 for _ in self._subnode_indices())
+
+    def __getitem__(self, key):
+        return self.subnodes[key]
+
+    def clone(self, memo=None, subtrees=None):
+        """Return a Node copy of this subtree."""
+
+        stream = io.BytesIO()
+        dump(self, stream)
+        stream.seek(0)
+        node = load(stream)
+        if memo is not None:
+            memo[id(self)] = node
+        return node
+
+    def get_uppernodes(self):
+        parent = self._record[0]
+        while parent != NONE:
+            node = self._tree.node(parent)
+            yield node
+            parent = node._record[0]
+
+    def walk(self, order='preorder', reverse=False, **kwargs):
+        if order == 'preorder' and not reverse and not kwargs:
+            node = self._tree.node
+            return (node(index) for index in
+                range(self._nid, self._nid + self._record[1]))
+        return NodeBase.walk(self, order, reverse=reverse, **kwargs)
+
+    def iter_preorder(self, reverse=False):
+        return self.walk(reverse=reverse)
+
+    def search(self, action, move, basket={}, premove=None, postmove=None, stopnode=None):
+
+        node = premove(self, basket) if premove is not None else self
+
+        tree = self._tree
+        if move not in (DFS_LF, UPWARDS, NO_SEARCH) or \
+            not isinstance(node, MappedNode) or node._tree is not tree or \
+            (stopnode is not None and (not isinstance(stopnode, MappedNode)
+                or stopnode._tree is not tree)):
+            return NodeBase.search(self, action, move, basket=basket,
+                premove=lambda n, b: node, postmove=postmove,
+                stopnode=stopnode)
+
+        # DFS_LF moves to the next record in preorder unless it climbs to
+        # stopnode or the next record is stopnode after a climb
+        stop = NONE if stopnode is None else stopnode._nid
+        while node is not None:
+            result = action(node, basket)
+            if result == self.STOP_SEARCH: break
+            index = node._nid
+            if move is DFS_LF:
+                index = tree._dfs_move(index, stop,
+                    result == self.SKIP_SUBTREE)
+            elif move is UPWARDS:
+                index = NONE if index == stop else node._record[0]
+            else:
+                index = NONE
+            node = None if index == NONE else tree.node(index)
+            if node is stopnode: break
+
+        return postmove(node, basket) if postmove is not None else  node
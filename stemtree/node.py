@@ -10,8 +10,14 @@ from builtins import *
 """
 
 import types
+import weakref
 from copy import copy, deepcopy
 
+from .search import (DFS_LF, DFS_RF, BFS_LF, BFS_RF, UPWARDS, NO_SEARCH,
+    ORDERS, stepper, skip_subtree, preorder, postorder, levelorder, levels)
+from .query import select
+from .locking import writes, checked, UNLOCKED
+
 # Node provides infrastructure, not feature
 # Node attribute is dictionary or dictionary-like user object
 # Node methods are replacable in part or as a whole
@@ -21,7 +27,39 @@ from copy import copy, deepcopy
 # - Node creation/modification/deletion
 
 import sys
-sys.setrecursionlimit(1999)
+
+if sys.version_info[0] > 2:
+    _bind = types.MethodType
+else:
+    def _bind(func, obj):
+        return types.MethodType(func, obj, obj.__class__)
+
+# attribute values of these types are shared, not copied, by clone()
+_ATOMIC_TYPES = frozenset([type(None), bool, int, float, complex, str, bytes,
+    type, range])
+
+def _is_immutable(value):
+    stack = [value]
+    while stack:
+        value = stack.pop()
+        kind = type(value)
+        if kind in _ATOMIC_TYPES:
+            continue
+        elif kind is not tuple and kind is not frozenset:
+            return False
+        stack.extend(item for item in value if
+            type(item) not in _ATOMIC_TYPES)
+    return True
+
+def _clone_attrs(attrs, deferred):
+    """Return a copy of attrs sharing the immutable values; the others are
+    added to deferred for deep copying."""
+
+    attrs = dict(attrs)
+    for name, attr in attrs.items():
+        if type(attr) not in _ATOMIC_TYPES and not _is_immutable(attr):
+            deferred.append((attrs, name, attr))
+    return attrs
 
 class UpperNodeException(Exception):
     pass
@@ -32,173 +70,45 @@ class StopNodeException(Exception):
 class SiblingNodeException(Exception):
     pass
 
-class Node(object):
+class NodeBase(object):
+    """Tree structure, navigation and search shared by node classes.
 
-    STOP_SEARCH = -1
+    Subclasses provide the storage: uppernode, subnodes, _index and the
+    dynamic attribute and method tables.
+    """
 
-    #__slots__ = ['_attrs', '_methods', 'uppernode', 'subnodes']
+    __slots__ = ()
+
+    STOP_SEARCH = -1
+    SKIP_SUBTREE = -2
 
     _shared_attrs = {}
     _shared_methods = {}
 
-    def __init__(self, uppernode=None, subnodes=None, attrs=None, methods=None,
-        shared_attrs=None, shared_methods=None):
-
-        object.__setattr__(self, '_attrs', attrs if attrs else {})
-        object.__setattr__(self, '_methods', methods if methods else {})
+    # RWLock of the locking mode, see stemtree.locking
+    _lock = None
 
-        if shared_attrs:
-            self._shared_attrs.update(shared_attrs)
-        if shared_methods:
-            self._shared_methods.update(shared_methods)
+    # weak references to the watchers of edits, see watch()
+    _watchers = ()
 
-        self.uppernode = uppernode
-        self.subnodes = subnodes if subnodes else []
-
-    # attributes
-#    def __getattribute__(self, name):
-    def __getattr__(self, name):
-#
-#        import pdb; pdb.set_trace()
-#        try:
-#            return  self._attrs[name]
-#        except:
-#            pass
-#
-#        try:
-#            return types.MethodType(self._methods[name], self, Node)
-#        except:
-#            try:
-#                return types.MethodType(self._methods[name], self)
-#            except:
-#                pass
-#
-#        try:
-#            return  self._shared_attrs[name]
-#        except:
-#            pass
-#
-#        try:
-#            return types.MethodType(self._shared_methods[name], self, Node)
-#        except:
-#            try:
-#                return types.MethodType(self._shared_methods[name], self)
-#            except:
-#                pass
-
-#        try:
-#            return object.__getattribute__(self, "_attrs")[name]
-#        except:
-#            try:
-#                return types.MethodType(object.__getattribute__(self, "_methods")[name], self, Node)
-#            except:
-#                try:
-#                    return types.MethodType(object.__getattribute__(self, "_methods")[name], self)
-#                except:
-#                    try:
-#                        return object.__getattribute__(self, "_shared_attrs")[name]
-#                    except:
-#                        try:
-#                            return types.MethodType(object.__getattribute__(self, "_shared_methods")[name], self, Node)
-#                        except:
-#                            try:
-#                                return types.MethodType(object.__getattribute__(self, "_shared_methods")[name], self)
-#                            except:
-#                                pass
-
-        if name in object.__getattribute__(self, "_attrs"):
-            return object.__getattribute__(self, "_attrs")[name]
-        elif name in object.__getattribute__(self, "_methods"):
-            try:
-                return types.MethodType(object.__getattribute__(self, "_methods")[name], self, Node)
-            except:
-                try:
-                    return types.MethodType(object.__getattribute__(self, "_methods")[name], self)
-                except:
-                    pass
-        elif name in object.__getattribute__(self, "_shared_attrs"):
-            return object.__getattribute__(self, "_shared_attrs")[name]
-        elif name in object.__getattribute__(self, "_shared_methods"):
-            try:
-                return types.MethodType(object.__getattribute__(self, "_shared_methods")[name], self, Node)
-            except:
-                try:
-                    return types.MethodType(object.__getattribute__(self, "_shared_methods")[name], self)
-                except:
-                    pass
-
-#
-#        if name in self._attrs:
-#            return self._attrs[name]
-#        elif name in self._methods:
-#            try:
-#                return types.MethodType(self._methods[name], self, Node)
-#            except TypeError:
-#                return types.MethodType(self._methods[name], self)
-#        elif name in self._shared_attrs:
-#            return self._shared_attrs[name]
-#        elif name in self._shared_methods:
-#            try:
-#                return types.MethodType(self._shared_methods[name], self, Node)
-#            except TypeError:
-#                return types.MethodType(self._shared_methods[name], self)
-#
-
-        node_name = ':"%s"'%self.name if "name" in self._attrs or "name" in self._shared_attrs else ""
-        raise AttributeError("%s%s object has no attribute '%s'."% (
-            self.__class__.__name__, node_name, name))
-
-    def __setattr__(self, name, value):
-
-        if name in ('_attrs', '_methods', '_shared_attrs', '_shared_methods'):
-            if name in dir(self):
-                raise AttributeError("'%s' attribute is not mutable."%name)
-            else:
-                object.__setattr__(self, name, value)
-        elif name in ['uppernode', 'subnodes']:
-            object.__setattr__(self, name, value)
-        elif name in self.__class__.__dict__.keys():
-            raise AttributeError("'%s' attribute is not mutable."%name)
-        elif callable(value):
-            self._methods[name] = value
-        else:
-            self._attrs[name] = value
-
-    def __delattr__(self, name):
-
-        if name in ('_attrs', '_methods', '_shared_attrs', '_shared_methods'):
-            raise AttributeError("'%s' attribute is not mutable."%name)
-        elif name in self._methods:
-            del self._methods[name]
-        elif name in self._attrs:
-            del self._attrs[name]
-        else:
-            object.__delattr__(self, name)
-
-    def __hasattr__(self, name):
-
-        try:
-            getattr(self, name)
-            return True
-        except:
-            return False
+    # position of this node in uppernode.subnodes; validated before use
+    _index = None
 
     def getattr_shared(self, name):
 
         if name in self._shared_attrs:
             return self._shared_attrs[name]
         elif name in self._shared_methods:
-            try:
-                return types.MethodType(self._shared_methods[name], self, Node)
-            except TypeError:
-                return types.MethodType(self._shared_methods[name], self)
+            return _bind(self._shared_methods[name], self)
 
+    @writes
     def setattr_shared(self, name, value):
         if callable(value):
             self._shared_methods[name] = value
         else:
             self._shared_attrs[name] = value
 
+    @writes
     def delattr_shared(self, name):
         if name in self._shared_methods:
             del self._shared_methods[name]
@@ -209,6 +119,79 @@ class Node(object):
         return True if name in self._shared_attrs or \
             name in self._shared_methods else False
 
+    @classmethod
+    @writes
+    def _update_shared(cls, attrs=None, methods=None):
+        if attrs:
+            NodeBase._shared_attrs.update(attrs)
+        if methods:
+            NodeBase._shared_methods.update(methods)
+
+    # edit notifications
+    @staticmethod
+    def watch(watcher):
+        """Call watcher.node_changed(event, *args) on edits of any tree
+        until watcher is unwatched or garbage collected.
+
+        - 'add', uppernode, node: the tree under node was added to the
+          subnodes of uppernode,
+        - 'remove', uppernode, node: it was removed from them,
+        - 'set', node, name, value: attribute name of node is about to be
+          set to value,
+        - 'delete', node, name: attribute name of node is about to be
+          deleted.
+
+        Direct changes of subnodes lists and attribute tables and method
+        assignments are not reported.
+        """
+
+        NodeBase._watchers += (weakref.ref(watcher, NodeBase._forget),)
+
+    @staticmethod
+    def unwatch(watcher):
+        NodeBase._watchers = tuple(ref for ref in NodeBase._watchers if
+            ref() is not watcher)
+
+    @staticmethod
+    def _forget(ref):
+        NodeBase._watchers = tuple(r for r in NodeBase._watchers if
+            r is not ref)
+
+    def _notify(self, event, *args):
+        for ref in self._watchers:
+            watcher = ref()
+            if watcher is not None:
+                watcher.node_changed(event, *args)
+
+    def _notify_subnodes(self, before):
+        # report the difference of subnodes to a copy taken before an edit
+        after = self.subnodes
+        kept = set(id(node) for node in after)
+        for node in before:
+            if id(node) not in kept:
+                self._notify('remove', self, node)
+        kept = set(id(node) for node in before)
+        for node in after:
+            if id(node) not in kept:
+                self._notify('add', self, node)
+
+    # locking mode
+    def reading(self):
+        """Return a context manager holding the read lock in locking mode."""
+
+        lock = self._lock
+        return UNLOCKED if lock is None else lock.read()
+
+    def writing(self):
+        """Return a context manager holding the write lock in locking mode."""
+
+        lock = self._lock
+        return UNLOCKED if lock is None else lock.write(self)
+
+    def _checked(self, nodes):
+        lock = self._lock
+        return nodes if lock is None else checked(nodes, lock, self)
+
     def __str__(self):
         if hasattr(self, 'name'):
             return self.name
@@ -224,15 +207,16 @@ class Node(object):
     def __repr__(self):
         return "%s %s"%(self.__class__, str(self))
 
-    def dirall(self):
-        return self._shared_attrs.keys() + self._shared_methods.keys() + \
-            self._attrs.keys() + self._methods.keys() + dir(self)
-
     def treeview(self, *args):
-        attrs = [a+'='+repr(getattr(self, a)) for a in args if hasattr(self, a)]
-        lines = [str(self)+(' (%s)'%', '.join(attrs) if attrs else '')]
-        lines.extend(["-"+n.treeview(*args) for n in self.subnodes])
-        return "\n".join(lines).replace("\n-", "\n---|")
+        lines = []
+        stack = [(self, 0)]
+        while stack:
+            node, depth = stack.pop()
+            attrs = [a+'='+repr(getattr(node, a)) for a in args if hasattr(node, a)]
+            line = str(node)+(' (%s)'%', '.join(attrs) if attrs else '')
+            lines.append('---|'+'--|'*(depth-1)+line if depth > 0 else line)
+            stack.extend((n, depth+1) for n in reversed(node.subnodes))
+        return "\n".join(lines)
 
     # sequences
     def __len__(self):
@@ -247,11 +231,30 @@ class Node(object):
     def __getitem__(self, key):
         return self.subnodes[key]
 
+    @writes
     def __setitem__(self, key, value):
-        self.subnodes[key] = value
+        subnodes = self._mutable_subnodes()
+        before = list(subnodes) if self._watchers else None
+        subnodes[key] = value
+        if isinstance(key, slice):
+            self._reindex_subnodes()
+        else:
+            object.__setattr__(value, '_index',
+                key if key >= 0 else key + len(self.subnodes))
+        if before is not None:
+            self._notify_subnodes(before)
 
+    @writes
     def __delitem__(self, key):
-        del self.subnodes[key]
+        subnodes = self._mutable_subnodes()
+        before = list(subnodes) if self._watchers else None
+        del subnodes[key]
+        if isinstance(key, slice) or key < 0:
+            self._reindex_subnodes()
+        else:
+            self._reindex_subnodes(key)
+        if before is not None:
+            self._notify_subnodes(before)
 
     def __contains__(self, item):
         return item in self.subnodes
@@ -259,173 +262,120 @@ class Node(object):
     #def __missing__(self, key):
     #    return item in self.subnodes
 
-    def __copy__(self):
-
-        node = self.__class__()
-
-        # copy methods
-        for name, method in self._shared_methods.items():
-            node._shared_methods[name] = method
-        for name, method in self._methods.items():
-            node._methods[name] = method
-
-        # copy attributes
-        for name, attr in self._shared_attrs.items():
-            node._shared_attrs[name] = copy(attr)
-        for name, attr in self._attrs.items():
-            node._attrs[name] = copy(attr)
-
-        # copy subnodes
-        for subnode in self.subnodes:
-            node.add_subnode(subnode)
-
-        return node
-
-    def __deepcopy__(self, memo={}):
-        if self in memo:
-            return memo[self]
-        else:
-            return self.clone(memo=memo)
-
-    def clone(self, memo={}):
-
-        if self in memo:
-            return memo[self]
-
-        node = self.__class__()
-
-        # save node in memo
-        memo[self] = node
-
-        # copy methods
-        #for name, method in self._shared_methods.items():
-        #    node._shared_methods[name] = method
-        for name, method in self._methods.items():
-            node._methods[name] = method
-
-        # copy attributes
-        #for name, attr in self._shared_attrs.items():
-        #    node._shared_attrs[name] = deepcopy(attr, memo=memo)
-        for name, attr in self._attrs.items():
-            node._attrs[name] = deepcopy(attr, memo=memo)
-
-        # clone subnodes
-        for subnode in self.subnodes:
-            if subnode in memo:
-                node.add_subnode(memo[subnode])
-            else:
-                node.add_subnode(subnode.clone(memo=memo))
-
-        return node
-
-    # pickling
-#    def __getinitargs__(self):
-#        import pdb; pdb.set_trace()
-#
-#    def __getnewargs__(self):
-#        import pdb; pdb.set_trace()
-#
-
-#    def dump(self, nodes):
-#        def _nodeid(attrs, notes, depth=0):
-#            if depth > 3:
-#                return attrs
-#            attrsid = id(attrs)
-#            if attrsid in notes:
-#                return notes[attrsid]
-#            if isinstance(attrs, Node):
-#                notes[attrsid] = attrs
-#                attrs = attrsid
-#            else:
-#                try:
-#                    for k, v in attrs.items():
-#                        attrs[_nodeid(k, notes, depth=depth+1)] = \
-#                            _nodeid(v, notes, depth=depth+1)
-#                except AttributeError as e:
-#                    try:
-#                        for i in range(len(attrs)):
-#                            attrs[i] = _nodeid(attrs[i], notes, depth=depth+1)
-#                    except Exception as e:
-#                        pass
-#                notes[attrsid] = attrs
-#
-#            return attrs
-#
-#        nodes[id(self)] = state = {}
-#        if self.uppernode:
-#            state['uppernode'] = id(self.uppernode)
-#        else:
-#            state['uppernode'] = None
-#
-#        notes = {}
-#        #state['attrs'] = _nodeid(self._attrs, notes)
-#        #state['attrs'] = self._attrs
-#        state['methods'] = self._methods
-#        state['subnodes'] = []
-#        for subnode in self.subnodes:
-#            state['subnodes'].append(id(subnode))
-#            subnode.dump(nodes)
-#
-#    def load(self, state, nodeid, nodemap):
-#
-#        nodemap[nodeid] = self
-#
-#        for sid, sitems in state['nodes'].items():
-#            subnode = Node(
-#                uppernode=sitems['uppernode'],
-#                subnodes=sitems['subnodes'],
-#                #attrs=sitems['attrs'],
-#                methods=sitems['methods']
-#            )
-#            subnode.load(state, sid, nodemap)
-#
-#    def __getstate__(self):
-#        state = {}
-#        #state['shared_attrs'] = self._shared_attrs
-#        state['shared_methods'] = self._shared_methods
-#        state['nodeid'] = id(self)
-#        state['nodes'] = nodes = {}
-#        self.dump(nodes)
-#        return state
-#
-#    def __setstate__(self, state):
-#
-#        #import pdb; pdb.set_trace()
-#        #self._shared_attrs.update(state['shared_attrs'])
-#        self._shared_methods.update(state['shared_methods'])
-#
-#        self.__init__()
-#        nodemap = {}
-#        self.load(state, state['nodeid'], nodemap)
-#    def __reduce__(self):
-#        import pdb; pdb.set_trace()
-#
-#    def __reduce_ex__(self):
-#        import pdb; pdb.set_trace()
-
-    def __getstate__(self):
-        state = self.__dict__.copy()
-        state['shared_attrs'] = self._shared_attrs
-        state['shared_methods'] = self._shared_methods
-        return state
-
-    def __setstate__(self, state):
-        self._shared_attrs.update(state['shared_attrs'])
-        self._shared_methods.update(state['shared_methods'])
-        del state['shared_attrs']
-        del state['shared_methods']
-        self.__dict__.update(state)
+    def __deepcopy__(self, memo=None):
+        return self.clone(memo=memo)
+
+    def clone(self, memo=None, subtrees=None):
+        """Return a copy of the tree under this node.
+
+        Immutable attribute values are shared with the original tree. With
+        subtrees, only the given subtrees and the nodes on the paths down to
+        them are copied.
+        """
+
+        if memo is None:
+            memo = {}
+
+        if id(self) in memo:
+            return memo[id(self)]
+
+        paths = roots = None
+        if subtrees is not None:
+            paths, roots = set(), set()
+            for subtree in subtrees:
+                roots.add(id(subtree))
+                node = subtree
+                while node is not self:
+                    node = node.uppernode
+                    if node is None:
+                        raise ValueError("%s is not under %s."%(subtree, self))
+                    paths.add(id(node))
+
+        return self._clone_tree(memo, paths, roots)
+
+    def _clone_tree(self, memo, paths=None, roots=None):
+
+        # copy the structure first and the mutable attribute values last so
+        # that values referring to nodes in the tree are resolved through memo
+        deferred = []
+        memo[id(self)] = top = self._clone_node(deferred)
+        stack = [(self, top, paths is None or id(self) in roots)]
+        while stack:
+            node, cloned, whole = stack.pop()
+            subnodes = node.subnodes
+            if not whole:
+                subnodes = [subnode for subnode in subnodes if
+                    id(subnode) in paths or id(subnode) in roots]
+            if not subnodes:
+                continue
+            clones = []
+            for index, subnode in enumerate(subnodes):
+                subclone = memo.get(id(subnode))
+                if subclone is None:
+                    subclone = memo[id(subnode)] = subnode._clone_node(
+                        deferred, cloned, index)
+                    stack.append((subnode, subclone,
+                        whole or id(subnode) in roots))
+                else:
+                    object.__setattr__(subclone, 'uppernode', cloned)
+                    object.__setattr__(subclone, '_index', index)
+                clones.append(subclone)
+            object.__setattr__(cloned, 'subnodes', clones)
+
+        for attrs, name, attr in deferred:
+            attrs[name] = deepcopy(attr, memo)
+
+        return top
 
     # node manipulation
+    def _mutable_subnodes(self):
+        subnodes = self.subnodes
+        if isinstance(subnodes, tuple):
+            subnodes = list(subnodes)
+            self.subnodes = subnodes
+        return subnodes
+
+    @writes
     def add_subnode(self, node, index=None):
         node.uppernode = self
+        subnodes = self._mutable_subnodes()
         if not index:
-            self.subnodes.append(node)
+            object.__setattr__(node, '_index', len(subnodes))
+            subnodes.append(node)
         else:
-            self.subnodes.insert(index, node)
+            subnodes.insert(index, node)
+            self._reindex_subnodes(max(index, 0))
+        if self._watchers:
+            self._notify('add', self, node)
 
+    @writes
     def pop_subnode(self, index):
-        return self.subnodes.pop(index)
+        node = self._mutable_subnodes().pop(index)
+        object.__setattr__(node, '_index', None)
+        self._reindex_subnodes(max(index, 0))
+        if self._watchers:
+            self._notify('remove', self, node)
+        return node
+
+    def _reindex_subnodes(self, start=0):
+        subnodes = self.subnodes
+        for index in range(start, len(subnodes)):
+            object.__setattr__(subnodes[index], '_index', index)
+
+    def _get_index(self):
+        """Return the position of this node in uppernode.subnodes or None."""
+
+        subnodes = self.uppernode.subnodes
+        index = self._index
+        if index is None or index >= len(subnodes) or \
+            subnodes[index] is not self:
+            # subnodes list was modified directly; rebuild positions
+            self.uppernode._reindex_subnodes()
+            index = self._index
+            if index is None or index >= len(subnodes) or \
+                subnodes[index] is not self:
+                return None
+        return index
 
     def get_subnodes(self):
         return iter(self.subnodes)
@@ -464,14 +414,13 @@ class Node(object):
         if self.uppernode is stopnode:
             raise StopNodeException()
 
-        myid = id(self)
         rightnode = None
 
-        for idx, subnode in enumerate(self.uppernode.subnodes):
-            if id(subnode) == myid:
-                if idx+1 == len(self.uppernode.subnodes):
-                    raise SiblingNodeException()
-                rightnode = self.uppernode.subnodes[idx+1]
+        idx = self._get_index()
+        if idx is not None:
+            if idx+1 == len(self.uppernode.subnodes):
+                raise SiblingNodeException()
+            rightnode = self.uppernode.subnodes[idx+1]
 
         if rightnode is stopnode:
             raise StopNodeException()
@@ -504,14 +453,13 @@ class Node(object):
         if self.uppernode is stopnode:
             raise StopNodeException()
 
-        myid = id(self)
         leftnode = None
 
-        for idx, subnode in enumerate(self.uppernode.subnodes):
-            if id(subnode) == myid:
-                if idx == 0:
-                    raise SiblingNodeException()
-                leftnode = self.uppernode.subnodes[idx-1]
+        idx = self._get_index()
+        if idx is not None:
+            if idx == 0:
+                raise SiblingNodeException()
+            leftnode = self.uppernode.subnodes[idx-1]
 
         if leftnode is stopnode:
             raise StopNodeException()
@@ -567,74 +515,518 @@ class Node(object):
 #
 #        return newnode
 
+    @writes
     def insert_after(self, node):
-        previdx = self.uppernode.subnodes.index(self)
-        self.uppernode.subnodes.insert(previdx+1, node)
+        previdx = self._get_index()
+        if previdx is None:
+            previdx = self.uppernode.subnodes.index(self)
+        self.uppernode._mutable_subnodes().insert(previdx+1, node)
         node.uppernode = self.uppernode
+        self.uppernode._reindex_subnodes(previdx+1)
+        if self._watchers:
+            self._notify('add', self.uppernode, node)
 
+    @writes
     def insert_before(self, node):
-        nextidx = self.uppernode.subnodes.index(self)
-        self.uppernode.subnodes.insert(nextidx, node)
+        nextidx = self._get_index()
+        if nextidx is None:
+            nextidx = self.uppernode.subnodes.index(self)
+        self.uppernode._mutable_subnodes().insert(nextidx, node)
         node.uppernode = self.uppernode
+        self.uppernode._reindex_subnodes(nextidx)
+        if self._watchers:
+            self._notify('add', self.uppernode, node)
+
+    # lazy traversals; subnodes of a yielded node are read when the
+    # iteration resumes, so they can still be modified in the meantime
+    def walk(self, order='preorder', reverse=False, **kwargs):
+        try:
+            traversal = ORDERS[order]
+        except KeyError:
+            raise ValueError("Unknown traversal order '%s'."%order)
+        return self._checked(traversal(self, reverse=reverse, **kwargs))
+
+    def iter_preorder(self, reverse=False):
+        return self._checked(preorder(self, reverse=reverse))
+
+    def iter_postorder(self, reverse=False):
+        return self._checked(postorder(self, reverse=reverse))
+
+    def iter_levelorder(self, reverse=False, maxdepth=None):
+        return self._checked(levelorder(self, reverse=reverse,
+            maxdepth=maxdepth))
+
+    def iter_levels(self, reverse=False, maxdepth=None):
+        return self._checked(levels(self, reverse=reverse, maxdepth=maxdepth))
+
+    # bulk attribute queries over the subtree
+    def select(self, where=None, indices=False, **match):
+        return select(self, where=where, indices=indices, **match)
+
+    def query(self, selector, tag='kind'):
+        """Return the nodes under this node, this node included, that
+        match selector, in preorder; see stemtree.selector."""
+
+        from .selector import compile
+        return compile(selector, tag).select(self)
+
+    # attribute indexes, see stemtree.indexes
+    def create_index(self, *names):
+        """Index the values of attributes names of the nodes under this
+        node; return the index."""
+
+        from .indexes import create_index
+        return create_index(self, names)
+
+    def drop_index(self, *names):
+        """Drop the indexes of names, or all indexes of this node."""
+
+        from .indexes import drop_index
+        drop_index(self, names)
+
+    def find_by(self, name, value):
+        """Return the nodes under this node whose attribute name equals
+        value, in no particular order.
+
+        Without an index on name created at this node, the subtree is
+        scanned.
+        """
+
+        from .indexes import find_by
+        return find_by(self, name, value)
+
+    # derived attributes, see stemtree.derived
+    def get_derived(self, name):
+        """Return the value of the derived attribute name for this node."""
+
+        from .derived import get_derived
+        return get_derived(self, name)
 
     # attribute and methods manipulations
     # such as swapping methods
 
     def search(self, action, move, basket={}, premove=None, postmove=None, stopnode=None):
+        """Call action(node, basket) on the nodes that move reaches from
+        this node and return the last one.
+
+        An action returning STOP_SEARCH ends the search; SKIP_SUBTREE
+        continues it after the nodes under the node.
+        """
+
+        lock = self._lock
+        if lock is not None:
+            with lock.read():
+                return self._search(action, move, basket, premove, postmove,
+                    stopnode)
+        return self._search(action, move, basket, premove, postmove, stopnode)
+
+    def _search(self, action, move, basket, premove, postmove, stopnode):
 
         node = premove(self, basket) if premove is not None else self
 
-        while type(node) == type(self) and action(node, basket) != self.STOP_SEARCH:
-            node = move(node, basket, stopnode)
-            if node is stopnode: break
+        steps = stepper(move)
+        if steps is not None:
+            steps = steps(node, stopnode)
+            node = next(steps)
+            while type(node) == type(self):
+                result = action(node, basket)
+                if result == self.STOP_SEARCH: break
+                node = steps.send(result == self.SKIP_SUBTREE)
+                if node is stopnode: break
+        else:
+            while type(node) == type(self):
+                result = action(node, basket)
+                if result == self.STOP_SEARCH: break
+                if result == self.SKIP_SUBTREE:
+                    node = skip_subtree(move, node, basket, stopnode)
+                else:
+                    node = move(node, basket, stopnode)
+                if node is stopnode: break
 
         return postmove(node, basket) if postmove is not None else  node
 
-def DFS_LF(node, basket, stopnode):
-    """Depth-first search from the left of a tree."""
+    # asyncio traversals, see stemtree.aio
+    def awalk(self, order='preorder', reverse=False, **kwargs):
+        from .aio import awalk
+        return awalk(self, order, reverse=reverse, **kwargs)
 
-    if len(node.subnodes) > 0:
-        newnode = node.subnodes[0]
-    else:
-        newnode = node
-        while type(node) == type(newnode):
-            try:
-                newnode = newnode._get_rightnode(stopnode=stopnode)
-                break
-            except (UpperNodeException, StopNodeException):
-                newnode = None
-            except SiblingNodeException:
-                newnode = newnode.uppernode
+    def asearch(self, action, move, basket={}, premove=None, postmove=None,
+        stopnode=None, **kwargs):
+        from .aio import asearch
+        return asearch(self, action, move, basket=basket, premove=premove,
+            postmove=postmove, stopnode=stopnode, **kwargs)
+
+class Node(NodeBase):
 
-    return newnode
+    def __init__(self, uppernode=None, subnodes=None, attrs=None, methods=None,
+        shared_attrs=None, shared_methods=None):
 
-def DFS_RF(node, basket, stopnode):
-    """Depth-first search from the right of a tree."""
+        object.__setattr__(self, '_attrs', attrs if attrs else {})
+        object.__setattr__(self, '_methods', methods if methods else {})
 
-    if len(node.subnodes) > 0:
-        newnode = node.subnodes[-1]
-    else:
-        newnode = node
-        while type(node) == type(newnode):
-            try:
-                newnode = newnode._get_leftnode(stopnode=stopnode)
-                break
-            except (UpperNodeException, StopNodeException):
-                newnode = None
-            except SiblingNodeException:
-                newnode = newnode.uppernode
+        if shared_attrs or shared_methods:
+            self._update_shared(shared_attrs, shared_methods)
 
-    return newnode
+        self.uppernode = uppernode
+        self.subnodes = subnodes if subnodes else []
+
+    # attributes
+    def __getattr__(self, name):
+
+        state = self.__dict__
+        if '_attrs' not in state:
+            # not initialized yet, e.g. while unpickling
+            raise AttributeError(name)
 
-def UPWARDS(node, basket, stopnode):
-    """Upward search."""
+        attrs = state['_attrs']
+        if name in attrs:
+            return attrs[name]
 
-    if node is stopnode:
-        return None
+        methods = state['_methods']
+        if name in methods:
+            # bound on every access: a bound method kept on the node would
+            # make a reference cycle that only the cyclic collector frees
+            return _bind(methods[name], self)
 
-    return node.uppernode
+        shared_attrs = self._shared_attrs
+        if name in shared_attrs:
+            return shared_attrs[name]
 
-def NO_SEARCH(node, basket, stopnode):
-    """No search."""
-    return None
+        shared_methods = self._shared_methods
+        if name in shared_methods:
+            return _bind(shared_methods[name], self)
+
+        node_name = ':"%s"'%attrs['name'] if "name" in attrs else \
+            ':"%s"'%shared_attrs['name'] if "name" in shared_attrs else ""
+        raise AttributeError("%s%s object has no attribute '%s'."% (
+            self.__class__.__name__, node_name, name))
+
+    def __setattr__(self, name, value):
+
+        if name in ('_attrs', '_methods', '_shared_attrs', '_shared_methods'):
+            if name in dir(self):
+                raise AttributeError("'%s' attribute is not mutable."%name)
+            else:
+                object.__setattr__(self, name, value)
+        elif name in ['uppernode', 'subnodes', '_index']:
+            object.__setattr__(self, name, value)
+        elif any(name in cls.__dict__ for cls in self.__class__.__mro__):
+            raise AttributeError("'%s' attribute is not mutable."%name)
+        elif callable(value):
+            self._methods[name] = value
+        else:
+            if self._watchers:
+                self._notify('set', self, name, value)
+            self._attrs[name] = value
 
+    def __delattr__(self, name):
+
+        if name in ('_attrs', '_methods', '_shared_attrs', '_shared_methods'):
+            raise AttributeError("'%s' attribute is not mutable."%name)
+        elif name in self._methods:
+            del self._methods[name]
+        elif name in self._attrs:
+            if self._watchers:
+                self._notify('delete', self, name)
+            del self._attrs[name]
+        else:
+            object.__delattr__(self, name)
+
+    def __hasattr__(self, name):
+
+        try:
+            getattr(self, name)
+            return True
+        except:
+            return False
+
+    def dirall(self):
+        return self._shared_attrs.keys() + self._shared_methods.keys() + \
+            self._attrs.keys() + self._methods.keys() + dir(self)
+
+    def __copy__(self):
+
+        node = self.__class__()
+
+        # copy methods
+        for name, method in self._shared_methods.items():
+            node._shared_methods[name] = method
+        for name, method in self._methods.items():
+            node._methods[name] = method
+
+        # copy attributes
+        for name, attr in self._shared_attrs.items():
+            node._shared_attrs[name] = copy(attr)
+        for name, attr in self._attrs.items():
+            node._attrs[name] = copy(attr)
+
+        # copy subnodes
+        for subnode in self.subnodes:
+            node.add_subnode(subnode)
+
+        return node
+
+    @classmethod
+    def _from_tables(cls, attrs=None, methods=None, subnodes=None,
+        uppernode=None, index=None):
+        # bare construction for clone and load; __init__ is not called
+        node = cls.__new__(cls)
+        node.__dict__.update(_attrs=attrs if attrs is not None else {},
+            _methods=methods if methods is not None else {},
+            uppernode=uppernode,
+            subnodes=subnodes if subnodes is not None else [],
+            _index=index)
+        return node
+
+    def _clone_node(self, deferred, uppernode=None, index=None):
+        return self._from_tables(_clone_attrs(self._attrs, deferred),
+            dict(self._methods), None, uppernode, index)
+
+    # pickling
+#    def __getinitargs__(self):
+#        import pdb; pdb.set_trace()
+#
+#    def __getnewargs__(self):
+#        import pdb; pdb.set_trace()
+#
+
+#    def dump(self, nodes):
+#        def _nodeid(attrs, notes, depth=0):
+#            if depth > 3:
+#                return attrs
+#            attrsid = id(attrs)
+#            if attrsid in notes:
+#                return notes[attrsid]
+#            if isinstance(attrs, Node):
+#                notes[attrsid] = attrs
+#                attrs = attrsid
+#            else:
+#                try:
+#                    for k, v in attrs.items():
+#                        attrs[_nodeid(k, notes, depth=depth+1)] = \
+#                            _nodeid(v, notes, depth=depth+1)
+#                except AttributeError as e:
+#                    try:
+#                        for i in range(len(attrs)):
+#                            attrs[i] = _nodeid(attrs[i], notes, depth=depth+1)
+#                    except Exception as e:
+#                        pass
+#                notes[attrsid] = attrs
+#
+#            return attrs
+#
+#        nodes[id(self)] = state = {}
+#        if self.uppernode:
+#            state['uppernode'] = id(self.uppernode)
+#        else:
+#            state['uppernode'] = None
+#
+#        notes = {}
+#        #state['attrs'] = _nodeid(self._attrs, notes)
+#        #state['attrs'] = self._attrs
+#        state['methods'] = self._methods
+#        state['subnodes'] = []
+#        for subnode in self.subnodes:
+#            state['subnodes'].append(id(subnode))
+#            subnode.dump(nodes)
+#
+#    def load(self, state, nodeid, nodemap):
+#
+#        nodemap[nodeid] = self
+#
+#        for sid, sitems in state['nodes'].items():
+#            subnode = Node(
+#                uppernode=sitems['uppernode'],
+#                subnodes=sitems['subnodes'],
+#                #attrs=sitems['attrs'],
+#                methods=sitems['methods']
+#            )
+#            subnode.load(state, sid, nodemap)
+#
+#    def __getstate__(self):
+#        state = {}
+#        #state['shared_attrs'] = self._shared_attrs
+#        state['shared_methods'] = self._shared_methods
+#        state['nodeid'] = id(self)
+#        state['nodes'] = nodes = {}
+#        self.dump(nodes)
+#        return state
+#
+#    def __setstate__(self, state):
+#
+#        #import pdb; pdb.set_trace()
+#        #self._shared_attrs.update(state['shared_attrs'])
+#        self._shared_methods.update(state['shared_methods'])
+#
+#        self.__init__()
+#        nodemap = {}
+#        self.load(state, state['nodeid'], nodemap)
+#    def __reduce__(self):
+#        import pdb; pdb.set_trace()
+#
+#    def __reduce_ex__(self):
+#        import pdb; pdb.set_trace()
+
+    def __reduce_ex__(self, protocol):
+        from .serialize import _reduce_node
+        return _reduce_node(self, protocol)
+
+    # state of pickles written before __reduce_ex__
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['shared_attrs'] = self._shared_attrs
+        state['shared_methods'] = self._shared_methods
+        return state
+
+    def __setstate__(self, state):
+        if isinstance(state, tuple):
+            from .serialize import _set_state
+            return _set_state(self, state)
+        self._update_shared(state['shared_attrs'], state['shared_methods'])
+        del state['shared_attrs']
+        del state['shared_methods']
+        self.__dict__.update(state)
+
+
+class CompactNode(NodeBase):
+    """Memory-lean node without an instance dictionary.
+
+    Attribute and method tables are allocated on first use and leaves share
+    an empty tuple as subnodes. Bound methods are not cached.
+    """
+
+    __slots__ = ('_attrs', '_methods', 'uppernode', 'subnodes', '_index',
+        '__weakref__')
+
+    def __init__(self, uppernode=None, subnodes=None, attrs=None, methods=None,
+        shared_attrs=None, shared_methods=None):
+
+        object.__setattr__(self, '_attrs', attrs if attrs else None)
+        object.__setattr__(self, '_methods', methods if methods else None)
+        object.__setattr__(self, '_index', None)
+
+        if shared_attrs or shared_methods:
+            self._update_shared(shared_attrs, shared_methods)
+
+        object.__setattr__(self, 'uppernode', uppernode)
+        object.__setattr__(self, 'subnodes', subnodes if subnodes else ())
+
+    # attributes
+    def __getattr__(self, name):
+
+        if name in CompactNode.__slots__:
+            # slot not initialized yet, e.g. while unpickling
+            raise AttributeError(name)
+
+        attrs = self._attrs
+        if attrs is not None and name in attrs:
+            return attrs[name]
+
+        methods = self._methods
+        if methods is not None and name in methods:
+            return _bind(methods[name], self)
+
+        shared_attrs = self._shared_attrs
+        if name in shared_attrs:
+            return shared_attrs[name]
+
+        shared_methods = self._shared_methods
+        if name in shared_methods:
+            return _bind(shared_methods[name], self)
+
+        node_name = ':"%s"'%attrs['name'] if attrs and "name" in attrs else \
+            ':"%s"'%shared_attrs['name'] if "name" in shared_attrs else ""
+        raise AttributeError("%s%s object has no attribute '%s'."% (
+            self.__class__.__name__, node_name, name))
+
+    def __setattr__(self, name, value):
+
+        if name in ('_attrs', '_methods', '_shared_attrs', '_shared_methods'):
+            raise AttributeError("'%s' attribute is not mutable."%name)
+        elif name in ('uppernode', 'subnodes', '_index'):
+            object.__setattr__(self, name, value)
+        elif any(name in cls.__dict__ for cls in self.__class__.__mro__):
+            raise AttributeError("'%s' attribute is not mutable."%name)
+        elif callable(value):
+            if self._methods is None:
+                object.__setattr__(self, '_methods', {})
+            self._methods[name] = value
+        else:
+            if self._watchers:
+                self._notify('set', self, name, value)
+            if self._attrs is None:
+                object.__setattr__(self, '_attrs', {})
+            self._attrs[name] = value
+
+    def __delattr__(self, name):
+
+        if name in ('_attrs', '_methods', '_shared_attrs', '_shared_methods'):
+            raise AttributeError("'%s' attribute is not mutable."%name)
+        elif self._methods and name in self._methods:
+            del self._methods[name]
+        elif self._attrs and name in self._attrs:
+            if self._watchers:
+                self._notify('delete', self, name)
+            del self._attrs[name]
+        else:
+            object.__delattr__(self, name)
+
+    def dirall(self):
+        return list(self._shared_attrs.keys()) + \
+            list(self._shared_methods.keys()) + \
+            list(self._attrs.keys() if self._attrs else []) + \
+            list(self._methods.keys() if self._methods else []) + dir(self)
+
+    def __copy__(self):
+
+        node = self.__class__()
+
+        if self._methods:
+            object.__setattr__(node, '_methods', dict(self._methods))
+        if self._attrs:
+            object.__setattr__(node, '_attrs',
+                dict((name, copy(attr)) for name, attr in self._attrs.items()))
+
+        for subnode in self.subnodes:
+            node.add_subnode(subnode)
+
+        return node
+
+    @classmethod
+    def _from_tables(cls, attrs=None, methods=None, subnodes=None,
+        uppernode=None, index=None):
+        node = cls.__new__(cls)
+        object.__setattr__(node, '_attrs', attrs if attrs else None)
+        object.__setattr__(node, '_methods', methods if methods else None)
+        object.__setattr__(node, 'uppernode', uppernode)
+        object.__setattr__(node, 'subnodes',
+            subnodes if subnodes is not None else ())
+        object.__setattr__(node, '_index', index)
+        return node
+
+    def _clone_node(self, deferred, uppernode=None, index=None):
+        return self._from_tables(_clone_attrs(self._attrs, deferred)
+            if self._attrs else None, dict(self._methods) if self._methods
+            else None, None, uppernode, index)
+
+    # pickling
+    def __reduce_ex__(self, protocol):
+        from .serialize import _reduce_node
+        return _reduce_node(self, protocol)
+
+    # state of pickles written before __reduce_ex__
+    def __getstate__(self):
+        state = dict((name, getattr(self, name)) for name in self.__slots__
+            if name != '__weakref__')
+        state['shared_attrs'] = self._shared_attrs
+        state['shared_methods'] = self._shared_methods
+        return state
+
+    def __setstate__(self, state):
+        if isinstance(state, tuple):
+            from .serialize import _set_state
+            return _set_state(self, state)
+        self._update_shared(state.pop('shared_attrs'),
+            state.pop('shared_methods'))
+        for name, value in state.items():
+            object.__setattr__(self, name, value)
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+from builtins import *
+
+"""Parallel subtree processing for Stemtree.
+
+A tree is partitioned at a depth below a node: the subtrees rooted at that
+depth are written with stemtree.serialize and processed in a process pool;
+the nodes above it are processed in the calling process. Functions passed
+to a pool must be picklable, e.g. defined at module level. The default pool
+is a concurrent.futures.ProcessPoolExecutor, or a multiprocessing.Pool
+where concurrent.futures is missing (Python 2 without the futures
+backport).
+
+Attributes that refer to nodes outside of a subtree are copied together with
+their trees.
+"""
+
+import io
+from functools import reduce
+from multiprocessing import Pool, cpu_count
+
+try:
+    from concurrent.futures import ProcessPoolExecutor
+except ImportError:
+    ProcessPoolExecutor = None
+
+from .search import DFS_LF, levels
+from .serialize import dump, load
+
+def partition(node, depth=1):
+    """Return the nodes above depth below node and the subtree roots at
+    depth, both in breadth-first order."""
+
+    local, roots = [], []
+    for level, nodes in enumerate(levels(node, maxdepth=depth)):
+        (roots if level == depth else local).extend(nodes)
+    return local, roots
+
+def _pack(node):
+    stream = io.BytesIO()
+    dump(node, stream)
+    return stream.getvalue()
+
+def _unpack(data):
+    return load(io.BytesIO(data))
+
+def _chunks(items, size):
+    return [items[start:start+size] for start in range(0, len(items), size)]
+
+class _PoolExecutor(object):
+    # the part of ProcessPoolExecutor used here, on multiprocessing.Pool
+
+    def __init__(self, workers=None):
+        self._pool = Pool(workers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        # drops the tasks whose results were not asked for
+        self._pool.terminate()
+        self._pool.join()
+        return False
+
+    def submit(self, func, *args):
+        return _PoolFuture(self._pool.apply_async(func, args))
+
+    def map(self, func, *iterables):
+        return [future.result() for future in [self.submit(func, *args)
+            for args in zip(*iterables)]]
+
+class _PoolFuture(object):
+
+    def __init__(self, result):
+        self._result = result
+
+    def result(self):
+        return self._result.get()
+
+    def cancel(self):
+        return False
+
+def _executor(workers):
+    if ProcessPoolExecutor is None:
+        return _PoolExecutor(workers)
+    return ProcessPoolExecutor(workers)
+
+def _map_chunk(func, packed):
+    return [func(_unpack(data)) for data in packed]
+
+def _search_chunk(action, move, factory, reducer, packed):
+    baskets, stopped = [], []
+
+    def stopping(node, basket):
+        result = action(node, basket)
+        if result == node.STOP_SEARCH:
+            stopped.append(node)
+        return result
+
+    for data in packed:
+        basket = factory()
+        _unpack(data).search(stopping, move, basket=basket)
+        baskets.append(basket)
+        if stopped:
+            break
+    return reduce(reducer, baskets), bool(stopped)
+
+def _search_chunks(executor, workers, tasks, basket, reducer):
+    # merge the chunk baskets in order up to the first one that stopped;
+    # the chunks not started by then are cancelled
+    if not tasks:
+        return basket
+    if executor is None:
+        with _executor(workers) as pool:
+            return _search_chunks(pool, workers, tasks, basket, reducer)
+    futures = [executor.submit(_search_chunk, *task) for task in tasks]
+    for pos, future in enumerate(futures):
+        chunk, stopped = future.result()
+        basket = reducer(basket, chunk)
+        if stopped:
+            for other in futures[pos+1:]:
+                other.cancel()
+            break
+    return basket
+
+def _run(executor, workers, func, tasks):
+    if not tasks:
+        return []
+    if executor is not None:
+        return list(executor.map(func, *zip(*tasks)))
+    with _executor(workers) as pool:
+        return _run(pool, workers, func, tasks)
+
+def _chunksize(roots, workers, chunksize):
+    if chunksize is None:
+        # a few tasks per worker to even out subtree sizes
+        chunksize = max(1, len(roots) // (4 * (workers or cpu_count())))
+    return chunksize
+
+def map_subtrees(node, func, depth=1, workers=None, executor=None,
+    chunksize=None):
+    """Return [func(subtree)] for the subtrees rooted at depth below node.
+
+    func gets a copy of each subtree and runs in a worker process; results
+    are in breadth-first order of the subtree roots.
+    """
+
+    local, roots = partition(node, depth)
+    packed = [_pack(root) for root in roots]
+    tasks = [(func, chunk) for chunk in _chunks(packed,
+        _chunksize(roots, workers, chunksize))]
+    return sum(_run(executor, workers, _map_chunk, tasks), [])
+
+def parallel_search(node, action, reducer, move=DFS_LF, depth=1,
+    basket_factory=dict, workers=None, executor=None, chunksize=None):
+    """Call action(node, basket) on node and all its descendants and return
+    the merged basket.
+
+    The subtrees at depth are searched with move in worker processes, each
+    with a new basket from basket_factory; the nodes above depth are
+    visited here in breadth-first order. reducer(basket, basket) merges two
+    baskets; baskets are merged in the order of the subtrees, after the
+    local basket. STOP_SEARCH above depth ends the search before any
+    subtree is sent to the workers; in a subtree at depth it ends the
+    search there, and the baskets of the subtrees after it are dropped
+    (those already running in other workers still run). SKIP_SUBTREE
+    above depth also skips the subtrees at depth below it.
+    """
+
+    local, roots = partition(node, depth)
+    basket = basket_factory()
+    skipped = set()
+    for item in local:
+        if id(item.uppernode) in skipped:
+            skipped.add(id(item))
+            continue
+        result = action(item, basket)
+        if result == item.STOP_SEARCH:
+            roots = []
+            break
+        if result == item.SKIP_SUBTREE:
+            skipped.add(id(item))
+    if skipped:
+        roots = [root for root in roots if id(root.uppernode) not in skipped]
+
+    packed = [_pack(root) for root in roots]
+    tasks = [(action, move, basket_factory, reducer, chunk) for chunk in
+        _chunks(packed, _chunksize(roots, workers, chunksize))]
+    return _search_chunks(executor, workers, tasks, basket, reducer)
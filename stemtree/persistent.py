@@ -0,0 +1,468 @@
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+from builtins import *
+
+"""Persistent trees for Stemtree.
+
+A PersistentTree keeps its nodes in records that can be shared with other
+trees. snapshot() returns an independent copy in O(1); an edit copies the
+records on the path from the root to the edited node that the tree does not
+own yet, so other snapshots never see it. Attribute values are shared, not
+copied.
+
+PersistentNode objects give Node-like access to the nodes of a tree. They
+address nodes by the positions on the path from the root, kept in slots
+that follow the nodes when subnodes are inserted or removed before them.
+"""
+
+import weakref
+try:
+    from collections.abc import Sequence
+except ImportError:
+    from collections import Sequence
+
+from .node import NodeBase, Node, _bind
+from .locking import writes
+
+class _Record(object):
+
+    __slots__ = ('attrs', 'methods', 'subnodes', 'owner')
+
+    def __init__(self, owner, attrs=None, methods=None, subnodes=()):
+        self.owner = owner
+        self.attrs = attrs if attrs is not None else {}
+        self.methods = methods if methods else None
+        self.subnodes = subnodes
+
+    def copy(self, owner):
+        return _Record(owner, dict(self.attrs), _copied(self.methods),
+            list(self.subnodes))
+
+def _copied(table):
+    return dict(table) if table else None
+
+
+class PersistentTree(object):
+
+    def __init__(self, record=None):
+
+        self._owner = object()
+        self._record = record if record is not None else \
+            _Record(self._owner)
+        self._init_views()
+
+    @classmethod
+    def from_node(cls, node, table=None):
+        """Copy the tree under node into a new persistent tree; with a
+        stemtree.structural.HashConsTable, equal subtrees share records."""
+
+        tree = cls()
+        tree._record = tree._import(node) if table is None else \
+            table.intern(node)
+        return tree
+
+    def snapshot(self):
+        """Return an independent copy of this tree."""
+
+        # records owned so far become shared by both trees
+        self._owner = object()
+        return self.__class__(self._record)
+
+    def __getstate__(self):
+        return {'_record': self._record}
+
+    def __setstate__(self, state):
+        self._owner = object()
+        self._record = state['_record']
+        self._init_views()
+
+    @property
+    def root(self):
+        return self.view(())
+
+    def to_node(self, path=(), cls=Node):
+        """Build a tree of cls nodes from the subtree at path."""
+
+        record = self._lookup(path)
+        root = cls(attrs=dict(record.attrs), methods=_copied(record.methods))
+        stack = [(record, root)]
+        while stack:
+            record, node = stack.pop()
+            for subrecord in record.subnodes:
+                subnode = cls(attrs=dict(subrecord.attrs),
+                    methods=_copied(subrecord.methods))
+                node.add_subnode(subnode)
+                stack.append((subrecord, subnode))
+        return root
+
+    # records
+    def _import(self, node):
+        owner = self._owner
+        top = _Record(owner, dict(node._attrs or {}), _copied(node._methods))
+        stack = [(node, top)]
+        while stack:
+            node, record = stack.pop()
+            if node.subnodes:
+                record.subnodes = [_Record(owner, dict(subnode._attrs or {}),
+                    _copied(subnode._methods)) for subnode in node.subnodes]
+                stack.extend(zip(node.subnodes, record.subnodes))
+        return top
+
+    def _share(self, path):
+        # the records stay with this tree and the new place; neither may
+        # change them in place any more
+        self._owner = object()
+        return self._lookup(path)
+
+    def _lookup(self, path):
+        record = self._record
+        for index in path:
+            record = record.subnodes[index]
+        return record
+
+    def _edit(self, path):
+        """Return the record at path after copying the records on the path
+        that this tree does not own."""
+
+        owner = self._owner
+        record = self._record
+        if record.owner is not owner:
+            record = self._record = record.copy(owner)
+        for index in path:
+            subnodes = record.subnodes
+            record = subnodes[index]
+            if record.owner is not owner:
+                record = subnodes[index] = record.copy(owner)
+        return record
+
+    def _edit_subnodes(self, path):
+        record = self._edit(path)
+        if isinstance(record.subnodes, tuple):
+            record.subnodes = list(record.subnodes)
+        return record.subnodes
+
+    # views
+    def _init_views(self):
+        self._root_slot = _Slot(self)
+
+    def view(self, path=()):
+        slot = self._root_slot
+        for index in path:
+            slot = slot.subslot(index)
+        return slot.node()
+
+    def _move_views(self, path, start, delta, detached=None):
+        # keep live views on their nodes after subnodes of path from start
+        # on moved by delta; views under a popped subnode move to detached.
+        # Only the slots of those subnodes change, not the slots below them
+        slot = self._root_slot
+        for index in path:
+            slot = slot.subslots.get(index) if slot.subslots else None
+            if slot is None:
+                return
+        subslots = slot.subslots
+        if not subslots:
+            return
+        # positions before the edit end at the length after it plus one
+        moved = []
+        for index in range(start, len(self._lookup(path).subnodes) + 1):
+            subslot = subslots.get(index)
+            if subslot is not None:
+                moved.append((index, subslot))
+        for index, subslot in moved:
+            del subslots[index]
+        for index, subslot in moved:
+            if detached is not None and index == start:
+                subslot.tree, subslot.upper, subslot.index = detached, None, \
+                    None
+                detached._root_slot = subslot
+            else:
+                subslot.index = index + delta
+                subslots[subslot.index] = subslot
+
+
+class _Slot(object):
+    """The place of the views of one node: the tree at the root, else the
+    slot of the uppernode and the index in it.
+
+    Views hold their slots and slots the slots above them; slots hold the
+    slots below them weakly, so that the slots of dead views go away.
+    """
+
+    __slots__ = ('tree', 'upper', 'index', 'subslots', 'view', '__weakref__')
+
+    def __init__(self, tree=None, upper=None, index=None):
+        self.tree = tree
+        self.upper = upper
+        self.index = index
+        self.subslots = None
+        self.view = None
+
+    def place(self):
+        """Return the tree and the path of the slot."""
+
+        path = []
+        slot = self
+        while slot.upper is not None:
+            path.append(slot.index)
+            slot = slot.upper
+        path.reverse()
+        return slot.tree, tuple(path)
+
+    def subslot(self, index):
+        subslots = self.subslots
+        if subslots is None:
+            subslots = self.subslots = weakref.WeakValueDictionary()
+        slot = subslots.get(index)
+        if slot is None:
+            slot = subslots[index] = _Slot(None, self, index)
+        return slot
+
+    def node(self):
+        view = self.view() if self.view is not None else None
+        if view is None:
+            view = PersistentNode(self)
+            self.view = weakref.ref(view)
+        return view
+
+
+class _Subnodes(Sequence):
+    """Live sequence of the subnodes of a PersistentNode; the views are
+    made when they are reached. list() takes a copy that edits do not
+    change."""
+
+    __slots__ = ('_slot',)
+
+    def __init__(self, slot):
+        self._slot = slot
+
+    def __len__(self):
+        tree, path = self._slot.place()
+        return len(tree._lookup(path).subnodes)
+
+    def __getitem__(self, key):
+        size = len(self)
+        if isinstance(key, slice):
+            return [self._slot.subslot(index).node() for index in
+                range(*key.indices(size))]
+        if key < 0:
+            key += size
+        if not 0 <= key < size:
+            raise IndexError("subnode index out of range")
+        return self._slot.subslot(key).node()
+
+    def __iter__(self):
+        # one lookup for the length
+        slot = self._slot
+        for index in range(len(self)):
+            yield slot.subslot(index).node()
+
+    def __eq__(self, other):
+        if isinstance(other, (list, tuple, _Subnodes)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+class PersistentNode(NodeBase):
+    """Node-like view of one node in a PersistentTree.
+
+    Adding a PersistentNode shares its records; the node stays where it is.
+    """
+
+    __slots__ = ('_slot', '__weakref__')
+
+    def __init__(self, slot):
+        object.__setattr__(self, '_slot', slot)
+
+    @property
+    def _tree(self):
+        return self._slot.place()[0]
+
+    @property
+    def _path(self):
+        return self._slot.place()[1]
+
+    @property
+    def persistent_tree(self):
+        return self._tree
+
+    @property
+    def tree_path(self):
+        return self._path
+
+    @property
+    def uppernode(self):
+        upper = self._slot.upper
+        return upper.node() if upper is not None else None
+
+    @property
+    def subnodes(self):
+        return _Subnodes(self._slot)
+
+    def _lookup(self):
+        tree, path = self._slot.place()
+        return tree._lookup(path)
+
+    def _edit(self):
+        tree, path = self._slot.place()
+        return tree._edit(path)
+
+    @property
+    def _attrs(self):
+        return self._lookup().attrs
+
+    @property
+    def _methods(self):
+        return self._lookup().methods
+
+    def _get_index(self):
+        return self._slot.index
+
+    def __getattr__(self, name):
+
+        if name in ('_slot', '_tree', '_path'):
+            raise AttributeError(name)
+
+        record = self._lookup()
+        if name in record.attrs:
+            return record.attrs[name]
+
+        if record.methods and name in record.methods:
+            return _bind(record.methods[name], self)
+
+        shared_attrs = self._shared_attrs
+        if name in shared_attrs:
+            return shared_attrs[name]
+
+        shared_methods = self._shared_methods
+        if name in shared_methods:
+            return _bind(shared_methods[name], self)
+
+        raise AttributeError("%s object has no attribute '%s'."% (
+            self.__class__.__name__, name))
+
+    def __setattr__(self, name, value):
+
+        if any(name in cls.__dict__ for cls in self.__class__.__mro__):
+            raise AttributeError("'%s' attribute is not mutable."%name)
+
+        record = self._edit()
+        if callable(value):
+            if record.methods is None:
+                record.methods = {}
+            record.methods[name] = value
+        else:
+            record.attrs[name] = value
+
+    def __delattr__(self, name):
+
+        record = self._lookup()
+        if name in record.attrs:
+            del self._edit().attrs[name]
+        elif record.methods and name in record.methods:
+            del self._edit().methods[name]
+        else:
+            raise AttributeError(name)
+
+    def __len__(self):
+        return len(self._lookup().subnodes)
+
+    def __getitem__(self, key):
+        return self.subnodes[key]
+
+    @writes
+    def __setitem__(self, key, node):
+        if isinstance(key, slice):
+            raise TypeError("%s does not support slice assignment."%
+                self.__class__.__name__)
+        key = self._position(key)
+        self.pop_subnode(key)
+        self._insert(key, node)
+
+    @writes
+    def __delitem__(self, key):
+        if isinstance(key, slice):
+            raise TypeError("%s does not support slice deletion."%
+                self.__class__.__name__)
+        self.pop_subnode(key)
+
+    def __reduce__(self):
+        return (_view_at, self._slot.place())
+
+    # node manipulation
+    def _position(self, index):
+        size = len(self)
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError("subnode index out of range")
+        return index
+
+    def _records(self, node):
+        if isinstance(node, PersistentNode):
+            tree, path = node._slot.place()
+            return tree._share(path)
+        return self._tree._import(node)
+
+    def _insert(self, index, node):
+        tree, path = self._slot.place()
+        record = self._records(node)
+        subnodes = tree._edit_subnodes(path)
+        index = min(max(index + len(subnodes) if index < 0 else index, 0),
+            len(subnodes))
+        subnodes.insert(index, record)
+        if index < len(subnodes) - 1:
+            tree._move_views(path, index, 1)
+
+    @writes
+    def add_subnode(self, node, index=None):
+        self._insert(index if index else len(self), node)
+
+    @writes
+    def pop_subnode(self, index):
+        """Remove the subnode at index; return it as the root of a new
+        PersistentTree."""
+
+        tree, path = self._slot.place()
+        index = self._position(index)
+        record = tree._edit_subnodes(path).pop(index)
+        # the popped records may come back, e.g. by add_subnode; this tree
+        # must not change them in place any more
+        tree._owner = object()
+        detached = PersistentTree(record)
+        tree._move_views(path, index, -1, detached)
+        return detached.root
+
+    @writes
+    def insert_after(self, node):
+        self.uppernode._insert(self._slot.index + 1, node)
+
+    @writes
+    def insert_before(self, node):
+        self.uppernode._insert(self._slot.index, node)
+
+    def clone(self, memo=None, subtrees=None):
+        """Return the root of a new tree sharing the records of this
+        subtree."""
+
+        if subtrees is not None:
+            raise TypeError("%s does not support cloning subtrees."%
+                self.__class__.__name__)
+        tree, path = self._slot.place()
+        cloned = PersistentTree(tree._share(path)).root
+        if memo is not None:
+            memo[id(self)] = cloned
+        return cloned
+
+def _view_at(tree, path):
+    return tree.view(path)
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+from builtins import *
+
+"""Bulk Queries for Stemtree.
+
+select() collects the nodes of a subtree once, builds attribute columns on
+demand and evaluates the conditions on whole columns. Columns are NumPy
+arrays when NumPy is installed and lists otherwise.
+"""
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .search import preorder
+
+_SCALARS = (bool, int, float, str)
+
+def as_column(values):
+    """Return values as a NumPy array, or unchanged without NumPy."""
+
+    if numpy is None:
+        return values
+    kinds = set(type(value) for value in values)
+    if len(kinds) == 1 and kinds.pop() in _SCALARS:
+        return numpy.array(values)
+    column = numpy.empty(len(values), dtype=object)
+    column[:] = values
+    return column
+
+class Columns(dict):
+    """Attribute columns of a list of nodes, built on first access.
+
+    A node without the attribute contributes the shared attribute of the
+    same name, or None.
+    """
+
+    def __init__(self, nodes, shared_attrs=None):
+        super(Columns, self).__init__()
+        self.nodes = nodes
+        self.shared_attrs = shared_attrs if shared_attrs is not None else \
+            (nodes[0]._shared_attrs if nodes else {})
+
+    def values_of(self, name):
+        default = self.shared_attrs.get(name)
+        return [attrs.get(name, default) if attrs else default for attrs in
+            [node._attrs for node in self.nodes]]
+
+    def __missing__(self, name):
+        column = self[name] = as_column(self.values_of(name))
+        return column
+
+def _compare(column, value):
+    if numpy is not None and isinstance(column, numpy.ndarray):
+        if value is not None and type(value) not in _SCALARS:
+            # == would broadcast sequences such as tuples over the column
+            return numpy.fromiter((item == value for item in column), bool,
+                len(column))
+        test = column == value
+        if not isinstance(test, numpy.ndarray):
+            # incomparable types compare unequal as a whole
+            test = numpy.zeros(len(column), dtype=bool) | bool(test)
+        return test
+    return [item == value for item in column]
+
+def _combine(mask, test):
+    if mask is None:
+        return test
+    if numpy is not None and isinstance(mask, numpy.ndarray):
+        return mask & numpy.asarray(test, dtype=bool)
+    return [a and bool(b) for a, b in zip(mask, test)]
+
+def evaluate(columns, size, where=None, match=None):
+    """Return the positions that satisfy match and where.
+
+    match maps attribute names to values that must compare equal; where is
+    called with the columns and returns a boolean sequence.
+    """
+
+    mask = None
+    for name, value in (match or {}).items():
+        mask = _combine(mask, _compare(columns[name], value))
+    if where is not None:
+        mask = _combine(mask, where(columns))
+
+    if mask is None:
+        return list(range(size))
+    if numpy is not None and isinstance(mask, numpy.ndarray):
+        return numpy.flatnonzero(mask).tolist()
+    return [pos for pos, test in enumerate(mask) if test]
+
+def select(node, where=None, indices=False, **match):
+    """Return the nodes under node, node included, that match.
+
+    Nodes are returned in preorder; with indices, their preorder positions.
+    """
+
+    nodes = list(preorder(node))
+    positions = evaluate(Columns(nodes), len(nodes), where, match)
+    return positions if indices else [nodes[pos] for pos in positions]
@@ -3,63 +3,260 @@ from __future__ import (absolute_import, division,
                         print_function, unicode_literals)
 from builtins import *
 import logging
+from collections import deque
 
 """Search Algorithms for Stemtree.
 """
 
-def DFS_LF(node, basket, stopnode):
-    """Depth-first search from the left of a tree."""
+def _dfs_move(node, stopnode, step):
+
+    subnodes = node.subnodes
+    if len(subnodes) > 0:
+        return subnodes[0 if step > 0 else -1]
+
+    nodetype = type(node)
+    while True:
+        upper = node.uppernode
+        if type(upper) != nodetype or upper is stopnode:
+            return None
+        idx = node._get_index()
+        if idx is None:
+            return None
+        idx += step
+        siblings = upper.subnodes
+        if 0 <= idx < len(siblings):
+            return None if siblings[idx] is stopnode else siblings[idx]
+        node = upper
+
+def _dfs_steps(node, stopnode, step):
+    """Yield node, then the nodes that repeated DFS moves from node would
+    return; a true value sent for a node skips its subnodes.
+
+    Positions of the nodes below the starting node are kept on a stack so
+    that moving to a sibling does not need a lookup; a position that no
+    longer matches the tree (e.g. changed by an action) is looked up again.
+    """
+
+    path = []
+    skip = yield node
+    while True:
+        subnodes = () if skip else node.subnodes
+        if len(subnodes) > 0:
+            idx = 0 if step > 0 else len(subnodes) - 1
+            path.append(idx)
+            node = subnodes[idx]
+        elif skip and node is stopnode:
+            node = None
+        else:
+            nodetype = type(node)
+            while True:
+                upper = node.uppernode
+                if type(upper) != nodetype or upper is stopnode:
+                    node = None
+                    break
+                siblings = upper.subnodes
+                idx = path.pop() if path else -1
+                if idx < 0 or idx >= len(siblings) or siblings[idx] is not node:
+                    idx = node._get_index()
+                    if idx is None:
+                        node = None
+                        break
+                idx += step
+                if 0 <= idx < len(siblings):
+                    node = siblings[idx]
+                    if node is stopnode:
+                        node = None
+                    else:
+                        path.append(idx)
+                    break
+                node = upper
 
-    if len(node.subnodes) > 0:
-        newnode = node.subnodes[0]
-    else:
-        newnode = node.get_rightnode(moveup=True, stopnode=stopnode)
+        skip = yield node
 
-    return newnode
+        if node is None:
+            return
+
+def DFS_LF(node, basket, stopnode):
+    """Depth-first search from the left of a tree."""
+    return _dfs_move(node, stopnode, 1)
 
 def DFS_RF(node, basket, stopnode):
     """Depth-first search from the right of a tree."""
-    if len(node.subnodes) > 0:
-        newnode = node.subnodes[-1]
-    else:
-        newnode = node.get_leftnode(moveup=True, stopnode=stopnode)
+    return _dfs_move(node, stopnode, -1)
+
+def _bfs_steps(node, stopnode, reverse):
+    """Yield node, then the nodes that follow it in breadth-first order; a
+    true value sent for a node skips its subnodes.
+
+    The order covers the tree that node belongs to, or the subtree of
+    stopnode if node is under it. Otherwise, the subtree of stopnode is
+    not entered and the order ends at stopnode.
+    """
+
+    skipped = yield node
 
-    return newnode
+    root = node
+    while root is not stopnode and type(root.uppernode) == type(root):
+        root = root.uppernode
+
+    started = False
+    queue = deque([root])
+    while queue:
+        other = queue.popleft()
+        skip = False
+        if started:
+            skip = yield other
+        elif other is node:
+            started, skip = True, skipped
+        if other is stopnode and other is not root:
+            if started:
+                break
+            continue
+        if skip:
+            continue
+        subnodes = other.subnodes
+        if len(subnodes) > 0:
+            queue.extend(reversed(subnodes) if reverse else subnodes)
+
+    yield None
+
+def BFS_LF(node, basket, stopnode):
+    """Breadth-first search from the left of a tree.
+
+    Called on its own the move rescans the levels above node; Node.search
+    keeps a queue instead.
+    """
+    steps = _bfs_steps(node, stopnode, False)
+    next(steps)
+    return next(steps)
+
+def BFS_RF(node, basket, stopnode):
+    """Breadth-first search from the right of a tree.
+
+    Called on its own the move rescans the levels above node; Node.search
+    keeps a queue instead.
+    """
+    steps = _bfs_steps(node, stopnode, True)
+    next(steps)
+    return next(steps)
 
 def UPWARDS(node, basket, stopnode):
     """Upward search."""
-    newnode = node.uppernode
 
-    return newnode
+    if node is stopnode:
+        return None
+
+    return node.uppernode
 
 def NO_SEARCH(node, basket, stopnode):
     """No search."""
     return None
 
-#def BFS_LF(node, basket):
-#    """Breadth-first search from the left of a tree."""
-#
-#    node = node.get_rightnode(moveup=False)
-#    if isinstance(node, node.__class__):
-#        return node
-#
-#    if len(node.subnodes) > 0:
-#        return node.subnodes[0]
-#    else:
-#        return None
-#
-#def BFS_RF(node, basket):
-#    """Breadth-first search from the right of a tree."""
-#
-#    node = node.get_leftnode(moveup=False)
-#    if isinstance(node, node.__class__):
-#        return node
-#
-#    if len(node.subnodes) > 0:
-#        return node.subnodes[-1]
-#    else:
-#        return None
-#
+def preorder(node, reverse=False):
+    """Yield node and its descendants in depth-first preorder."""
+
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        yield node
+        subnodes = node.subnodes
+        if len(subnodes) > 0:
+            stack.extend(subnodes if reverse else reversed(subnodes))
+
+def postorder(node, reverse=False):
+    """Yield the descendants of node in depth-first postorder, then node."""
+
+    stack = [(node, False)]
+    while stack:
+        node, expanded = stack.pop()
+        if expanded:
+            yield node
+            continue
+        stack.append((node, True))
+        subnodes = node.subnodes
+        if len(subnodes) > 0:
+            stack.extend([(subnode, False) for subnode in
+                (subnodes if reverse else reversed(subnodes))])
+
+def levels(node, reverse=False, maxdepth=None):
+    """Yield lists of the nodes at each depth below node, node's first.
+
+    Only one level is kept in memory. maxdepth limits the number of levels
+    below node; the subnodes of the last level are not read.
+    """
+
+    level = [node]
+    depth = 0
+    while level:
+        yield level
+        if maxdepth is not None and depth >= maxdepth:
+            return
+        depth += 1
+        nextlevel = []
+        for node in level:
+            subnodes = node.subnodes
+            if len(subnodes) > 0:
+                nextlevel.extend(reversed(subnodes) if reverse else subnodes)
+        level = nextlevel
+
+def levelorder(node, reverse=False, maxdepth=None):
+    """Yield node and its descendants in breadth-first order."""
+
+    for level in levels(node, reverse=reverse, maxdepth=maxdepth):
+        for node in level:
+            yield node
+
+ORDERS = {
+    'preorder': preorder,
+    'postorder': postorder,
+    'levelorder': levelorder,
+}
+
+_steppers = {
+    DFS_LF: lambda node, stopnode: _dfs_steps(node, stopnode, 1),
+    DFS_RF: lambda node, stopnode: _dfs_steps(node, stopnode, -1),
+    BFS_LF: lambda node, stopnode: _bfs_steps(node, stopnode, False),
+    BFS_RF: lambda node, stopnode: _bfs_steps(node, stopnode, True),
+}
+
+def stepper(move):
+    """Return a generator function equivalent to repeating move, or None.
+
+    The generator takes node and stopnode, yields node first and then the
+    nodes that the moves return; send() a true value instead of next() to
+    skip the subnodes of the last node.
+    """
+
+    try:
+        return _steppers.get(move)
+    except TypeError:
+        return None
+
+def _under(node, top):
+    # whether node is top or below it
+    nodetype = type(node)
+    while type(node) == nodetype and node is not top:
+        node = node.uppernode
+    return node is top
+
+def skip_subtree(move, node, basket, stopnode):
+    """Return the first node that repeated moves from node reach outside
+    the subtree of node, for moves without a stepper.
+
+    The moves must visit subtrees in one run, as depth-first moves do. As
+    with the steppers, a stopnode in the subtree is skipped with it.
+    """
+
+    if node is stopnode:
+        return None
+    top, nodetype = node, type(node)
+    within = None if stopnode is not None and _under(stopnode, top) else \
+        stopnode
+    while True:
+        node = move(node, basket, within)
+        if type(node) != nodetype or not _under(node, top):
+            return node
+
 #def DFS_UP(node, basket):
 #    """Breadth-first search from the left of a tree."""
 #
@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+from builtins import *
+
+"""Selectors for Stemtree.
+
+A selector picks nodes by their attributes and their places in the tree,
+with a syntax after CSS:
+
+    loop call[name^=x]      call nodes under a loop node with a name
+                            starting with x
+    function > #main        nodes named main right under a function node
+    > module, [value>=10]   subnodes of the root that are modules, and
+                            nodes with a value of at least 10
+
+A word matches the attribute named by tag ('kind' by default), #word the
+name attribute and * any node. Brackets test an attribute: [a] is set,
+[a=v], [a!=v], [a^=v], [a$=v], [a*=v] (starts with, ends with, contains)
+and [a<v], [a<=v], [a>v], [a>=v]. Values are numbers, quoted strings or
+words. A space between steps means anywhere below, > right below; a
+leading > anchors the first step at the subnodes of the node queried.
+Attributes are looked up like select() does: own, then shared.
+
+compile() parses a selector once and caches it. The plan walks the tree
+once for all alternatives, tracking the steps each node may still
+complete, and skips the subtrees where nothing is left to match. When
+every alternative ends in an equality test on an attribute that the
+queried node has an index for (see Node.create_index) and some alternative
+is not anchored with > all the way, the candidates come from the index and
+are checked upwards instead.
+"""
+
+import re
+
+from .indexes import _indexes
+
+TAG = 'kind'
+
+_MISSING = object()
+
+_TOKEN = re.compile(r'''
+    \s*(?P<punct>[>,])\s*
+  | (?P<space>\s+)
+  | (?P<star>\*)
+  | \[\s*(?P<attr>[A-Za-z_]\w*)\s*
+      (?:(?P<op>[!^$*<>]?=|[<>])\s*
+         (?P<value>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*'|[^\]\s]+)\s*)?\]
+  | \#(?P<id>[^\s\[\]>,#*]+)
+  | (?P<tag>[A-Za-z_][\w.-]*)
+''', re.VERBOSE)
+
+_KINDS = ('punct', 'space', 'star', 'attr', 'id', 'tag')
+
+_NUMBER = re.compile(r'[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?$')
+
+def _literal(text):
+    if text[0] in '"\'':
+        return re.sub(r'\\(.)', r'\1', text[1:-1])
+    if _NUMBER.match(text):
+        return float(text) if any(c in text for c in '.eE') else int(text)
+    return text
+
+def _compare(op, value, expected):
+    try:
+        if op == '=':
+            return value == expected
+        elif op == '!=':
+            return value != expected
+        elif op == '^=':
+            return value.startswith(expected)
+        elif op == '$=':
+            return value.endswith(expected)
+        elif op == '*=':
+            return expected in value
+        elif op == '<':
+            return value < expected
+        elif op == '<=':
+            return value <= expected
+        elif op == '>':
+            return value > expected
+        else:
+            return value >= expected
+    except (TypeError, AttributeError):
+        return False
+
+def _value(node, name):
+    attrs = node._attrs
+    if attrs and name in attrs:
+        return attrs[name]
+    return node._shared_attrs.get(name, _MISSING)
+
+def _test(node, tests):
+    for name, op, expected in tests:
+        value = _value(node, name)
+        if value is _MISSING:
+            return False
+        if op is not None and not _compare(op, value, expected):
+            return False
+    return True
+
+class Selector(object):
+    """A parsed selector; see compile()."""
+
+    def __init__(self, text, tag=TAG):
+
+        self.text = text
+        self.tag = tag
+        # alternatives of steps (combinator, tests); the combinator of the
+        # first step relates it to the queried node
+        self.alternatives = []
+        self._parse(text)
+
+    def __repr__(self):
+        return "Selector(%r)"%self.text
+
+    def _parse(self, text):
+
+        steps, tests, combinator = [], None, ' '
+        pos, end = 0, len(text.strip())
+        text = text.strip()
+        while pos < end:
+            match = _TOKEN.match(text, pos)
+            if match is None or match.end() == pos:
+                raise ValueError("Invalid selector at %d: %r"%(pos, text))
+            pos = match.end()
+            kind = [name for name in _KINDS if match.group(name) is not None][0]
+
+            if kind in ('punct', 'space'):
+                punct = match.group('punct')
+                if tests is not None:
+                    steps.append((combinator, tests))
+                    tests = None
+                elif punct == '>' and not steps and combinator == ' ':
+                    # leading >
+                    combinator = '>'
+                    continue
+                else:
+                    raise ValueError("Invalid selector at %d: %r"%(pos,
+                        text))
+                if punct == ',':
+                    self.alternatives.append(steps)
+                    steps, combinator = [], ' '
+                else:
+                    combinator = punct or ' '
+                continue
+
+            if tests is None:
+                tests = []
+            if kind == 'tag':
+                tests.append((self.tag, '=', match.group('tag')))
+            elif kind == 'id':
+                tests.append(('name', '=', match.group('id')))
+            elif kind == 'attr':
+                op = match.group('op')
+                tests.append((match.group('attr'), op, _literal(
+                    match.group('value')) if op else None))
+
+        if tests is None:
+            raise ValueError("Incomplete selector: %r"%text)
+        steps.append((combinator, tests))
+        self.alternatives.append(steps)
+
+    def select(self, node):
+        """Return the nodes under node, node included, that match, in
+        preorder."""
+
+        nodes = self._from_index(node)
+        if nodes is not None:
+            return nodes
+        return self._walk(node)
+
+    def _walk(self, top):
+
+        # a state holds (alternative, step, anywhere below) entries of the
+        # steps that a node may match next
+        alternatives = self.alternatives
+        start = frozenset((alt, 0, steps[0][0] == ' ') for alt, steps in
+            enumerate(alternatives))
+        # first steps after a leading > start at the subnodes of top
+        anchored = frozenset(entry for entry in start if not entry[2])
+        found = []
+        transitions = {}
+        stack = [(top, start - anchored)]
+        while stack:
+            node, state = stack.pop()
+            selected = False
+            below = set()
+            if anchored is not None:
+                below.update(anchored)
+                anchored = None
+            for entry in state:
+                alt, index, anywhere = entry
+                if anywhere:
+                    below.add(entry)
+                steps = alternatives[alt]
+                if _test(node, steps[index][1]):
+                    if index == len(steps) - 1:
+                        selected = True
+                    else:
+                        below.add((alt, index + 1,
+                            steps[index + 1][0] == ' '))
+            if selected:
+                found.append(node)
+            if below:
+                below = frozenset(below)
+                # share equal states between nodes
+                below = transitions.setdefault(below, below)
+                subnodes = node.subnodes
+                if len(subnodes) > 0:
+                    stack.extend([(subnode, below) for subnode in
+                        reversed(subnodes)])
+        return found
+
+    def _from_index(self, top):
+
+        index = _indexes.get(id(top))
+        if index is None or all(all(combinator == '>' for combinator, tests
+            in steps) for steps in self.alternatives):
+            # the walk of anchored selectors stops at their last step
+            return None
+        shared = top._shared_attrs
+        candidates = {}
+        for steps in self.alternatives:
+            for name, op, expected in steps[-1][1]:
+                if op == '=' and name in index._buckets and \
+                    name not in shared:
+                    nodes = index.find(name, expected)
+                    break
+            else:
+                return None
+            for node in nodes:
+                if id(node) not in candidates and \
+                    _match_up(node, steps, len(steps) - 1, top):
+                    candidates[id(node)] = node
+        return sorted(candidates.values(), key=lambda node: _path(node, top))
+
+def _match_up(node, steps, index, top):
+    # whether node matches steps[index] and its uppernodes up to top match
+    # the steps before
+    combinator, tests = steps[index]
+    if not _test(node, tests):
+        return False
+    if index == 0 and combinator == ' ':
+        return True
+    if node is top:
+        return False
+    uppernode = node.uppernode
+    if index == 0:
+        return uppernode is top
+    if combinator == '>':
+        return _match_up(uppernode, steps, index - 1, top)
+    while True:
+        if _match_up(uppernode, steps, index - 1, top):
+            return True
+        if uppernode is top:
+            return False
+        uppernode = uppernode.uppernode
+
+def _path(node, top):
+    path = []
+    while node is not top:
+        path.append(node._get_index())
+        node = node.uppernode
+    path.reverse()
+    return path
+
+# parsed selectors by text and tag
+_cache = {}
+_CACHE_SIZE = 512
+
+def compile(text, tag=TAG):
+    """Return the Selector for text, parsed once per text and tag."""
+
+    key = (text, tag)
+    selector = _cache.get(key)
+    if selector is None:
+        if len(_cache) >= _CACHE_SIZE:
+            _cache.clear()
+        selector = _cache[key] = Selector(text, tag)
+    return selector
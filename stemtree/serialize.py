@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+from builtins import *
+
+"""Binary serialization of Stemtree trees.
+
+dump() writes a tree to a binary file object as a sequence of pickle frames:
+
+- a header with the node count and the shared tables,
+- the nodes in preorder, as child counts and layout numbers; a layout is
+  the node class with its attribute and method names and is written once,
+- the attribute and method values in the same order.
+
+Values that refer to nodes of the tree are written as preorder numbers.
+load() reads the frames one at a time and rebuilds the tree without
+recursion.
+
+Node and CompactNode pickle with the same layouts: the whole tree is
+written once from its top node and any node of it is a path from there. The
+structure is rebuilt first and the values are written as the state of the
+top node, in the memo of the enclosing pickle, so that trees may refer to
+each other.
+"""
+
+import gc
+import pickle
+
+from .node import NodeBase, Node, _ATOMIC_TYPES
+from .search import preorder
+
+FORMAT = 'stemtree'
+VERSION = 1
+
+# nodes per frame
+FRAME_SIZE = 8192
+
+def _numbers(nodes):
+    return dict((id(node), number) for number, node in enumerate(nodes))
+
+class _Pickler(pickle.Pickler):
+
+    def __init__(self, file, protocol, numbers):
+        pickle.Pickler.__init__(self, file, protocol)
+        self.numbers = numbers
+
+    def persistent_id(self, obj):
+        return self.numbers.get(id(obj))
+
+class _Unpickler(pickle.Unpickler):
+
+    def __init__(self, file, nodes):
+        pickle.Unpickler.__init__(self, file)
+        self.nodes = nodes
+
+    def persistent_load(self, number):
+        return self.nodes[number]
+
+def _layout(node):
+    cls = node.__class__
+    if not hasattr(cls, '_from_tables'):
+        # views are written as plain nodes
+        cls = Node
+    attrs, methods = node._attrs, node._methods
+    return (cls, tuple(attrs) if attrs else (),
+        tuple(methods) if methods else ())
+
+def _values(nodes):
+    values = []
+    for node in nodes:
+        if node._attrs:
+            values.extend(node._attrs.values())
+        if node._methods:
+            values.extend(node._methods.values())
+    return values
+
+def dump(node, file, protocol=pickle.HIGHEST_PROTOCOL):
+    """Write the tree under node to a binary file object."""
+
+    nodes = list(preorder(node))
+    pickler = pickle.Pickler(file, protocol)
+    pickler.dump((FORMAT, VERSION, len(nodes), FRAME_SIZE,
+        node._shared_attrs, node._shared_methods))
+
+    layouts = {}
+    for start in range(0, len(nodes), FRAME_SIZE):
+        counts, numbers, added = [], [], []
+        for item in nodes[start:start+FRAME_SIZE]:
+            layout = _layout(item)
+            number = layouts.get(layout)
+            if number is None:
+                number = layouts[layout] = len(layouts)
+                added.append(layout)
+            counts.append(len(item.subnodes))
+            numbers.append(number)
+        pickler.clear_memo()
+        pickler.dump((counts, numbers, added))
+
+    refs = None
+    for start in range(0, len(nodes), FRAME_SIZE):
+        values = _values(nodes[start:start+FRAME_SIZE])
+        if all(type(value) in _ATOMIC_TYPES for value in values):
+            pickler.clear_memo()
+            pickler.dump(values)
+        else:
+            if refs is None:
+                refs = _Pickler(file, protocol, _numbers(nodes))
+            refs.clear_memo()
+            refs.dump(values)
+
+def load(file):
+    """Read a tree written by dump() and return its root node."""
+
+    return _without_gc(_load, file)
+
+def _without_gc(func, *args):
+    # the cyclic garbage collector would rescan the tree many times while
+    # the nodes are allocated
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        return func(*args)
+    finally:
+        if collecting:
+            gc.enable()
+
+def _load(file):
+
+    nodes = []
+
+    def read():
+        # frames are written with a fresh memo each
+        return _Unpickler(file, nodes).load()
+
+    header = read()
+    if not isinstance(header, tuple) or header[:2] != (FORMAT, VERSION):
+        raise ValueError("Not a stemtree version %d stream."%VERSION)
+    size, frame, shared_attrs, shared_methods = header[2:]
+
+    NodeBase._update_shared(shared_attrs, shared_methods)
+
+    # structure; stack holds [node, subnodes still to come]
+    layouts, numbers, stack = [], [], []
+    while len(nodes) < size:
+        counts, frame_numbers, added = read()
+        layouts.extend(added)
+        numbers.extend(frame_numbers)
+        _build(nodes, stack, counts, frame_numbers, layouts)
+
+    # values
+    for start in range(0, size, frame):
+        _set_values(nodes, start, min(start + frame, size), layouts, numbers,
+            read())
+
+    return nodes[0] if nodes else None
+
+def _build(nodes, stack, counts, numbers, layouts):
+    # append the nodes of counts and layout numbers in preorder
+    for count, number in zip(counts, numbers):
+        cls = layouts[number][0]
+        if stack:
+            entry = stack[-1]
+            subnodes = entry[0].subnodes
+            node = cls._from_tables(None, None, [] if count else None,
+                entry[0], len(subnodes))
+            subnodes.append(node)
+            entry[1] -= 1
+            if not entry[1]:
+                stack.pop()
+        else:
+            node = cls._from_tables(None, None, [] if count else None)
+        nodes.append(node)
+        if count:
+            stack.append([node, count])
+
+def _set_values(nodes, start, end, layouts, numbers, values):
+    pos = 0
+    for index in range(start, end):
+        cls, attrs, methods = layouts[numbers[index]]
+        if attrs:
+            stop = pos + len(attrs)
+            object.__setattr__(nodes[index], '_attrs',
+                dict(zip(attrs, values[pos:stop])))
+            pos = stop
+        if methods:
+            stop = pos + len(methods)
+            object.__setattr__(nodes[index], '_methods',
+                dict(zip(methods, values[pos:stop])))
+            pos = stop
+
+# pickle support
+def _reduce_node(node, protocol):
+
+    path = []
+    while isinstance(node.uppernode, NodeBase):
+        index = node._get_index()
+        if index is None:
+            # not among the subnodes of its uppernode
+            break
+        path.append(index)
+        node = node.uppernode
+
+    if path:
+        # the top node is pickled once and shared through the pickle memo
+        return _node_at, (node, tuple(reversed(path)))
+
+    nodes = list(preorder(node))
+    layouts, numbers, counts = {}, [], []
+    for item in nodes:
+        layout = _layout(item)
+        numbers.append(layouts.setdefault(layout, len(layouts)))
+        counts.append(len(item.subnodes))
+    layouts = [layout for layout, number in sorted(layouts.items(),
+        key=lambda item: item[1])]
+    # the values are pickled after the top node is in the memo, so they
+    # may refer to it and to other trees that refer back; numbers and
+    # layouts are memoized and written once
+    return _unpack_tree, (counts, numbers, layouts), (node._shared_attrs,
+        node._shared_methods, numbers, layouts, _values(nodes))
+
+def _unpack_tree(counts, numbers, layouts):
+    nodes = []
+    _without_gc(_build, nodes, [], counts, numbers, layouts)
+    return nodes[0]
+
+def _set_state(node, state):
+    # the state written by _reduce_node for the top node
+    shared_attrs, shared_methods, numbers, layouts, values = state
+    NodeBase._update_shared(shared_attrs, shared_methods)
+    nodes = list(preorder(node))
+    _without_gc(_set_values, nodes, 0, len(nodes), layouts, numbers, values)
+
+def _node_at(node, path):
+    for index in path:
+        node = node.subnodes[index]
+    return node
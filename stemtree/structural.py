@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+from builtins import *
+
+"""Structural hashing for Stemtree.
+
+The structural hash of a node covers chosen attributes of the node (all of
+its own attributes by default) and the hashes of its subnodes in order,
+Merkle style: equal subtrees have equal hashes. subtree_hashes() computes
+the hashes of a tree in one postorder pass; hash_attribute() keeps them as
+a derived attribute that edits invalidate (see stemtree.derived). The
+hashes are those of hash() and differ between processes.
+
+duplicate_subtrees() groups the equal subtrees of a tree by their hashes
+and rules out collisions by comparing the candidates.
+
+A HashConsTable interns the records of PersistentTrees: equal subtrees with
+immutable attribute values get one shared record, so that repeated subtrees
+take the memory of one and same_subtree() of interned nodes is an identity
+check. Edits copy the shared records they change, as for snapshots.
+"""
+
+from .node import _is_immutable
+from .persistent import PersistentNode, _Record, _copied
+from .derived import derived
+
+def _items(node, names):
+    attrs = node._attrs
+    if not attrs:
+        return []
+    if names is None:
+        return sorted(attrs.items())
+    return [(name, attrs[name]) for name in names if name in attrs]
+
+def _hashable(value):
+    try:
+        hash(value)
+    except TypeError:
+        return repr(value)
+    return value
+
+def node_hash(node, subhashes, names=None):
+    """Return the structural hash of node given those of its subnodes."""
+
+    return hash((tuple([(name, _hashable(value)) for name, value in
+        _items(node, names)]), tuple(subhashes)))
+
+def _fold(node, func):
+    # func(item, values of its subnodes) for the nodes under node in
+    # postorder; the values wait on a stack rather than in a table by id,
+    # as views such as PersistentNode are made anew
+    values = []
+    stack = [(node, None)]
+    while stack:
+        item, count = stack.pop()
+        if count is None:
+            subnodes = item.subnodes
+            stack.append((item, len(subnodes)))
+            stack.extend([(subnode, None) for subnode in reversed(subnodes)])
+        elif count:
+            subvalues = values[-count:]
+            del values[-count:]
+            values.append(func(item, subvalues))
+        else:
+            values.append(func(item, []))
+    return values[0]
+
+def subtree_hashes(node, names=None):
+    """Return the structural hashes of the nodes under node, node included,
+    by the ids of the nodes."""
+
+    hashes = {}
+    def hashed(item, subhashes):
+        value = hashes[id(item)] = node_hash(item, subhashes, names)
+        return value
+    _fold(node, hashed)
+    return hashes
+
+def structural_hash(node, names=None):
+    """Return the structural hash of the subtree under node."""
+
+    return _fold(node, lambda item, subhashes: node_hash(item, subhashes,
+        names))
+
+def hash_attribute(names=None, name='structural_hash'):
+    """Register the structural hash over names as the derived attribute
+    name and return it; cached hashes are invalidated by edits."""
+
+    def hashed(node, subhashes):
+        return node_hash(node, subhashes, names)
+    return derived(name, names)(hashed)
+
+def _key(value):
+    # equal keys for values that read back the same: types tag the items
+    # of tuples and frozensets too, and repr keeps -0.0 from 0.0
+    kind = type(value)
+    if kind is tuple:
+        return kind, tuple([_key(item) for item in value])
+    if kind is frozenset:
+        return kind, frozenset([_key(item) for item in value])
+    if kind is float or kind is complex:
+        return kind, repr(value)
+    return kind, value
+
+def _record(node):
+    if isinstance(node, PersistentNode):
+        return node._tree._lookup(node._path)
+
+def same_subtree(first, second, names=None):
+    """Return True if the subtrees under first and second have equal
+    attributes, all or names, and shapes."""
+
+    stack = [(first, second)]
+    while stack:
+        first, second = stack.pop()
+        record = _record(first)
+        if record is not None and record is _record(second):
+            # shared records, e.g. interned
+            continue
+        if _items(first, names) != _items(second, names):
+            return False
+        subnodes, others = first.subnodes, second.subnodes
+        if len(subnodes) != len(others):
+            return False
+        stack.extend(zip(subnodes, others))
+    return True
+
+def duplicate_subtrees(node, names=None, min_size=1):
+    """Return lists of the nodes under node whose subtrees are equal and
+    have at least min_size nodes, in postorder."""
+
+    groups = {}
+    def hashed(item, subvalues):
+        value = node_hash(item, [subhash for subhash, size in subvalues],
+            names)
+        size = 1 + sum([size for subhash, size in subvalues])
+        if size >= min_size:
+            groups.setdefault(value, []).append(item)
+        return value, size
+    _fold(node, hashed)
+
+    found = []
+    for candidates in groups.values():
+        while len(candidates) > 1:
+            first, same, rest = candidates[0], [candidates[0]], []
+            for other in candidates[1:]:
+                (same if same_subtree(first, other, names) else
+                    rest).append(other)
+            if len(same) > 1:
+                found.append(same)
+            candidates = rest
+    return found
+
+class HashConsTable(object):
+    """Interned records of persistent trees; see
+    PersistentTree.from_node(node, table)."""
+
+    def __init__(self):
+
+        # records by their attributes, methods and interned subnodes
+        self._records = {}
+        self._owner = object()
+
+    def __len__(self):
+        return len(self._records)
+
+    def clear(self):
+        self._records = {}
+        self._owner = object()
+
+    def intern(self, node):
+        """Return the record of the tree under node; equal subtrees share
+        the interned records."""
+
+        owner, table = self._owner, self._records
+
+        def interned(item, subnodes):
+            subnodes = tuple(subnodes)
+            attrs, methods = item._attrs or {}, item._methods
+            key = None
+            # interned records have interned subnodes only, whose ids stay
+            # valid in keys
+            if all(record.owner is owner for record in subnodes) and \
+                all(_is_immutable(value) for value in attrs.values()):
+                # types keep e.g. 1 and True apart
+                key = (tuple(sorted((name, _key(value)) for name, value in
+                    attrs.items())), tuple(sorted(methods.items())) if
+                    methods else (), tuple([id(record) for record in
+                    subnodes]))
+                record = table.get(key)
+                if record is not None:
+                    return record
+            record = _Record(owner if key is not None else None, dict(attrs),
+                _copied(methods), subnodes)
+            if key is not None:
+                table[key] = record
+            return record
+
+        return _fold(node, interned)
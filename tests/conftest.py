@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+
+"""Test configuration for stemtree."""
+
+import sys
+
+# stemtree.aio and its tests use async syntax
+collect_ignore = []
+if sys.version_info < (3, 6):
+    collect_ignore.append('test_aio.py')
+
+# the tests of the pools use concurrent.futures executors, missing on
+# Python 2 without the futures backport
+try:
+    import concurrent.futures
+except ImportError:
+    collect_ignore.extend(['test_locking.py', 'test_parallel.py'])
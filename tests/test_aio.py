@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `stemtree.aio`."""
+
+import asyncio
+
+from stemtree import Node, DFS_LF, BFS_LF
+
+
+def _tree(fanout, depth):
+    root = Node(attrs={'name': 'root'})
+    level = [root]
+    for _ in range(depth):
+        nextlevel = []
+        for node in level:
+            for _ in range(fanout):
+                subnode = Node()
+                node.add_subnode(subnode)
+                nextlevel.append(subnode)
+        level = nextlevel
+    return root
+
+
+def test_awalk():
+
+    root = _tree(3, 5)
+    ticks = []
+
+    async def tick():
+        while True:
+            ticks.append(None)
+            await asyncio.sleep(0)
+
+    async def walk(order):
+        ticker = asyncio.ensure_future(tick())
+        nodes = [node async for node in root.awalk(order, every=10)]
+        ticker.cancel()
+        return nodes
+
+    loop = asyncio.new_event_loop()
+    try:
+        for order in ('preorder', 'postorder', 'levelorder'):
+            del ticks[:]
+            nodes = loop.run_until_complete(walk(order))
+            assert nodes == list(root.walk(order))
+            # the ticker ran between batches of ten nodes
+            assert len(ticks) >= len(nodes) // 10 - 1
+    finally:
+        loop.close()
+
+
+def test_asearch():
+
+    root = _tree(2, 4)
+    last = root.subnodes[1].subnodes[0]
+
+    async def action(node, basket):
+        await asyncio.sleep(0)
+        basket.setdefault('nodes', []).append(node)
+        if node is last:
+            return node.STOP_SEARCH
+
+    def count(node, basket):
+        basket['count'] = basket.get('count', 0) + 1
+
+    async def upwards(node, basket, stopnode):
+        return node.uppernode
+
+    loop = asyncio.new_event_loop()
+    try:
+        basket = {}
+        node = loop.run_until_complete(root.asearch(action, DFS_LF,
+            basket=basket, every=3))
+        assert node is last
+        expected = []
+        root.search(lambda n, b: expected.append(n) or (n.STOP_SEARCH if
+            n is last else None), DFS_LF)
+        assert basket['nodes'] == expected
+
+        basket = {}
+        loop.run_until_complete(root.asearch(count, BFS_LF, basket=basket))
+        assert basket['count'] == 31
+
+        basket = {}
+        leaf = last.subnodes[0].subnodes[0]
+        node = loop.run_until_complete(leaf.asearch(count, upwards,
+            basket=basket))
+        assert node is None and basket['count'] == 5
+    finally:
+        loop.close()
+
+
+def test_asearch_skip_subtree():
+
+    root = _tree(3, 4)
+    skipped = set(id(node) for node in root.subnodes[1].walk())
+
+    async def action(node, basket):
+        basket.setdefault('nodes', []).append(node)
+        if node is root.subnodes[1]:
+            return node.SKIP_SUBTREE
+
+    expected = [node for node in root.walk() if id(node) not in skipped or
+        node is root.subnodes[1]]
+    loop = asyncio.new_event_loop()
+    try:
+        for move in (DFS_LF, lambda n, b, s: DFS_LF(n, b, s)):
+            basket = {}
+            loop.run_until_complete(root.asearch(action, move, basket=basket,
+                every=5))
+            assert basket['nodes'] == expected
+            # a stopnode in the skipped subtree is skipped with it
+            basket = {}
+            loop.run_until_complete(root.asearch(action, move, basket=basket,
+                stopnode=root.subnodes[1].subnodes[0], every=5))
+            assert basket['nodes'] == expected
+    finally:
+        loop.close()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `stemtree.ancestry`."""
+
+import gc
+import random
+
+import pytest
+
+from stemtree import Node, CompactNode
+from stemtree.ancestry import AncestryIndex
+
+
+def _tree(size, seed, cls=Node):
+    rand = random.Random(seed)
+    nodes = [cls(attrs={'name': 'n0'})]
+    for idx in range(1, size):
+        node = cls(attrs={'name': 'n%d' % idx})
+        rand.choice(nodes).add_subnode(node)
+        nodes.append(node)
+    return nodes
+
+
+def _lca(first, second):
+    above = set([id(first)] + [id(n) for n in first.get_uppernodes()])
+    for node in [second] + list(second.get_uppernodes()):
+        if id(node) in above:
+            return node
+
+
+def test_ancestry_queries():
+
+    for cls in (Node, CompactNode):
+        nodes = _tree(300, 1, cls)
+        root = nodes[0]
+        index = AncestryIndex(root)
+        rand = random.Random(2)
+
+        assert len(index) == 300
+        assert [index.preorder_number(n) for n in root.walk()] == \
+            list(range(300))
+        assert [index.postorder_number(n) for n in root.walk('postorder')] \
+            == list(range(300))
+        for node in nodes:
+            assert index.depth(node) == len(list(node.get_uppernodes()))
+            assert index.subtree_size(node) == len(list(node.walk()))
+
+        for _ in range(500):
+            first, second = rand.choice(nodes), rand.choice(nodes)
+            assert index.lca(first, second) is _lca(first, second)
+            assert index.is_ancestor(first, second) == (first is not second
+                and any(n is first for n in second.get_uppernodes()))
+
+        with pytest.raises(ValueError):
+            index.depth(cls())
+        index.close()
+
+
+def test_ancestry_edits():
+
+    nodes = _tree(50, 3)
+    root = nodes[0]
+    index = AncestryIndex(root)
+    assert len(root) > 1
+    leaf = list(root.walk())[-1]
+    assert index.depth(leaf) > 0
+
+    # edits outside the tree are ignored
+    other = Node()
+    other.add_subnode(Node())
+    assert not index._stale
+
+    added = Node()
+    leaf.add_subnode(added)
+    assert index.depth(added) == index.depth(leaf) + 1
+    assert index.lca(added, nodes[0]) is root
+
+    moved = root.pop_subnode(0)
+    assert moved not in index and len(index) == 51 - len(list(moved.walk()))
+    added.insert_after(moved)
+    assert index.is_ancestor(leaf, moved)
+
+    root[0] = other
+    assert other in index and index.lca(other[0], leaf) is root
+
+    # the index stops watching when it is dropped
+    watchers = len(Node._watchers)
+    del index
+    gc.collect()
+    assert len(Node._watchers) == watchers - 1
@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `stemtree.columnar`."""
+
+import copy
+import pickle
+import random
+
+import pytest
+
+from stemtree import Node, DFS_LF, DFS_RF, BFS_LF, UPWARDS
+from stemtree.columnar import TreeStore, NodeView
+
+
+def _tree(size, seed):
+    rand = random.Random(seed)
+    nodes = [Node(attrs={'name': 'root', 'order': 0})]
+    for idx in range(1, size):
+        node = Node(attrs={'name': 'n%d' % idx, 'order': idx})
+        if idx % 3:
+            node.odd = True
+        rand.choice(nodes).add_subnode(node)
+        nodes.append(node)
+    return nodes
+
+
+def test_store_structure():
+
+    nodes = _tree(100, 0)
+    store = TreeStore.from_node(nodes[0])
+    root = store.root
+
+    assert len(store) == 100
+    assert root.store_index == 0
+    assert store.view(5) is store.view(5)
+    assert [n.name for n in root.walk()] == \
+        [n.name for n in nodes[0].walk()]
+    assert [n.name for n in root.walk(reverse=True)] == \
+        [n.name for n in nodes[0].walk(reverse=True)]
+    assert [n.name for n in root.walk('postorder')] == \
+        [n.name for n in nodes[0].walk('postorder')]
+
+    views = dict((v.order, v) for v in root.walk())
+    for node in nodes:
+        view = views[node.order]
+        assert [n.order for n in view.get_uppernodes()] == \
+            [n.order for n in node.get_uppernodes()]
+        assert len(view) == len(node)
+        if node.uppernode is not None:
+            assert view._get_index() == node._get_index()
+        assert hasattr(view, 'odd') == hasattr(node, 'odd')
+
+    assert store.to_node().treeview('order') == nodes[0].treeview('order')
+
+
+def test_store_search():
+
+    nodes = _tree(120, 1)
+    store = TreeStore.from_node(nodes[0])
+    views = dict((v.order, v) for v in store.root.walk())
+    rand = random.Random(2)
+
+    for move in (DFS_LF, DFS_RF, BFS_LF, UPWARDS):
+        for _ in range(40):
+            start = rand.choice(nodes)
+            stopnode = rand.choice(nodes + [None] * 5)
+            expected, visited = [], []
+            last = start.search(lambda n, b: expected.append(n.order), move,
+                stopnode=stopnode)
+            vlast = views[start.order].search(
+                lambda n, b: visited.append(n.order), move,
+                stopnode=None if stopnode is None else views[stopnode.order])
+            assert visited == expected
+            assert (last is None and vlast is None) or \
+                last.order == vlast.order
+
+            # subtrees of nodes with odd orders skipped
+            if move in (DFS_LF, DFS_RF):
+                expected, visited = [], []
+                start.search(lambda n, b: expected.append(n.order) or
+                    (n.order % 2 and n.SKIP_SUBTREE), move, stopnode=stopnode)
+                views[start.order].search(lambda n, b: visited.append(n.order)
+                    or (n.order % 2 and n.SKIP_SUBTREE), move,
+                    stopnode=None if stopnode is None else
+                    views[stopnode.order])
+                assert visited == expected
+
+
+def test_store_edit():
+
+    store = TreeStore()
+    root = store.view(store.add(attrs={'name': 'root'}))
+    sub = Node(attrs={'name': 'a'})
+    sub.add_subnode(Node(attrs={'name': 'b'}))
+    root.add_subnode(sub)
+    root.add_subnode(Node(attrs={'name': 'c'}))
+
+    assert [str(n) for n in root.walk()] == ['root', 'a', 'b', 'c']
+    root[1].value = 3
+    assert root[1].value == 3 and not hasattr(root[0], 'value')
+    del root[1].value
+    assert not hasattr(root[1], 'value')
+
+    with pytest.raises(TypeError):
+        root.pop_subnode(0)
+    with pytest.raises(AttributeError):
+        root.method = lambda node: None
+
+    loaded = pickle.loads(pickle.dumps(root))
+    assert isinstance(loaded, NodeView)
+    assert [str(n) for n in loaded.walk()] == ['root', 'a', 'b', 'c']
+
+    # clones are new stores; mutable values are copied
+    root[1].items = [root[0][0]]
+    cloned = root.clone()
+    assert isinstance(cloned, NodeView) and cloned._store is not store
+    assert [str(n) for n in cloned.walk()] == ['root', 'a', 'b', 'c']
+    assert cloned[1].items[0] is cloned[0][0]
+    cloned[0].name = 'changed'
+    assert str(root[0]) == 'a'
+    part = copy.deepcopy(root[0])
+    assert [str(n) for n in part.walk()] == ['a', 'b'] and \
+        part.uppernode is None
+    with pytest.raises(TypeError):
+        root.clone(subtrees=[root[0]])
+
+
+def test_store_select():
+
+    nodes = _tree(80, 3)
+    store = TreeStore.from_node(nodes[0])
+    root = store.root
+
+    assert [n.order for n in root.select(odd=True)] == \
+        [n.order for n in nodes[0].select(odd=True)]
+    assert [n.order for n in root.select(where=lambda c:
+        [o is not None and o % 5 == 0 for o in c['order']])] == \
+        [n.order for n in nodes[0].walk() if n.order % 5 == 0]
+    indices = root.select(name='n7', indices=True)
+    assert [store.get(i, 'name') for i in indices] == ['n7']
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `stemtree.derived`."""
+
+import random
+
+import pytest
+
+from stemtree import Node, CompactNode
+from stemtree.derived import derived
+
+
+def _tree(size, seed, cls=Node):
+    rand = random.Random(seed)
+    nodes = [cls(attrs={'value': 0})]
+    for idx in range(1, size):
+        node = cls(attrs={'value': idx})
+        rand.choice(nodes).add_subnode(node)
+        nodes.append(node)
+    return nodes
+
+
+def _total(node):
+    return sum(n.value for n in node.walk())
+
+
+@pytest.fixture
+def total():
+    calls = []
+
+    @derived(attrs=('value',))
+    def total(node, values):
+        calls.append(node)
+        return node.value + sum(values)
+
+    total.calls = calls
+    yield total
+    total.close()
+
+
+def test_derived(total):
+
+    for cls in (Node, CompactNode):
+        nodes = _tree(300, 1, cls)
+        root = nodes[0]
+        assert total(root) == _total(root)
+        assert root.get_derived('total') == total(root)
+        assert len(total.calls) == 300
+        assert total(nodes[10]) == _total(nodes[10]) and len(total.calls) == 300
+
+        # an attribute edit recomputes the uppernodes only
+        del total.calls[:]
+        node = nodes[250]
+        node.value = 1000
+        assert total(root) == _total(root)
+        assert len(total.calls) == len(list(node.get_uppernodes())) + 1
+
+        # other attributes do not invalidate
+        del total.calls[:]
+        node.other = 1
+        assert total(root) == _total(root) and total.calls == []
+
+        # structural edits
+        upper = nodes[5]
+        upper.add_subnode(cls(attrs={'value': 7}))
+        assert total(root) == _total(root)
+        moved = upper.uppernode.pop_subnode(upper._get_index())
+        assert moved not in total
+        assert total(root) == _total(root)
+        nodes[3][0:0] = [moved]
+        assert total(root) == _total(root)
+        assert total(moved) == _total(moved)
+        del nodes[3][0]
+        assert total(root) == _total(root)
+        del total.calls[:]
+
+    # direct changes need invalidate()
+    root.subnodes.append(Node(attrs={'value': 5}))
+    assert total(root) != _total(root)
+    total.invalidate()
+    assert total(root) == _total(root)
+
+    with pytest.raises(ValueError):
+        root.get_derived('missing')
+
+
+def test_derived_deep(total):
+
+    root = node = Node(attrs={'value': 1})
+    for _ in range(5000):
+        sub = Node(attrs={'value': 1})
+        node.add_subnode(sub)
+        node = sub
+    assert total(root) == 5001
+    node.value = 2
+    assert total(root) == 5002
+
+    @derived()
+    def height(node, values):
+        return 1 + max(values) if values else 0
+
+    assert root.get_derived('height') == 5000
+    height.close()
+    with pytest.raises(ValueError):
+        root.get_derived('height')
+
+
+def test_derived_collected():
+
+    import gc
+    import weakref
+
+    @derived()
+    def size(node, values):
+        return 1 + sum(values)
+
+    try:
+        for cls in (Node, CompactNode):
+            root = _tree(50, 2, cls)[0]
+            assert size(root) == 50
+            ref = weakref.ref(root)
+            del root
+            gc.collect()
+            assert ref() is None
+            assert len(size._values) == 0
+    finally:
+        size.close()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `stemtree.indexes`."""
+
+import random
+
+from stemtree import Node, CompactNode
+
+
+def _tree(size, seed, cls=Node):
+    rand = random.Random(seed)
+    nodes = [cls(attrs={'name': 'root', 'kind': 'root'})]
+    for idx in range(1, size):
+        node = cls(attrs={'name': 'n%d' % idx, 'kind': 'k%d' % (idx % 5)})
+        rand.choice(nodes).add_subnode(node)
+        nodes.append(node)
+    return nodes
+
+
+def _ids(nodes):
+    return sorted(id(node) for node in nodes)
+
+
+def test_find_by():
+
+    for cls in (Node, CompactNode):
+        nodes = _tree(200, 1, cls)
+        root = nodes[0]
+        scanned = root.find_by('kind', 'k1')
+        assert len(scanned) == 40
+
+        index = root.create_index('name', 'kind')
+        assert sorted(index.names) == ['kind', 'name']
+        assert _ids(root.find_by('kind', 'k1')) == _ids(scanned)
+        assert root.find_by('name', 'n7') == [nodes[7]]
+        assert root.find_by('name', 'missing') == []
+
+        # attribute edits
+        nodes[7].name = 'seven'
+        assert root.find_by('name', 'n7') == []
+        assert root.find_by('name', 'seven') == [nodes[7]]
+        del nodes[8].kind
+        nodes[9].kind = ['unhashable']
+        assert len(root.find_by('kind', 'k3')) == 39
+        assert len(root.find_by('kind', 'k4')) == 39
+        # unhashable queries scan the tree
+        assert root.find_by('kind', ['unhashable']) == [nodes[9]]
+        assert root.find_by('name', ['n1']) == []
+
+        # structure edits
+        sub = nodes[10]
+        upper = sub.uppernode
+        upper.pop_subnode(sub._get_index())
+        removed = list(sub.walk())
+        assert len(index) == 200 - len(removed)
+        assert root.find_by('name', 'n10') == []
+        assert sub.find_by('name', 'n10') == [sub]
+        sub.name = 'outside'
+        assert root.find_by('name', 'outside') == []
+
+        extra = cls(attrs={'name': 'extra', 'kind': 'k1'})
+        extra.add_subnode(cls(attrs={'name': 'deep'}))
+        nodes[20].insert_before(extra)
+        assert root.find_by('name', 'deep') == [extra[0]]
+        upper.add_subnode(sub)
+        assert root.find_by('name', 'outside') == [sub]
+        root[0] = cls(attrs={'name': 'first'})
+        assert root.find_by('name', 'first') == [root[0]]
+
+        # the index agrees with a scan
+        for name, value in (('kind', 'k1'), ('kind', 'k4'), ('name', 'n50')):
+            expected = [n for n in root.walk() if n._attrs and
+                n._attrs.get(name) == value]
+            assert _ids(root.find_by(name, value)) == _ids(expected)
+
+        root.drop_index('name')
+        assert index.names == ['kind']
+        root.drop_index()
+        assert all(ref() is not index for ref in Node._watchers)
+        nodes[30].kind = 'k1'
+        assert nodes[30] in root.find_by('kind', 'k1')
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `stemtree.locking`."""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from stemtree import Node, CompactNode, DFS_LF
+from stemtree.locking import (enable_locking, disable_locking,
+    ConcurrentModificationError)
+
+
+@pytest.fixture
+def lock():
+    yield enable_locking()
+    disable_locking()
+
+
+def _count(node, basket):
+    basket['count'] = basket.get('count', 0) + 1
+
+
+def test_locking_stress(lock):
+
+    root = Node(attrs={'name': 'root'})
+    branches = [Node(attrs={'name': 'b%d' % i}) for i in range(4)]
+    for branch in branches:
+        root.add_subnode(branch)
+        for _ in range(10):
+            branch.add_subnode(Node())
+
+    def write(step):
+        branch = branches[step % len(branches)]
+        for _ in range(50):
+            with branch.writing():
+                node = Node(shared_attrs={'step': step})
+                branch.add_subnode(node)
+                node.insert_before(CompactNode())
+                branch.pop_subnode(node._get_index())
+                branch.pop_subnode(-1)
+        return step
+
+    def read(step):
+        sizes = []
+        for _ in range(20):
+            basket = {}
+            root.search(_count, DFS_LF, basket=basket)
+            sizes.append(basket['count'])
+            with root.reading():
+                sizes.append(len(list(root.walk())))
+        return sizes
+
+    with ThreadPoolExecutor(8) as pool:
+        futures = [pool.submit(write if i % 4 == 0 else read, i)
+            for i in range(32)]
+        results = [future.result() for future in futures]
+
+    # readers never see a writer halfway
+    for sizes in results[1::4] + results[2::4] + results[3::4]:
+        assert set(sizes) == set([45])
+    assert len(list(root.walk())) == 45
+    assert [n._get_index() for n in branches[0].subnodes] == list(range(10))
+
+
+def test_concurrent_modification(lock):
+
+    root = Node()
+    for _ in range(3):
+        root.add_subnode(Node())
+
+    # changes by the iterating thread are allowed
+    nodes = root.walk()
+    next(nodes)
+    root.add_subnode(Node())
+    assert len(list(nodes)) == 4
+
+    nodes = root.walk()
+    next(nodes)
+    thread = threading.Thread(target=root.add_subnode, args=(Node(),))
+    thread.start()
+    thread.join()
+    with pytest.raises(ConcurrentModificationError):
+        next(nodes)
+
+    # writes to other trees are not concurrent modifications, writes to
+    # the same tree are, in mixed node types too
+    other = Node()
+    nodes = root.walk()
+    next(nodes)
+    thread = threading.Thread(target=other.add_subnode, args=(Node(),))
+    thread.start()
+    thread.join()
+    assert len(list(nodes)) == len(root)
+    root[0].add_subnode(CompactNode())
+    nodes = root[0].walk()
+    next(nodes)
+    thread = threading.Thread(target=root[0][0].add_subnode,
+        args=(CompactNode(),))
+    thread.start()
+    thread.join()
+    with pytest.raises(ConcurrentModificationError):
+        next(nodes)
+
+    # no upgrade from the read lock; edits in a search need the write lock
+    def add(node, basket):
+        node.add_subnode(Node())
+        return node.STOP_SEARCH
+
+    with pytest.raises(RuntimeError):
+        root.search(add, DFS_LF)
+    with root.writing():
+        root.search(add, DFS_LF)
+    assert len(root) == 6
+
+
+def test_disable_locking():
+
+    enable_locking()
+    disable_locking()
+    root = Node()
+    assert not hasattr(Node.add_subnode, '__wrapped__')
+    assert Node._lock is None
+    with root.reading():
+        root.add_subnode(Node())
+    assert len(root) == 1
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `stemtree.mapped`."""
+
+import random
+
+import pytest
+
+from stemtree import Node, DFS_LF, DFS_RF, UPWARDS
+from stemtree.mapped import write, MappedTree, MappedNode
+
+
+def hello(node):
+    return 'hello %s' % node.name
+
+
+def _tree(size, seed):
+    rand = random.Random(seed)
+    nodes = [Node(attrs={'name': 'root', 'order': 0})]
+    for idx in range(1, size):
+        node = Node(attrs={'name': 'n%d' % idx, 'order': idx})
+        rand.choice(nodes).add_subnode(node)
+        nodes.append(node)
+    return nodes
+
+
+def test_mapped_structure(tmp_path):
+
+    nodes = _tree(120, 7)
+    nodes[5].greet = hello
+    nodes[6].ref = nodes[100]
+    nodes[8].bare = None
+    del nodes[8].name, nodes[8].order, nodes[8].bare
+    path = str(tmp_path / 'tree.stm')
+    write(nodes[0], path)
+
+    with MappedTree(path) as tree:
+        root = tree.root
+        assert len(tree) == 120 and root is tree[0]
+        assert isinstance(root, MappedNode)
+        assert tree._nodes.keys() == set([0])
+        assert root.treeview('order').replace('MappedNode', 'Node') == \
+            nodes[0].treeview('order')
+        assert [getattr(n, 'order', None) for n in root.walk('postorder')] == \
+            [getattr(n, 'order', None) for n in nodes[0].walk('postorder')]
+
+        found = dict((n.order, n) for n in root.walk() if hasattr(n, 'order'))
+        assert found[5].greet() == 'hello n5'
+        assert found[6].ref is found[100]
+        assert len(found[3]) == len(nodes[3])
+        bare = [n for n in root.walk() if not hasattr(n, 'order')]
+        assert len(bare) == 1 and bare[0]._attrs == {}
+        assert [n.order for n in found[30].get_uppernodes()] == \
+            [n.order for n in nodes[30].get_uppernodes()]
+
+        with pytest.raises(TypeError):
+            found[3].name = 'x'
+        with pytest.raises(TypeError):
+            root.add_subnode(Node())
+
+        copied = found[3].clone()
+        assert isinstance(copied, Node)
+        assert copied.treeview('order') == nodes[3].treeview('order')
+
+
+def test_mapped_search(tmp_path):
+
+    nodes = _tree(60, 8)
+    path = str(tmp_path / 'tree.stm')
+    write(nodes[0], path)
+
+    def order(node):
+        return None if node is None else node.order
+
+    with MappedTree(path) as tree:
+        mapped = dict((n.order, n) for n in tree.root.walk())
+        # every start against every stopnode
+        for move in (DFS_LF, DFS_RF, UPWARDS):
+            for start in nodes:
+                for stop in nodes + [None]:
+                    mstop = None if stop is None else mapped[stop.order]
+                    expected, visited = [], []
+                    last = start.search(lambda n, b:
+                        expected.append(n.order), move, stopnode=stop)
+                    mlast = mapped[start.order].search(lambda n, b:
+                        visited.append(n.order), move, stopnode=mstop)
+                    assert visited == expected
+                    assert order(mlast) == order(last)
+
+                    # subtrees of nodes with odd orders skipped
+                    expected, visited = [], []
+                    last = start.search(lambda n, b: expected.append(n.order)
+                        or (n.order % 2 and n.SKIP_SUBTREE), move,
+                        stopnode=stop)
+                    mlast = mapped[start.order].search(lambda n, b:
+                        visited.append(n.order) or (n.order % 2 and
+                        n.SKIP_SUBTREE), move, stopnode=mstop)
+                    assert visited == expected
+                    assert order(mlast) == order(last)
+
+
+def test_mapped_lazy(tmp_path):
+
+    root = node = Node(attrs={'name': 'n0'})
+    for idx in range(1, 2000):
+        node.add_subnode(Node(attrs={'name': 'n%d' % idx}))
+        if idx % 50 == 0:
+            node = node[-1]
+    path = str(tmp_path / 'tree.stm')
+    write(root, path)
+
+    with MappedTree(path) as tree:
+        start = tree.node(1000)
+        stop = tree.node(1010)
+        visited = []
+        start.search(lambda n, b: visited.append(n), DFS_LF, stopnode=stop)
+        assert [n.tree_index for n in visited] == list(range(1000, 1010))
+        assert len(tree._nodes) == 11
+        assert not any(hasattr(n, '_tables') for n in tree._nodes.values()
+            if n is not start)
+        assert str(start) == str(list(root.walk())[1000])
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `stemtree.parallel`."""
+
+import random
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from stemtree import Node, DFS_LF
+from stemtree.parallel import partition, map_subtrees, parallel_search
+
+
+def _tree(size, seed):
+    rand = random.Random(seed)
+    nodes = [Node(attrs={'name': 'root', 'order': 0})]
+    for idx in range(1, size):
+        node = Node(attrs={'name': 'n%d' % idx, 'order': idx})
+        rand.choice(nodes[:max(1, idx // 2)]).add_subnode(node)
+        nodes.append(node)
+    return nodes
+
+
+def collect(node, basket):
+    basket.setdefault('orders', []).append(node.order)
+    basket['count'] = basket.get('count', 0) + 1
+
+
+def merge(first, second):
+    return {'orders': first.get('orders', []) + second.get('orders', []),
+        'count': first.get('count', 0) + second.get('count', 0)}
+
+
+def collect_even(node, basket):
+    collect(node, basket)
+    if node.order % 2:
+        return node.SKIP_SUBTREE
+
+
+def collect_until_a(node, basket):
+    basket.setdefault('names', []).append(node.name)
+    if node.name == 'a':
+        return node.STOP_SEARCH
+
+
+def merge_names(first, second):
+    return {'names': first.get('names', []) + second.get('names', [])}
+
+
+def size(node):
+    return sum(1 for _ in node.walk())
+
+
+def test_partition():
+
+    nodes = _tree(100, 1)
+    local, roots = partition(nodes[0], 2)
+    assert local == list(nodes[0].iter_levelorder(maxdepth=1))
+    assert roots == list(nodes[0].iter_levels(maxdepth=2))[2]
+    assert partition(nodes[0], 0) == ([], [nodes[0]])
+
+
+def test_parallel_search():
+
+    nodes = _tree(300, 2)
+    expected = {}
+    nodes[0].search(collect, DFS_LF, basket=expected)
+
+    with ProcessPoolExecutor(2) as pool:
+        for depth in (0, 1, 3):
+            basket = parallel_search(nodes[0], collect, merge, depth=depth,
+                executor=pool)
+            assert basket['count'] == 300
+            assert sorted(basket['orders']) == sorted(expected['orders'])
+
+        sizes = map_subtrees(nodes[0], size, depth=2, executor=pool,
+            chunksize=2)
+        assert sizes == [size(n) for n in partition(nodes[0], 2)[1]]
+
+    with ThreadPoolExecutor(3) as pool:
+        basket = parallel_search(nodes[0], collect, merge, depth=1,
+            executor=pool, chunksize=1)
+    local, roots = partition(nodes[0], 1)
+    assert basket['orders'] == [n.order for n in local] + \
+        sum([[n.order for n in root.walk()] for root in roots], [])
+
+    assert map_subtrees(nodes[0], size, depth=1, workers=2) == \
+        [size(n) for n in roots]
+
+
+def test_parallel_skip_subtree():
+
+    nodes = _tree(300, 3)
+    expected = {}
+    nodes[0].search(collect_even, DFS_LF, basket=expected)
+    assert expected['count'] < 300
+
+    with ThreadPoolExecutor(2) as pool:
+        for depth in (1, 2, 4):
+            basket = parallel_search(nodes[0], collect_even, merge,
+                depth=depth, executor=pool)
+            assert sorted(basket['orders']) == sorted(expected['orders'])
+
+
+def test_parallel_stop_search():
+
+    root = Node(attrs={'name': 'root'})
+    for name in ('a', 'b'):
+        node = Node(attrs={'name': name})
+        root.add_subnode(node)
+        for idx in range(2):
+            node.add_subnode(Node(attrs={'name': '%s%d' % (name, idx)}))
+
+    expected = {}
+    root.search(collect_until_a, DFS_LF, basket=expected)
+    assert expected['names'] == ['root', 'a']
+
+    with ThreadPoolExecutor(2) as pool:
+        for depth in (1, 2):
+            basket = parallel_search(root, collect_until_a, merge_names,
+                depth=depth, executor=pool)
+            assert basket['names'] == expected['names']
+    # no pool is started when nothing is left to search
+    assert parallel_search(root, collect_until_a, merge_names,
+        depth=2)['names'] == expected['names']
+
+
+def test_parallel_without_futures(monkeypatch):
+
+    from stemtree import parallel
+    monkeypatch.setattr(parallel, 'ProcessPoolExecutor', None)
+
+    nodes = _tree(100, 4)
+    expected = {}
+    nodes[0].search(collect, DFS_LF, basket=expected)
+    basket = parallel_search(nodes[0], collect, merge, depth=2, workers=2)
+    assert sorted(basket['orders']) == sorted(expected['orders'])
+    assert map_subtrees(nodes[0], size, depth=1, workers=2) == \
+        [size(n) for n in partition(nodes[0], 1)[1]]
+    stopped = Node(attrs={'name': 'root'})
+    for name in ('a', 'b'):
+        stopped.add_subnode(Node(attrs={'name': name}))
+    assert parallel_search(stopped, collect_until_a, merge_names,
+        depth=1)['names'] == ['root', 'a']
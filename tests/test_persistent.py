@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `stemtree.persistent`."""
+
+import copy
+import pickle
+import random
+
+import pytest
+
+from stemtree import Node, DFS_LF, BFS_LF
+from stemtree.persistent import PersistentTree, PersistentNode
+
+
+def _tree(size, seed):
+    rand = random.Random(seed)
+    nodes = [Node(attrs={'name': 'root'})]
+    for idx in range(1, size):
+        node = Node(attrs={'name': 'n%d' % idx})
+        rand.choice(nodes).add_subnode(node)
+        nodes.append(node)
+    return nodes
+
+
+def _names(node):
+    return [str(n) for n in node.walk()]
+
+
+def test_persistent_structure():
+
+    nodes = _tree(60, 1)
+    tree = PersistentTree.from_node(nodes[0])
+    root = tree.root
+
+    assert isinstance(root, PersistentNode)
+    assert root is tree.view(())
+    assert _names(root) == _names(nodes[0])
+    assert _names(root) == _names(tree.to_node())
+    assert [str(n) for n in root.walk('postorder')] == \
+        [str(n) for n in nodes[0].walk('postorder')]
+    assert root.treeview() == nodes[0].treeview()
+
+    for move in (DFS_LF, BFS_LF):
+        for start in (root, root[0]):
+            visited, expected = [], []
+            start.search(lambda n, b: visited.append(str(n)), move)
+            original = [n for n in nodes[0].walk() if str(n) == str(start)][0]
+            original.search(lambda n, b: expected.append(str(n)), move)
+            assert visited == expected
+
+    leaf = list(root.walk())[-1]
+    assert [str(n) for n in leaf.get_uppernodes()] == \
+        [str(n) for n in list(nodes[0].walk())[-1].get_uppernodes()]
+
+
+def test_persistent_snapshots():
+
+    nodes = _tree(40, 2)
+    tree = PersistentTree.from_node(nodes[0])
+    before = tree.snapshot()
+    expected = _names(before.root)
+
+    root = tree.root
+    leaf = list(root.walk())[-1]
+    leaf.name = 'changed'
+    leaf.value = [1]
+    root.add_subnode(Node(attrs={'name': 'added'}))
+    popped = root.pop_subnode(0)
+    root[0].insert_after(Node(attrs={'name': 'after'}))
+    root[0].insert_before(Node(attrs={'name': 'before'}))
+
+    assert _names(before.root) == expected
+    assert _names(tree.root)[-1] == 'added'
+    assert 'changed' in _names(tree.root)
+    assert 'changed' not in expected
+    assert [str(n) for n in root][:3] == \
+        ['before', str(before.root[1]), 'after']
+    assert len(root) == len(before.root) + 2 and str(root[-1]) == 'added'
+    assert _names(popped) == _names(before.root[0])
+
+    # unchanged subtrees are shared, changed paths are copied
+    assert tree._record.subnodes[1] is before._record.subnodes[1]
+    assert tree._record is not before._record
+
+    # a second edit after the snapshot copies nothing
+    record = tree._record
+    root.other = 1
+    assert tree._record is record
+
+    with pytest.raises(AttributeError):
+        del before.root.missing
+    del leaf.value
+    assert not hasattr(leaf, 'value')
+
+    # a popped subtree added back is not shared in place with its tree
+    detached = root.pop_subnode(0)
+    root.add_subnode(detached)
+    root[-1].x = 5
+    detached.deeper = 1
+    assert not hasattr(detached, 'x')
+    assert not hasattr(root[-1], 'deeper')
+    assert root[-1].x == 5 and detached.deeper == 1
+
+
+def test_persistent_views():
+
+    nodes = _tree(30, 3)
+    tree = PersistentTree.from_node(nodes[0])
+    root = tree.root
+    first, second = root[0], root[1]
+    name = str(second)
+
+    root.add_subnode(Node(attrs={'name': 'front'}), 1)
+    assert root[2] is second and str(second) == name
+    assert second.tree_path == (2,)
+
+    popped = root.pop_subnode(0)
+    assert popped is first and first.persistent_tree is not tree
+    assert first.uppernode is None
+    assert root[1] is second
+
+    cloned = second.clone()
+    cloned.name = 'copy'
+    assert str(second) == name
+    second.add_subnode(cloned)
+    cloned.name = 'again'
+    assert str(second[-1]) == 'copy'
+
+    copied = copy.deepcopy(root)
+    assert _names(copied) == _names(root)
+
+    loaded = pickle.loads(pickle.dumps(root))
+    assert _names(loaded) == _names(root)
+    loaded[1].name = 'loaded'
+    assert str(second) == name
+
+    with pytest.raises(TypeError):
+        root[0:1] = []
+    with pytest.raises(IndexError):
+        root.pop_subnode(len(root))
+
+
+def test_persistent_view_slots():
+
+    import gc
+
+    root = Node(attrs={'name': 'root'})
+    for idx in range(5):
+        node = Node(attrs={'name': 'n%d' % idx})
+        node.add_subnode(Node(attrs={'name': 'n%d.0' % idx}))
+        root.add_subnode(node)
+    tree = PersistentTree.from_node(root)
+    views = list(tree.root.subnodes)
+    deep = [view[0] for view in views]
+
+    # views below the moved subnodes follow them
+    tree.root.add_subnode(Node(attrs={'name': 'front'}), 1)
+    assert [view.tree_path for view in deep] == \
+        [(0, 0), (2, 0), (3, 0), (4, 0), (5, 0)]
+    popped = tree.root.pop_subnode(2)
+    assert popped is views[1] and deep[1].persistent_tree is \
+        popped.persistent_tree and deep[1].tree_path == (0,)
+    assert [str(view) for view in deep] == \
+        ['n0.0', 'n1.0', 'n2.0', 'n3.0', 'n4.0']
+    assert deep[4].tree_path == (4, 0) and tree.view((4, 0)) is deep[4]
+
+    # slots of dead views go away
+    del views, deep, popped
+    gc.collect()
+    assert not tree._root_slot.subslots
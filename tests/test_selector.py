@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `stemtree.selector`."""
+
+import pytest
+
+from stemtree import Node, CompactNode
+from stemtree.selector import compile, Selector
+
+
+def _program(cls=Node):
+    # module
+    #   function main
+    #     loop
+    #       call xa
+    #       if
+    #         call xb
+    #     call xc
+    #   function helper (value 10)
+    #     call ya
+    def node(kind, name=None, **attrs):
+        attrs['kind'] = kind
+        if name is not None:
+            attrs['name'] = name
+        return cls(attrs=attrs)
+
+    root = node('module')
+    main = node('function', 'main', value=3)
+    helper = node('function', 'helper', value=10)
+    loop = node('loop')
+    branch = node('if')
+    root.add_subnode(main)
+    root.add_subnode(helper)
+    main.add_subnode(loop)
+    loop.add_subnode(node('call', 'xa'))
+    loop.add_subnode(branch)
+    branch.add_subnode(node('call', 'xb'))
+    main.add_subnode(node('call', 'xc'))
+    helper.add_subnode(node('call', 'ya'))
+    return root
+
+
+def _names(nodes):
+    return [n._attrs.get('name', n._attrs['kind']) for n in nodes]
+
+
+def test_selector_syntax():
+
+    for cls in (Node, CompactNode):
+        root = _program(cls)
+        assert _names(root.query('call')) == ['xa', 'xb', 'xc', 'ya']
+        assert _names(root.query('loop call[name^=x]')) == ['xa', 'xb']
+        assert _names(root.query('loop > call')) == ['xa']
+        assert _names(root.query('function > call, loop')) == \
+            ['loop', 'xc', 'ya']
+        assert _names(root.query('#main call[name$="c"]')) == ['xc']
+        assert _names(root.query('[value>=5]')) == ['helper']
+        assert _names(root.query('[value] > *')) == \
+            ['loop', 'xc', 'ya']
+        assert _names(root.query('> function')) == ['main', 'helper']
+        assert _names(root.query('> call')) == []
+        assert _names(root.query('module > function > loop > if > call')) \
+            == ['xb']
+        assert _names(root.query('*')) == _names(root.walk())
+        assert _names(root[0].query('function call')) == ['xa', 'xb', 'xc']
+        assert _names(root.query("[name*='a'][kind!=function]")) == \
+            ['xa', 'ya']
+
+    for text in ('', 'a >', 'a > > b', '[a=]', 'a,', '[a=b'):
+        with pytest.raises(ValueError):
+            Selector(text)
+
+    assert compile('loop call') is compile('loop call')
+    assert compile('loop call', 'type') is not compile('loop call')
+
+
+def test_selector_pruning():
+
+    # the plan does not read the subnodes of nodes that cannot lead to a
+    # match
+    root = _program()
+    visited = []
+    for node in list(root.walk()):
+        node.__dict__['subnodes'] = _Recorder(node.subnodes, node, visited)
+    assert _names(compile('> function > loop').select(root)) == ['loop']
+    assert sorted(_names(visited)) == ['helper', 'main', 'module']
+
+
+class _Recorder(list):
+
+    def __init__(self, items, node, visited):
+        super(_Recorder, self).__init__(items)
+        self.node = node
+        self.visited = visited
+
+    def __reversed__(self):
+        self.visited.append(self.node)
+        return super(_Recorder, self).__reversed__()
+
+
+def test_selector_index():
+
+    root = _program()
+    expected = _names(root.query('loop call[name^=x]'))
+    root.create_index('kind')
+    try:
+        assert _names(root.query('loop call[name^=x]')) == expected
+        assert _names(root.query('function > call, #main')) == \
+            ['main', 'xc', 'ya']
+        assert _names(root.query('> function')) == ['main', 'helper']
+        assert _names(root.query('module')) == ['module']
+        assert _names(root.query('module call')) == ['xa', 'xb', 'xc', 'ya']
+        root[0][0].add_subnode(Node(attrs={'kind': 'call', 'name': 'xd'}))
+        assert _names(root.query('loop call')) == ['xa', 'xb', 'xd']
+    finally:
+        root.drop_index()
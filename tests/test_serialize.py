@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `stemtree.serialize`."""
+
+import io
+import random
+
+import pytest
+
+from stemtree import Node, CompactNode
+from stemtree import serialize
+
+
+def hello(node):
+    return 'hello %s' % node.name
+
+
+def _tree(size, seed, cls=Node):
+    rand = random.Random(seed)
+    nodes = [cls(attrs={'name': 'root'})]
+    for idx in range(1, size):
+        node = cls(attrs={'name': 'n%d' % idx, 'order': idx})
+        if idx % 4 == 0:
+            node.span = (idx, str(idx))
+        rand.choice(nodes).add_subnode(node)
+        nodes.append(node)
+    return nodes
+
+
+def _roundtrip(node):
+    stream = io.BytesIO()
+    serialize.dump(node, stream)
+    stream.seek(0)
+    return serialize.load(stream)
+
+
+def test_dump_load():
+
+    old = serialize.FRAME_SIZE
+    serialize.FRAME_SIZE = 16
+    try:
+        for cls in (Node, CompactNode):
+            nodes = _tree(100, 4, cls)
+            nodes[7].greet = hello
+            nodes[9].ref = [nodes[3], nodes[80]]
+            nodes[80].back = nodes[9]
+            nodes[0].add_subnode(Node(attrs={'name': 'plain'}))
+
+            loaded = _roundtrip(nodes[0])
+            walked = list(loaded.walk())
+            assert loaded.treeview('order') == nodes[0].treeview('order')
+            assert [type(n) for n in walked] == \
+                [type(n) for n in nodes[0].walk()]
+            assert loaded.uppernode is None
+            assert all(n[i].uppernode is n and n[i]._get_index() == i
+                for n in walked for i in range(len(n)))
+
+            found = dict((str(n), n) for n in walked)
+            assert found['n7'].greet() == 'hello n7'
+            assert found['n9'].ref == [found['n3'], found['n80']]
+            assert found['n80'].back is found['n9']
+            assert found['n4'].span == (4, '4')
+    finally:
+        serialize.FRAME_SIZE = old
+
+
+def test_dump_stream():
+
+    nodes = _tree(30, 5)
+    Node._shared_attrs['kind'] = 'tree'
+    stream = io.BytesIO()
+    try:
+        serialize.dump(nodes[0], stream)
+        serialize.dump(nodes[5], stream)
+    finally:
+        del Node._shared_attrs['kind']
+    stream.seek(0)
+
+    first = serialize.load(stream)
+    second = serialize.load(stream)
+    try:
+        assert first.kind == 'tree'
+    finally:
+        del Node._shared_attrs['kind']
+    assert first.treeview() == nodes[0].treeview()
+    assert second.treeview() == nodes[5].treeview()
+
+    with pytest.raises(ValueError):
+        serialize.load(io.BytesIO(b'\x80\x02K\x01.'))
+
+
+def test_dump_deep():
+
+    root = node = Node(attrs={'name': 'n0'})
+    for idx in range(1, 5000):
+        node.add_subnode(Node(attrs={'name': 'n%d' % idx}))
+        node = node[0]
+
+    loaded = _roundtrip(root)
+    assert str(list(loaded.walk())[-1]) == 'n4999'
+
+
+def test_pickle_tree():
+
+    import pickle
+
+    for cls in (Node, CompactNode):
+        nodes = _tree(200, 6, cls)
+        nodes[10].ref = nodes[20]
+        data = pickle.dumps(nodes[0])
+
+        Node._shared_attrs['table'] = list(range(2000))
+        try:
+            shared = pickle.dumps(nodes[0])
+            # the shared tables are written once per tree
+            assert len(shared) - len(data) < \
+                2 * len(pickle.dumps(list(range(2000))))
+        finally:
+            del Node._shared_attrs['table']
+
+        first, second = pickle.loads(pickle.dumps([nodes[5], nodes[7]]))
+        assert first.treeview() == nodes[5].treeview()
+        top = list(first.get_uppernodes())[-1]
+        assert top is list(second.get_uppernodes())[-1]
+        assert top.treeview('order') == nodes[0].treeview('order')
+        found = dict((str(n), n) for n in top.walk())
+        assert found['n10'].ref is found['n20']
+
+        # trees that refer to each other
+        first, second = _tree(20, 7, cls), _tree(30, 8, cls)
+        first[3].other = second[0]
+        second[0].other = first[0]
+        second[5].peer = first[3]
+        loaded, other = pickle.loads(pickle.dumps([first[0], second[0]]))
+        assert loaded.treeview('order') == first[0].treeview('order')
+        assert other.treeview('order') == second[0].treeview('order')
+        found = dict((str(n), n) for n in loaded.walk())
+        assert found['n3'].other is other
+        assert other.other is loaded
+        assert dict((str(n), n) for n in other.walk())['n5'].peer is \
+            found['n3']
+
+    root = node = CompactNode(attrs={'name': 'n0'})
+    for idx in range(1, 5000):
+        node.add_subnode(CompactNode(attrs={'name': 'n%d' % idx}))
+        node = node[0]
+    loaded = pickle.loads(pickle.dumps(node, 0))
+    assert str(loaded) == 'n4999'
+    assert len(list(loaded.get_uppernodes())) == 4999
@@ -109,3 +109,561 @@ def test_inheritance(test_attr):
 
     a = A()
     assert a is not None
+
+def test_sibling_index():
+
+    from stemtree import DFS_LF
+
+    root = Node()
+    nodes = [Node() for _ in range(5)]
+    for node in nodes:
+        root.add_subnode(node)
+
+    def check():
+        for idx, node in enumerate(root.subnodes):
+            assert node._get_index() == idx
+            assert node._index == idx
+
+    check()
+
+    root.pop_subnode(1)
+    check()
+
+    root.add_subnode(nodes[1], 2)
+    check()
+
+    extra = Node()
+    nodes[0].insert_after(extra)
+    check()
+    nodes[0].insert_before(Node())
+    check()
+
+    root[3] = Node(uppernode=root)
+    check()
+    del root[0]
+    check()
+
+    # direct list manipulation is detected and repaired
+    root.subnodes.reverse()
+    assert root.subnodes[0]._get_index() == 0
+    check()
+
+    visited = []
+    root.search(lambda n, b: visited.append(n), DFS_LF)
+    assert visited == [root] + root.subnodes
+
+def _random_tree(size, seed):
+
+    import random
+
+    rand = random.Random(seed)
+    nodes = [Node()]
+    for idx in range(1, size):
+        node = Node(attrs={'name': 'n%d' % idx})
+        rand.choice(nodes).add_subnode(node)
+        nodes.append(node)
+    return nodes
+
+
+def _legacy_move(step):
+
+    from stemtree.node import (UpperNodeException, StopNodeException,
+        SiblingNodeException)
+
+    def move(node, basket, stopnode):
+        if len(node.subnodes) > 0:
+            return node.subnodes[0 if step > 0 else -1]
+        newnode = node
+        while type(node) == type(newnode):
+            try:
+                if step > 0:
+                    newnode = newnode._get_rightnode(stopnode=stopnode)
+                else:
+                    newnode = newnode._get_leftnode(stopnode=stopnode)
+                break
+            except (UpperNodeException, StopNodeException):
+                newnode = None
+            except SiblingNodeException:
+                newnode = newnode.uppernode
+        return newnode
+
+    return move
+
+
+def test_search_engine():
+
+    import random
+    from stemtree import DFS_LF, DFS_RF
+
+    nodes = _random_tree(200, 0)
+    rand = random.Random(1)
+
+    for move, step in ((DFS_LF, 1), (DFS_RF, -1)):
+        legacy = _legacy_move(step)
+        for _ in range(100):
+            start = rand.choice(nodes)
+            stopnode = rand.choice(nodes + [None] * 10)
+            expected, visited = [], []
+            last1 = start.search(lambda n, b: expected.append(n), legacy,
+                stopnode=stopnode)
+            last2 = start.search(lambda n, b: visited.append(n), move,
+                stopnode=stopnode)
+            assert visited == expected
+            assert last1 is last2
+            # the stateless move is not routed to the engine
+            visited = []
+            start.search(lambda n, b: visited.append(n),
+                lambda n, b, s: move(n, b, s), stopnode=stopnode)
+            assert visited == expected
+
+    # STOP_SEARCH returns the node where the search stopped
+    target = nodes[50]
+    found = nodes[0].search(
+        lambda n, b: Node.STOP_SEARCH if n is target else None, DFS_LF)
+    assert found is target
+
+def test_skip_subtree():
+
+    import random
+    from stemtree import DFS_LF, DFS_RF, BFS_LF, BFS_RF
+
+    nodes = _random_tree(200, 5)
+    root = nodes[0]
+    skipped = set(id(n) for n in nodes[::7])
+
+    def skip(visited):
+        def action(node, basket):
+            visited.append(node)
+            if id(node) in skipped:
+                return node.SKIP_SUBTREE
+        return action
+
+    def below_skipped(node, top):
+        while node is not top:
+            node = node.uppernode
+            if id(node) in skipped:
+                return True
+        return False
+
+    for move, reverse in ((DFS_LF, False), (DFS_RF, True)):
+        visited = []
+        root.search(skip(visited), move)
+        assert visited == [n for n in root.walk(reverse=reverse)
+            if not below_skipped(n, root)]
+
+    # the steppers, the same moves wrapped and the legacy moves agree for
+    # every start and stopnode, stopnodes in skipped subtrees included
+    small = _random_tree(60, 7)
+    skipped.update(id(n) for n in small[::7])
+    for move, reverse in ((DFS_LF, False), (DFS_RF, True)):
+        wrapped = lambda n, b, s, move=move: move(n, b, s)
+        legacy = _legacy_move(-1 if reverse else 1)
+        for start in small:
+            for stopnode in small + [None]:
+                expected = []
+                last = start.search(skip(expected), move, stopnode=stopnode)
+                for other in (wrapped, legacy):
+                    visited = []
+                    assert start.search(skip(visited), other,
+                        stopnode=stopnode) is last
+                    assert visited == expected
+
+    for move, reverse in ((BFS_LF, False), (BFS_RF, True)):
+        visited = []
+        root.search(skip(visited), move)
+        assert visited == [n for n in root.iter_levelorder(reverse=reverse)
+            if not below_skipped(n, root)]
+
+    # skipping the starting node of a search of its subtree ends it
+    for move in (DFS_LF, DFS_RF, BFS_LF, lambda n, b, s: DFS_LF(n, b, s)):
+        visited = []
+        assert nodes[7].search(skip(visited), move, stopnode=nodes[7]) is None
+        assert visited == [nodes[7]]
+
+def test_walk():
+
+    import itertools
+    from stemtree import DFS_LF, DFS_RF
+
+    nodes = _random_tree(100, 2)
+    root = nodes[0]
+
+    expected = []
+    root.search(lambda n, b: expected.append(n), DFS_LF)
+    assert list(root.walk()) == expected
+    assert list(root.iter_preorder()) == expected
+
+    expected = []
+    root.search(lambda n, b: expected.append(n), DFS_RF)
+    assert list(root.walk(reverse=True)) == expected
+    assert list(root.walk('postorder')) == list(reversed(expected))
+    assert list(root.iter_postorder(reverse=True)) == \
+        list(reversed(list(root.iter_preorder())))
+
+    levels = list(root.iter_levelorder())
+    assert set(levels) == set(nodes) and len(levels) == len(nodes)
+    depth = lambda n: len(list(n.get_uppernodes()))
+    assert [depth(n) for n in levels] == sorted(depth(n) for n in levels)
+    assert levels[1:len(root) + 1] == root.subnodes
+    assert list(root.iter_levelorder(reverse=True))[1:len(root) + 1] == \
+        list(reversed(root.subnodes))
+
+    # lazy: only consumed nodes are visited
+    assert list(itertools.islice(root.walk(), 5)) == \
+        list(root.iter_preorder())[:5]
+
+    # walking a subtree does not leave it
+    sub = root.subnodes[0]
+    assert all(sub in n.get_uppernodes() or n is sub for n in sub.walk())
+
+    with pytest.raises(ValueError):
+        root.walk('inorder')
+
+def test_breadth_first():
+
+    import random
+    from stemtree import BFS_LF, BFS_RF
+
+    nodes = _random_tree(150, 3)
+    root = nodes[0]
+    rand = random.Random(4)
+
+    for move, reverse in ((BFS_LF, False), (BFS_RF, True)):
+        visited = []
+        assert root.search(lambda n, b: visited.append(n), move) is None
+        assert visited == list(root.iter_levelorder(reverse=reverse))
+
+        for _ in range(30):
+            start = rand.choice(nodes)
+            stopnode = rand.choice(nodes + [None] * 5)
+            expected, visited = [], []
+            last1 = start.search(lambda n, b: visited.append(n), move,
+                stopnode=stopnode)
+            last2 = start.search(lambda n, b: expected.append(n),
+                lambda n, b, s: move(n, b, s), stopnode=stopnode)
+            assert visited == expected
+            assert last1 is last2
+            assert stopnode not in visited
+
+    # basket is handed to the action
+    basket = {'count': 0}
+    def count(node, basket):
+        basket['count'] += 1
+    root.search(count, BFS_LF, basket=basket)
+    assert basket['count'] == len(nodes)
+
+    levels = list(root.iter_levels(maxdepth=2))
+    assert len(levels) <= 3
+    assert levels[0] == [root] and levels[1] == root.subnodes
+    assert list(root.iter_levelorder(maxdepth=2)) == sum(levels, [])
+    assert list(root.walk('levelorder', maxdepth=0)) == [root]
+
+def test_method_cache():
+
+    node = Node()
+    node.greet = lambda obj: "hello"
+    assert node.greet() == "hello"
+    assert node.greet.__self__ is node
+
+    node.greet = lambda obj: "bye"
+    assert node.greet() == "bye"
+
+    node.greet = "attr"
+    assert node.greet == "attr"
+    del node.greet
+    assert node.greet == "attr"
+    del node.greet
+    assert not hasattr(node, "greet")
+
+    node.greet = lambda obj: "again"
+    assert node.greet() == "again"
+    del node.greet
+    assert not hasattr(node, "greet")
+    assert "greet" not in node.__getstate__()
+
+    node.setattr_shared("shared_greet", lambda obj: obj)
+    assert node.shared_greet() is node
+    assert Node().shared_greet() is not node
+    node.setattr_shared("shared_greet", lambda obj: "new")
+    assert node.shared_greet() == "new"
+    node.delattr_shared("shared_greet")
+    assert not hasattr(node, "shared_greet")
+
+    # calling methods keeps no bound method on the node, so it is freed
+    # without the cyclic collector
+    import gc
+    import weakref
+    node.greet = lambda obj: obj
+    node.setattr_shared("shared_greet", lambda obj: obj)
+    try:
+        assert node.greet() is node and node.shared_greet() is node
+        ref = weakref.ref(node)
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            del node
+            assert ref() is None
+        finally:
+            if collecting:
+                gc.enable()
+    finally:
+        Node._shared_methods.pop("shared_greet", None)
+
+def test_compact_node():
+
+    import pickle
+    from stemtree import CompactNode, DFS_LF
+
+    root = CompactNode(attrs={'name': 'root'})
+    assert not hasattr(root, '__dict__')
+    assert root.subnodes == ()
+
+    for idx in range(3):
+        root.add_subnode(CompactNode(attrs={'name': 'n%d' % idx}))
+    leaf = CompactNode()
+    root[1].add_subnode(leaf)
+    leaf.name = 'leaf'
+    leaf.value = 5
+    leaf.double = lambda obj, x: 2 * x
+    assert leaf.double(leaf.value) == 10
+    assert leaf._attrs == {'name': 'leaf', 'value': 5}
+    del leaf.double
+    assert not hasattr(leaf, 'double')
+    with pytest.raises(AttributeError):
+        leaf.search = 1
+
+    root[0].insert_after(CompactNode(attrs={'name': 'x'}))
+    assert [str(n) for n in root] == ['n0', 'x', 'n1', 'n2']
+    assert root.pop_subnode(1).name == 'x'
+
+    visited = []
+    root.search(lambda n, b: visited.append(str(n)), DFS_LF)
+    assert visited == ['root', 'n0', 'n1', 'leaf', 'n2']
+    assert [str(n) for n in root.walk('postorder')] == \
+        ['n0', 'leaf', 'n1', 'n2', 'root']
+
+    assert root.treeview('value') == \
+        'root\n---|n0\n---|n1\n---|--|leaf (value=5)\n---|n2'
+
+    cloned = root.clone(memo={})
+    assert cloned.treeview('value') == root.treeview('value')
+    assert cloned[1][0] is not leaf and cloned[1][0].uppernode is cloned[1]
+
+    loaded = pickle.loads(pickle.dumps(root))
+    assert loaded.treeview('value') == root.treeview('value')
+    assert loaded[1][0].uppernode is loaded[1]
+    assert loaded[0].subnodes == ()
+
+def test_select():
+
+    nodes = _random_tree(60, 5)
+    root = nodes[0]
+    for idx, node in enumerate(nodes):
+        node.size = idx % 7
+    del nodes[3].size
+
+    found = root.select(size=2)
+    assert found == [n for n in root.walk() if getattr(n, 'size', None) == 2]
+    assert root.select(name='n5') == [nodes[5]]
+    assert root.select(name='n5', size=0) == []
+
+    big = root.select(where=lambda c: [s is not None and s > 4
+        for s in c['size']])
+    assert big == [n for n in root.walk() if getattr(n, 'size', 0) > 4]
+
+    positions = root.select(size=1, indices=True)
+    walked = list(root.walk())
+    assert [walked[pos] for pos in positions] == root.select(size=1)
+
+    sub = nodes[1]
+    assert all(n is sub or sub in n.get_uppernodes()
+        for n in sub.select(where=lambda c: [True] * len(c['size'])))
+
+    Node._shared_attrs['kind'] = 'default'
+    try:
+        assert len(root.select(kind='default')) == len(nodes)
+    finally:
+        del Node._shared_attrs['kind']
+
+def test_select_sequences():
+
+    pytest.importorskip('numpy')
+    for size in (2, 3):
+        nodes = _random_tree(size, 5)
+        root = nodes[0]
+        root.v = (1, 2)
+        nodes[1].v = [1, 2]
+        # columns of tuples are object arrays; values are not broadcast
+        assert root.select(v=(1, 2)) == [root]
+        assert root.select(v=[1, 2]) == [nodes[1]]
+        assert root.select(v=(1,)) == []
+
+def _chain(depth, cls=Node):
+
+    root = node = cls(attrs={'name': 'n0'})
+    for idx in range(1, depth):
+        subnode = cls(attrs={'name': 'n%d' % idx})
+        node.add_subnode(subnode)
+        node = subnode
+    return root, node
+
+
+def test_treeview():
+
+    def legacy(node, *args):
+        attrs = [a+'='+repr(getattr(node, a)) for a in args if hasattr(node, a)]
+        lines = [str(node)+(' (%s)'%', '.join(attrs) if attrs else '')]
+        lines.extend(["-"+legacy(n, *args) for n in node.subnodes])
+        return "\n".join(lines).replace("\n-", "\n---|")
+
+    nodes = _random_tree(80, 6)
+    nodes[4].name = '-dash'
+    nodes[9].value = [1, 2]
+    assert nodes[0].treeview('value') == legacy(nodes[0], 'value')
+    assert nodes[2].treeview() == legacy(nodes[2])
+
+
+def test_deep_tree():
+
+    import sys
+    from stemtree import CompactNode, DFS_LF
+    from stemtree.algorithm import assemble_subtrees
+
+    depth = 20000
+    assert sys.getrecursionlimit() < depth
+
+    for cls in (Node, CompactNode):
+        root, leaf = _chain(depth, cls)
+        leaf.data = [1, 2]
+        leaf.ref = root
+
+        cloned = root.clone()
+        assert cloned is not root and root.clone() is not cloned
+        last = list(cloned.walk())[-1]
+        assert str(last) == 'n%d' % (depth - 1)
+        assert last.data == [1, 2] and last.data is not leaf.data
+        assert last.ref is cloned
+        assert len(list(last.get_uppernodes())) == depth - 1
+
+        copied = copy.deepcopy(root)
+        assert str(list(copied.walk('postorder'))[0]) == str(leaf)
+
+        count = {'n': 0}
+        def action(node, basket):
+            basket['n'] += 1
+        root.search(action, DFS_LF, basket=count)
+        assert count['n'] == depth
+
+    root, leaf = _chain(3000)
+    lines = root.treeview().split('\n')
+    assert len(lines) == 3000 and lines[-1].endswith('n2999')
+
+    root, leaf = _chain(2 * sys.getrecursionlimit())
+    trees = assemble_subtrees(list(root.walk()))
+    assert trees == [root]
+    assert list(root.walk())[-1] is leaf
+
+
+def test_fast_clone():
+
+    from stemtree import CompactNode
+
+    for cls in (Node, CompactNode):
+        root, leaf = _chain(4, cls)
+        sibling = cls(attrs={'name': 'sibling'})
+        root.add_subnode(sibling)
+        leaf.key = ('a', (1, 2.5), frozenset([None]))
+        leaf.items = [1, ('b', [2])]
+        leaf.ref = (root, 1)
+
+        cloned = root.clone()
+        last = list(cloned.walk())[-2]
+        assert str(last) == 'n3'
+        assert last.key is leaf.key
+        assert last.items == leaf.items and last.items is not leaf.items
+        assert last.items[1][1] is not leaf.items[1][1]
+        assert last.ref[0] is cloned
+        assert [n._get_index() for n in cloned] == [0, 1]
+        assert cloned[1].uppernode is cloned
+
+        pruned = root.clone(subtrees=[sibling])
+        assert [str(n) for n in pruned.walk()] == ['n0', 'sibling']
+        pruned = root.clone(subtrees=[leaf.uppernode])
+        assert [str(n) for n in pruned.walk()] == ['n0', 'n1', 'n2', 'n3']
+        assert pruned.clone(subtrees=[pruned]).treeview() == pruned.treeview()
+
+        with pytest.raises(ValueError):
+            sibling.clone(subtrees=[leaf])
+
+
+def test_assemble_subtrees():
+
+    from stemtree import CompactNode
+    from stemtree.algorithm import assemble_subtrees
+
+    for cls in (Node, CompactNode):
+        # a - m - b - c and a - x - y
+        root, c = _chain(4, cls)
+        a, m, b = root, root[0], root[0][0]
+        x, y = cls(attrs={'name': 'x'}), cls(attrs={'name': 'y'})
+        a.add_subnode(x)
+        x.add_subnode(y)
+        z = cls(attrs={'name': 'z'})
+        m.add_subnode(z, 0)
+
+        trees = assemble_subtrees([y, c], [a], [m, b, y])
+        assert trees == [y, a]
+        assert a.subnodes == [m] and m.subnodes == [b] and b.subnodes == [c]
+        assert c.uppernode is b and y.uppernode is None
+        assert b._get_index() == 0
+        assert not hasattr(a, '_subnodes')
+
+        # the last given node joins all trees
+        root, c = _chain(4, cls)
+        trees = assemble_subtrees([c, root, root[0][0], root[0]])
+        assert trees == [root]
+        assert [str(n) for n in root.walk()] == ['n0', 'n1', 'n2', 'n3']
+
+
+def test_project_subtrees():
+
+    from stemtree import DFS_LF
+    from stemtree.algorithm import (assemble_subtrees, project_subtrees,
+        ProjectionNode)
+
+    root, leaf = _chain(5)
+    extra = Node(attrs={'name': 'x'})
+    root[0].add_subnode(extra)
+    nodes = list(root.walk())
+    before = [(n.uppernode, list(n.subnodes)) for n in nodes]
+
+    given = [leaf, root, root[0], extra, root[0][0][0]]
+    first = project_subtrees(given)
+    second = assemble_subtrees(given[:3], project=True)
+    assert [(n.uppernode, list(n.subnodes)) for n in nodes] == before
+
+    assert [type(n) for n in first] == [ProjectionNode] * 2
+    assert [n.origin for n in first] == [root[0][0][0], root]
+    assert [str(n) for n in first[1].walk()] == ['n0', 'n1', 'x']
+    assert [str(n) for n in first[0].walk()] == ['n3', 'n4']
+    assert first[1][0][0]._get_index() == 0
+    assert [[str(n) for n in tree.walk()] for tree in second] == \
+        [['n4'], ['n0', 'n1']]
+
+    # attributes belong to the original nodes
+    first[1].value = 1
+    assert root.value == 1 and second[1].value == 1
+    basket = {}
+    first[1].search(lambda n, b: b.setdefault('names', []).append(str(n)),
+        DFS_LF, basket=basket)
+    assert basket['names'] == ['n0', 'n1', 'x']
+
+    cloned = first[1].clone()
+    assert cloned.origin is root and cloned[0][0].origin is extra
+
+    # the same forest as assemble_subtrees builds from copies
+    memo = {}
+    root.clone(memo=memo)
+    assembled = assemble_subtrees([memo[id(n)] for n in given])
+    assert [[str(n) for n in tree.walk()] for tree in assembled] == \
+        [[str(n) for n in tree.walk()] for tree in first]
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `stemtree.structural`."""
+
+import random
+
+from stemtree import Node, CompactNode
+from stemtree.persistent import PersistentTree
+from stemtree.structural import (subtree_hashes, structural_hash,
+    hash_attribute, same_subtree, duplicate_subtrees, HashConsTable)
+
+
+def _expression(rand, depth, cls=Node):
+    # small expressions over a few operators and names repeat often
+    if depth == 0 or rand.random() < 0.3:
+        return cls(attrs={'kind': 'name', 'name': rand.choice('xyz')})
+    node = cls(attrs={'kind': 'op', 'op': rand.choice('+*')})
+    node.add_subnode(_expression(rand, depth - 1, cls))
+    node.add_subnode(_expression(rand, depth - 1, cls))
+    return node
+
+
+def _tree(size, seed, cls=Node):
+    rand = random.Random(seed)
+    root = cls(attrs={'kind': 'module'})
+    for _ in range(size):
+        root.add_subnode(_expression(rand, 3, cls))
+    return root
+
+
+def _pairwise(root, min_size):
+    nodes = [n for n in root.walk('postorder') if
+        sum(1 for _ in n.walk()) >= min_size]
+    groups = []
+    for node in nodes:
+        for group in groups:
+            if same_subtree(group[0], node):
+                group.append(node)
+                break
+        else:
+            groups.append([node])
+    return [group for group in groups if len(group) > 1]
+
+
+def test_structural_hash():
+
+    for cls in (Node, CompactNode):
+        root = _tree(30, 1, cls)
+        hashes = subtree_hashes(root)
+        assert len(hashes) == sum(1 for _ in root.walk())
+        assert structural_hash(root) == hashes[id(root)]
+
+        first = cls(attrs={'op': '+', 'kind': 'op'})
+        first.add_subnode(cls(attrs={'kind': 'name', 'name': 'x'}))
+        first.add_subnode(cls(attrs={'kind': 'name', 'name': 'y'}))
+        second = cls(attrs={'kind': 'op', 'op': '+'})
+        second.add_subnode(cls(attrs={'kind': 'name', 'name': 'x'}))
+        second.add_subnode(cls(attrs={'kind': 'name', 'name': 'y'}))
+        assert structural_hash(first) == structural_hash(second)
+        assert same_subtree(first, second)
+
+        # order of subnodes and chosen attributes
+        second.add_subnode(second.pop_subnode(0))
+        assert structural_hash(first) != structural_hash(second)
+        assert not same_subtree(first, second)
+        assert structural_hash(first, names=('kind',)) == \
+            structural_hash(second, names=('kind',))
+        assert same_subtree(first, second, names=('kind',))
+
+        # unhashable values
+        first.items = [1, 2]
+        assert structural_hash(first) != structural_hash(second)
+
+
+def test_duplicate_subtrees():
+
+    root = _tree(40, 2)
+    groups = duplicate_subtrees(root, min_size=3)
+    assert groups
+    assert sorted(map(len, groups)) == sorted(map(len, _pairwise(root, 3)))
+    for group in groups:
+        assert all(same_subtree(group[0], node) for node in group[1:])
+    assert all(len(group[0].subnodes) for group in groups)
+
+
+def test_hash_attribute():
+
+    root = _tree(20, 3)
+    hashed = hash_attribute()
+    try:
+        assert hashed(root) == structural_hash(root)
+        assert root.get_derived('structural_hash') == hashed(root)
+        leaf = list(root.walk())[-1]
+        leaf.name = 'w'
+        assert hashed(root) == structural_hash(root)
+        root.subnodes[3].add_subnode(Node(attrs={'kind': 'name'}))
+        assert hashed(root) == structural_hash(root)
+    finally:
+        hashed.close()
+
+
+def test_hash_consing():
+
+    root = _tree(200, 4)
+    table = HashConsTable()
+    tree = PersistentTree.from_node(root, table)
+    plain = PersistentTree.from_node(root)
+    assert tree.to_node().treeview('kind') == root.treeview('kind')
+    assert len(table) < sum(1 for _ in root.walk()) // 3
+
+    # equal subtrees share one record
+    groups = duplicate_subtrees(tree.root, min_size=3)
+    for group in groups:
+        records = set(id(tree._lookup(node.tree_path)) for node in group)
+        assert len(records) == 1
+        assert same_subtree(group[0], group[1])
+
+    # a second tree reuses the table; edits copy shared records
+    other = PersistentTree.from_node(root, table)
+    assert other._record is tree._record
+    before = len(table)
+    node = list(other.root.walk())[-1]
+    node.name = 'changed'
+    assert len(table) == before
+    assert tree.to_node().treeview('name') == plain.to_node().treeview('name')
+    assert other.to_node().treeview('name') != \
+        plain.to_node().treeview('name')
+
+    # mutable values and 1 against True
+    first, second = Node(attrs={'v': 1}), Node(attrs={'v': True})
+    assert table.intern(first) is not table.intern(second)
+    assert table.intern(Node(attrs={'v': 1})) is table.intern(first)
+    listed = Node(attrs={'v': [1]})
+    assert table.intern(listed) is not table.intern(Node(attrs={'v': [1]}))
+
+    # equal values read back as interned
+    for values in (((1,), (True,)), (0.0, -0.0), ((0.0,), (-0.0,)),
+        (frozenset([1]), frozenset([True])), ((1, (2,)), (1, (2.0,)))):
+        for value in values:
+            record = table.intern(Node(attrs={'v': value}))
+            assert repr(record.attrs['v']) == repr(value)